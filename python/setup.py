@@ -46,6 +46,13 @@ setup(
             "matplotlib>=3.4.0",
             "numpy>=1.21.0",
         ],
+        "export": [
+            "pyarrow>=7.0.0",
+            "numpy>=1.21.0",
+        ],
+        "compression": [
+            "zstandard>=0.15.0",
+        ],
     },
     entry_points={
         "console_scripts": [
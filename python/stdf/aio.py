@@ -0,0 +1,293 @@
+"""asyncio API for concurrent STDF ingestion
+
+``aparse()`` reads and frames blocks of a (possibly compressed) file in an
+executor thread while the previous block is decoded and consumed, with a
+bounded queue for backpressure. ``aparse_many()`` parses whole files in a
+bounded process pool. ``serve()`` runs a small HTTP endpoint that parses
+STDF request bodies as they stream in and answers with summary statistics.
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .compression import open_stdf
+from .follow import IncrementalParser
+from .parallel import ParsedFiles, _parse_file, merge_parsed
+from .parser import HEADER, HEADER_SIZE, STDFParser, STDFRecord, TestResult
+
+# Bytes read per executor call
+BLOCK_SIZE = 1024 * 1024
+
+# Blocks read ahead of the consumer
+PREFETCH = 4
+
+
+def _read_frames(f: BinaryIO, pending: bytes, block_size: int) -> Tuple[List[STDFRecord], bytes, bool]:
+    """Read a block and split it into complete records; returns (records, rest, eof)"""
+    data = f.read(block_size)
+    buf = pending + data if pending else data
+    unpack_header = HEADER.unpack_from
+    size = len(buf)
+    offset = 0
+    records = []
+
+    while offset + HEADER_SIZE <= size:
+        rec_len, rec_type, rec_sub = unpack_header(buf, offset)
+        start = offset + HEADER_SIZE
+        if start + rec_len > size:
+            break
+        offset = start + rec_len
+        records.append(STDFRecord(rec_type, rec_sub, rec_len, buf[start:offset]))
+
+    eof = not data
+    if eof and offset + HEADER_SIZE <= size:
+        # Truncated trailing record: hand out the short payload, as parse() does
+        rec_len, rec_type, rec_sub = unpack_header(buf, offset)
+        records.append(STDFRecord(rec_type, rec_sub, rec_len, buf[offset + HEADER_SIZE:]))
+        offset = size
+    return records, buf[offset:], eof
+
+
+async def _produce(filepath: str, queue: asyncio.Queue, block_size: int,
+                   transform: Optional[Callable[[List[STDFRecord]], list]],
+                   executor: Optional[Executor]) -> None:
+    loop = asyncio.get_running_loop()
+    try:
+        with open_stdf(filepath) as f:
+            reading = loop.run_in_executor(executor, _read_frames, f, b'', block_size)
+            try:
+                eof = False
+                while not eof:
+                    records, pending, eof = await reading
+                    # Read block N+1 while block N is decoded and queued; the
+                    # queue bounds how far ahead this gets
+                    reading = None if eof else loop.run_in_executor(
+                        executor, _read_frames, f, pending, block_size)
+                    if transform is not None:
+                        records = await loop.run_in_executor(executor, transform, records)
+                    await queue.put(records)
+            finally:
+                # Never close the file under a read still running in the executor
+                if reading is not None and not reading.done():
+                    await asyncio.wait([reading])
+        await queue.put(None)
+    except Exception as e:
+        await queue.put(e)
+
+
+async def _consume(filepath: str, block_size: int, prefetch: int,
+                   transform: Optional[Callable[[List[STDFRecord]], list]],
+                   executor: Optional[Executor]) -> AsyncIterator[Any]:
+    queue: asyncio.Queue = asyncio.Queue(max(1, prefetch))
+    producer = asyncio.ensure_future(_produce(filepath, queue, block_size, transform, executor))
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            for item in batch:
+                yield item
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+
+def aparse(filepath: str, block_size: int = BLOCK_SIZE, prefetch: int = PREFETCH,
+           executor: Optional[Executor] = None) -> AsyncIterator[STDFRecord]:
+    """Asynchronously yield the raw records of a file
+
+    Blocks are read in ``executor`` (the loop's default thread pool if None)
+    at most ``prefetch`` blocks ahead of the consumer.
+    """
+    return _consume(filepath, block_size, prefetch, None, executor)
+
+
+def aiter_test_results(filepath: str, block_size: int = BLOCK_SIZE, prefetch: int = PREFETCH,
+                       executor: Optional[Executor] = None) -> AsyncIterator[TestResult]:
+    """Asynchronously yield parsed test results, decoding in ``executor``"""
+    parser = STDFParser(filepath)
+    parse_record = parser._parse_record
+
+    def decode(records: List[STDFRecord]) -> List[TestResult]:
+        results = []
+        for record in records:
+            row = parse_record(record)
+            if row is not None:
+                results.append(TestResult(*row))
+        return results
+
+    return _consume(filepath, block_size, prefetch, decode, executor)
+
+
+async def aparse_many(paths: Sequence[str], concurrency: Optional[int] = None,
+                      executor: Optional[Executor] = None, use_mmap: bool = False) -> ParsedFiles:
+    """Parse files concurrently, at most ``concurrency`` at a time
+
+    Files are parsed in ``executor`` (a process pool of ``concurrency``
+    workers by default) and merged in the order of ``paths``.
+    """
+    paths = list(paths)
+    if concurrency is None:
+        concurrency = os.cpu_count() or 1
+    concurrency = max(1, concurrency)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=min(concurrency, max(1, len(paths))))
+
+    async def parse_one(path: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await loop.run_in_executor(executor, _parse_file, path, use_mmap)
+
+    try:
+        parsed = await asyncio.gather(*(parse_one(path) for path in paths))
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+
+    return merge_parsed(parsed)
+
+
+# Default largest request body accepted by serve(), whatever its transfer encoding
+MAX_BODY_SIZE = 2 * 1024 ** 3
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any]) -> None:
+    body = json.dumps(payload).encode('utf-8')
+    writer.write(f'HTTP/1.1 {status} {_REASONS[status]}\r\n'
+                 f'Content-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n'
+                 f'Connection: close\r\n\r\n'.encode('latin-1') + body)
+    await writer.drain()
+
+
+class _BodyTooLarge(ValueError):
+    """A request body over the server's size limit"""
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+    """Yield the blocks of a chunked body"""
+    while True:
+        size = int((await reader.readline()).split(b';')[0], 16)
+        if size == 0:
+            await reader.readline()
+            return
+        remaining = size
+        while remaining:
+            data = await reader.read(min(remaining, BLOCK_SIZE))
+            if not data:
+                raise ValueError('truncated chunk')
+            remaining -= len(data)
+            yield data
+        await reader.readline()
+
+
+async def _read_length(reader: asyncio.StreamReader, length: Optional[int]) -> AsyncIterator[bytes]:
+    """Yield the blocks of a body of ``length`` bytes, or of everything until EOF"""
+    remaining = length
+    while remaining is None or remaining > 0:
+        data = await reader.read(BLOCK_SIZE if remaining is None else min(remaining, BLOCK_SIZE))
+        if not data:
+            return
+        if remaining is not None:
+            remaining -= len(data)
+        yield data
+
+
+async def _read_body(reader: asyncio.StreamReader, headers: Dict[str, str],
+                     max_size: int = MAX_BODY_SIZE) -> AsyncIterator[bytes]:
+    """Yield the request body in blocks (Content-Length, chunked, or until EOF)
+
+    Raises ``_BodyTooLarge`` once more than ``max_size`` bytes are received.
+    """
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        blocks = _read_chunked(reader)
+    else:
+        length = headers.get('content-length')
+        blocks = _read_length(reader, int(length) if length is not None else None)
+
+    received = 0
+    async for data in blocks:
+        received += len(data)
+        if received > max_size:
+            raise _BodyTooLarge(f'request body over {max_size} bytes')
+        yield data
+
+
+async def handle_ingest(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                        semaphore: asyncio.Semaphore, executor: Optional[Executor] = None,
+                        max_body_size: int = MAX_BODY_SIZE) -> None:
+    """Serve one HTTP request: POST an STDF stream, get summary statistics
+
+    ``semaphore`` bounds how many bodies are decoded at once; bodies over
+    ``max_body_size`` bytes get a 413.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if len(request_line) < 2 or request_line[0] != 'POST':
+            await _respond(writer, 405, {'error': 'POST an STDF file as the request body'})
+            return
+        if int(headers.get('content-length', 0)) > max_body_size:
+            await _respond(writer, 413, {'error': f'request body over {max_body_size} bytes'})
+            return
+
+        async with semaphore:
+            # The body is only fed, never read from disk: the path is just a label
+            incremental = IncrementalParser('<request>')
+            async for block in _read_body(reader, headers, max_body_size):
+                # Decode off the event loop; the next block is read once this one is done
+                await loop.run_in_executor(executor, incremental.feed, block)
+
+        await _respond(writer, 200, {
+            'total_records': incremental.total_records,
+            'incomplete_bytes': incremental.pending_bytes,
+            'file_info': incremental.file_info,
+            'statistics': incremental.statistics(),
+            'tests': {str(n): stats for n, stats in incremental.analyze_by_test().items()}
+        })
+    except _BodyTooLarge as e:
+        await _respond(writer, 413, {'error': str(e)})
+    except (ValueError, UnicodeDecodeError) as e:
+        await _respond(writer, 400, {'error': str(e)})
+    finally:
+        writer.close()
+
+
+async def start_server(host: str = '127.0.0.1', port: int = 8765, max_concurrent: int = 16,
+                       max_body_size: int = MAX_BODY_SIZE) -> asyncio.AbstractServer:
+    """Start the ingest endpoint; at most ``max_concurrent`` bodies are decoded at once"""
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await handle_ingest(reader, writer, semaphore, max_body_size=max_body_size)
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def serve(host: str = '127.0.0.1', port: int = 8765, max_concurrent: int = 16,
+                max_body_size: int = MAX_BODY_SIZE) -> None:
+    """Run the ingest endpoint until cancelled"""
+    server = await start_server(host, port, max_concurrent, max_body_size)
+    async with server:
+        await server.serve_forever()
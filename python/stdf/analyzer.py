@@ -1,96 +1,377 @@
 """STDF Data Analyzer"""
 
-import statistics
-from typing import List, Dict, Any
+import copy
+import math
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Iterable, Optional, Tuple
 from .parser import STDFParser, TestResult
+from .results import TestResultStore
+from .stats import RunningStats, cpk as _cpk
+from .parts import PartIndex
+from .wafer import BinSummary, WaferGrid
+
+if TYPE_CHECKING:
+    from .cache import AnalysisCache
+    from .profiling import Profiler
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency (stdf-parser[analysis])
+    np = None
+
+
+def _describe(values: List[float], low_limit: float, high_limit: float) -> Dict[str, Any]:
+    """Summary statistics of one test's values"""
+    count = len(values)
+    mean = math.fsum(values) / count
+    stdev = math.sqrt(math.fsum((v - mean) ** 2 for v in values) / (count - 1)) if count > 1 else 0.0
+
+    ordered = sorted(values)
+    mid = count // 2
+    median = ordered[mid] if count % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+    return {
+        'count': count,
+        'mean': mean,
+        'median': median,
+        'stdev': stdev,
+        'min': ordered[0],
+        'max': ordered[-1],
+        'cpk': _cpk(count, mean, stdev, low_limit, high_limit)
+    }
+
+
+def _sorted(values: Optional[Iterable[int]]) -> Optional[List[int]]:
+    return None if values is None else sorted(values)
 
 
 class STDFAnalyzer:
-    """Advanced STDF data analysis"""
+    """Advanced STDF data analysis
+
+    Per-test statistics are computed in one grouped pass over the results
+    and shared by every method; with numpy installed the pass is vectorized
+    over the columns of the parser's ``TestResultStore``. A ``profiler``
+    (by default the parser's) times the 'statistics' and 'outliers' passes.
+
+    The parser may also be a ``database.StoredResults``: statistics, failing
+    tests and outliers are then queried from the database, which computes
+    them without loading the results.
+
+    With a ``cache`` (see ``stdf.cache``), the statistics, outliers, failing
+    tests and report of an ``STDFParser`` are memoized by file fingerprint
+    and parameters. A miss parses the file first if the parser has not, so
+    a hit needs no parsing at all.
+    """
 
-    def __init__(self, parser: STDFParser):
+    def __init__(self, parser: STDFParser, profiler: Optional['Profiler'] = None,
+                 cache: Optional['AnalysisCache'] = None):
         self.parser = parser
-        self.test_results = parser.test_results
+        self.profiler = profiler if profiler is not None else getattr(parser, 'profiler', None)
+        self.cache = cache if isinstance(parser, STDFParser) else None
+        self._stats: Optional[Dict[int, Dict[str, Any]]] = None
+        self._stats_size = -1
 
-    def analyze_by_test(self) -> Dict[int, Dict[str, Any]]:
-        """Analyze results grouped by test number"""
-        test_groups: Dict[int, List[float]] = {}
-
-        for result in self.test_results:
-            if result.test_num not in test_groups:
-                test_groups[result.test_num] = []
-            test_groups[result.test_num].append(result.result)
-
-        analysis = {}
-        for test_num, values in test_groups.items():
-            if values:
-                analysis[test_num] = {
-                    'count': len(values),
-                    'mean': statistics.mean(values),
-                    'median': statistics.median(values),
-                    'stdev': statistics.stdev(values) if len(values) > 1 else 0.0,
-                    'min': min(values),
-                    'max': max(values)
-                }
-
-        return analysis
+    @property
+    def test_results(self) -> Iterable[TestResult]:
+        return self.parser.test_results
+
+    def _cached(self, name: str, compute: Callable[[], Any], **params: Any) -> Any:
+        """Result of ``compute()``, memoized in the cache if there is one"""
+        if self.cache is None:
+            return compute()
+
+        parser = self.parser
+        # A filtered parse holds different results than a full one
+        key = self.cache.key(parser.filepath, name, record_types=_sorted(parser.record_types),
+                             tests=_sorted(parser.tests), **params)
+
+        def parse_and_compute() -> Any:
+            if not parser.records:
+                parser.parse()
+            return compute()
+
+        return self.cache.get_or_compute(key, parse_and_compute)
+
+    def _cached_results(self, name: str, compute: Callable[[], List[TestResult]],
+                        **params: Any) -> List[TestResult]:
+        """``_cached()`` for a list of results; cached lists and results are copied"""
+        if self.cache is None:
+            return compute()
+        return [copy.copy(result) for result in self._cached(name, compute, **params)]
+
+    def _test_stats(self) -> Dict[int, Dict[str, Any]]:
+        """Per-test statistics of the parsed results, memoized
+
+        Tests are ordered by first appearance. Recomputed if the results
+        have grown since the last call.
+        """
+        if self.cache is not None:
+            return self._cached('test_stats', self._compute_test_stats)
+        return self._compute_test_stats()
+
+    def _compute_test_stats(self) -> Dict[int, Dict[str, Any]]:
+        aggregate = getattr(self.parser, 'aggregate_tests', None)
+        if aggregate is not None:
+            # Aggregated by the database holding the results
+            if self._stats is None:
+                if self.profiler is not None:
+                    with self.profiler.timer('statistics'):
+                        self._stats = aggregate()
+                else:
+                    self._stats = aggregate()
+            return self._stats
+
+        if self._stats is None or self._stats_size != len(self.test_results):
+            if self.profiler is not None:
+                with self.profiler.timer('statistics'):
+                    self._stats = self._aggregate(self.test_results)
+            else:
+                self._stats = self._aggregate(self.test_results)
+            self._stats_size = len(self.test_results)
+
+        return self._stats
+
+    @classmethod
+    def _aggregate(cls, results: Iterable[TestResult]) -> Dict[int, Dict[str, Any]]:
+        """Per-test statistics using the fastest path for the results' type"""
+        if isinstance(results, TestResultStore):
+            if np is not None:
+                return cls._aggregate_numpy(results)
+            return cls._aggregate_columns(results)
+        return cls._aggregate_rows(results)
+
+    @staticmethod
+    def _aggregate_rows(results: Iterable[TestResult]) -> Dict[int, Dict[str, Any]]:
+        """Group any iterable of results in a single pass"""
+        groups: Dict[int, List[float]] = {}
+        limits: Dict[int, tuple] = {}
+
+        for result in results:
+            values = groups.get(result.test_num)
+            if values is None:
+                values = groups[result.test_num] = []
+                # Use first result's limits
+                limits[result.test_num] = (result.low_limit, result.high_limit)
+            values.append(result.result)
+
+        return {test_num: _describe(values, *limits[test_num])
+                for test_num, values in groups.items()}
+
+    @staticmethod
+    def _aggregate_columns(store: TestResultStore) -> Dict[int, Dict[str, Any]]:
+        """Group a columnar store without materializing rows"""
+        groups: Dict[int, List[float]] = {}
+        first: Dict[int, int] = {}
+
+        for index, (test_num, value) in enumerate(zip(store.test_num, store.result)):
+            values = groups.get(test_num)
+            if values is None:
+                values = groups[test_num] = []
+                first[test_num] = index
+            values.append(value)
+
+        return {test_num: _describe(values, store.low_limit[first[test_num]],
+                                    store.high_limit[first[test_num]])
+                for test_num, values in groups.items()}
+
+    @staticmethod
+    def _aggregate_numpy(store: TestResultStore) -> Dict[int, Dict[str, Any]]:
+        """Vectorized group-by on test_num over the store's columns"""
+        if len(store) == 0:
+            return {}
+
+        test_nums = np.frombuffer(store.test_num, dtype=np.uintc)
+        values = np.frombuffer(store.result, dtype=np.float64)
+
+        # Sort by test number, then by value within each test
+        order = np.lexsort((values, test_nums))
+        sorted_tests = test_nums[order]
+        sorted_values = values[order]
+
+        starts = np.flatnonzero(np.r_[True, sorted_tests[1:] != sorted_tests[:-1]])
+        counts = np.diff(np.r_[starts, len(sorted_values)])
+        ends = starts + counts - 1
+
+        means = np.add.reduceat(sorted_values, starts) / counts
+        deviations = sorted_values - np.repeat(means, counts)
+        sum_sq = np.add.reduceat(deviations * deviations, starts)
+        stdevs = np.where(counts > 1, np.sqrt(sum_sq / np.maximum(counts - 1, 1)), 0.0)
+        medians = (sorted_values[starts + (counts - 1) // 2] + sorted_values[starts + counts // 2]) / 2
+
+        # Use first result's limits; report tests in order of first appearance
+        first = np.minimum.reduceat(order, starts)
+        low_limits = np.frombuffer(store.low_limit, dtype=np.float64)[first]
+        high_limits = np.frombuffer(store.high_limit, dtype=np.float64)[first]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cpks = np.minimum(high_limits - means, means - low_limits) / (3 * stdevs)
+        cpks = np.where((counts > 1) & (stdevs != 0), cpks, 0.0)
+
+        tests = sorted_tests[starts].tolist()
+        counts, means, medians, stdevs, cpks = (counts.tolist(), means.tolist(), medians.tolist(),
+                                                stdevs.tolist(), cpks.tolist())
+        mins, maxs = sorted_values[starts].tolist(), sorted_values[ends].tolist()
+
+        stats = {}
+        for group in np.argsort(first).tolist():
+            stats[tests[group]] = {
+                'count': counts[group],
+                'mean': means[group],
+                'median': medians[group],
+                'stdev': stdevs[group],
+                'min': mins[group],
+                'max': maxs[group],
+                'cpk': cpks[group]
+            }
+
+        return stats
+
+    def analyze_by_test(self, results: Optional[Iterable[TestResult]] = None) -> Dict[int, Dict[str, Any]]:
+        """Analyze results grouped by test number
+
+        ``results`` may be a stream such as ``STDFParser.iter_test_results()``;
+        only the measured values are kept. Defaults to the parsed results.
+        """
+        if results is not None:
+            return self._aggregate_rows(results)
+        # Copied: the memoized statistics are shared with later calls and cache hits
+        return {test_num: dict(group) for test_num, group in self._test_stats().items()}
 
     def find_outliers(self, sigma: float = 3.0) -> List[TestResult]:
         """Find outlier test results using sigma method"""
-        test_groups: Dict[int, List[TestResult]] = {}
+        return self._cached_results('outliers', lambda: self._outliers(sigma), sigma=sigma)
 
-        for result in self.test_results:
-            if result.test_num not in test_groups:
-                test_groups[result.test_num] = []
-            test_groups[result.test_num].append(result)
+    def _outliers(self, sigma: float) -> List[TestResult]:
+        stats = self._test_stats()
+        if self.profiler is not None:
+            with self.profiler.timer('outliers'):
+                return self._find_outliers(stats, sigma)
+        return self._find_outliers(stats, sigma)
 
-        outliers = []
-        for test_num, results in test_groups.items():
-            if len(results) < 3:
-                continue
+    def _find_outliers(self, stats: Dict[int, Dict[str, Any]], sigma: float) -> List[TestResult]:
+        query = getattr(self.parser, 'find_outliers', None)
+        if query is not None:
+            return query(stats, sigma)
 
-            values = [r.result for r in results]
-            mean = statistics.mean(values)
-            stdev = statistics.stdev(values)
+        store = self.test_results
 
-            for result in results:
-                if abs(result.result - mean) > sigma * stdev:
-                    outliers.append(result)
+        if isinstance(store, TestResultStore) and np is not None and len(store):
+            keys = np.fromiter(stats, dtype=np.int64, count=len(stats))
+            means = np.array([group['mean'] for group in stats.values()])
+            limits = np.array([sigma * group['stdev'] if group['count'] >= 3 else np.inf
+                               for group in stats.values()])
 
-        return outliers
+            by_key = np.argsort(keys)
+            test_nums = np.frombuffer(store.test_num, dtype=np.uintc)
+            group_index = by_key[np.searchsorted(keys[by_key], test_nums)]
+            values = np.frombuffer(store.result, dtype=np.float64)
 
-    def calculate_cpk(self, test_num: int) -> float:
-        """Calculate Cpk (Process Capability Index) for a specific test"""
-        results = [r for r in self.test_results if r.test_num == test_num]
+            rows = np.flatnonzero(np.abs(values - means[group_index]) > limits[group_index])
+            # Report grouped by test (first appearance), then in file order
+            rows = rows[np.argsort(group_index[rows], kind='stable')]
+            return [store[i] for i in rows.tolist()]
 
-        if not results or len(results) < 2:
-            return 0.0
+        thresholds = {test_num: (group['mean'], sigma * group['stdev'])
+                      for test_num, group in stats.items() if group['count'] >= 3}
+        grouped: Dict[int, list] = {test_num: [] for test_num in thresholds}
 
-        values = [r.result for r in results]
-        mean = statistics.mean(values)
-        stdev = statistics.stdev(values)
+        if isinstance(store, TestResultStore):
+            for index, (test_num, value) in enumerate(zip(store.test_num, store.result)):
+                threshold = thresholds.get(test_num)
+                if threshold is not None and abs(value - threshold[0]) > threshold[1]:
+                    grouped[test_num].append(index)
+            return [store[i] for rows in grouped.values() for i in rows]
 
-        if stdev == 0:
-            return 0.0
+        for result in store:
+            threshold = thresholds.get(result.test_num)
+            if threshold is not None and abs(result.result - threshold[0]) > threshold[1]:
+                grouped[result.test_num].append(result)
+        return [result for rows in grouped.values() for result in rows]
 
-        # Use first result's limits
-        usl = results[0].high_limit  # Upper Specification Limit
-        lsl = results[0].low_limit   # Lower Specification Limit
+    def calculate_cpk(self, test_num: int, results: Optional[Iterable[TestResult]] = None) -> float:
+        """Calculate Cpk (Process Capability Index) for a specific test
 
-        cpu = (usl - mean) / (3 * stdev)
-        cpl = (mean - lsl) / (3 * stdev)
+        ``results`` may be a stream; defaults to the parsed results.
+        """
+        if results is not None:
+            results = (r for r in results if r.test_num == test_num)
+            stats = self._aggregate_rows(results)
+        else:
+            stats = self._test_stats()
 
-        return min(cpu, cpl)
+        if test_num not in stats:
+            return 0.0
+        return stats[test_num]['cpk']
 
-    def get_failing_tests(self) -> List[TestResult]:
+    def get_failing_tests(self, results: Optional[Iterable[TestResult]] = None) -> List[TestResult]:
         """Get all failing test results"""
-        return [r for r in self.test_results if not r.pass_fail]
+        if results is None:
+            return self._cached_results('failing', self._failing_tests)
+        return [r for r in results if not r.pass_fail]
+
+    def _failing_tests(self) -> List[TestResult]:
+        query = getattr(self.parser, 'failing_tests', None)
+        if query is not None:
+            return query()
+        results = self.test_results
+        if isinstance(results, TestResultStore):
+            return [results[i] for i, passed in enumerate(results.pass_fail) if not passed]
+        return [r for r in results if not r.pass_fail]
+
+    def streaming(self, results: Optional[Iterable[TestResult]] = None) -> 'StreamingAnalyzer':
+        """Fold results into a ``StreamingAnalyzer`` (O(#tests) memory)
+
+        Pass a stream such as ``STDFParser.iter_test_results()`` to analyze a
+        file without keeping its values; defaults to the parsed results.
+        """
+        analyzer = StreamingAnalyzer()
+        analyzer.fold(self.test_results if results is None else results)
+        return analyzer
+
+    @property
+    def bin_summary(self) -> BinSummary:
+        """Bins, yield and wafer maps collected from the parser's PRRs"""
+        summary = getattr(self.parser, 'bin_summary', None)
+        return summary if summary is not None else BinSummary()
+
+    def bin_counts(self, kind: str = 'hard', by_site: bool = False) -> Dict[Any, Any]:
+        """Part counts per 'hard' or 'soft' bin, optionally per (head, site)"""
+        return self.bin_summary.bin_counts(kind, by_site)
+
+    def wafer_yields(self) -> List[Dict[str, Any]]:
+        """Part/die counts and yield of every wafer"""
+        return self.bin_summary.wafer_yields()
+
+    def wafer_map(self, wafer: Any = 0, kind: str = 'hard') -> WaferGrid:
+        """Dense bin grid of a wafer, by position or WAFER_ID"""
+        return self.bin_summary.find_wafer(wafer).grid(kind)
+
+    @property
+    def parts(self) -> PartIndex:
+        """Part table and part -> result rows index from the parser"""
+        parts = getattr(self.parser, 'parts', None)
+        return parts if parts is not None else PartIndex()
+
+    def part_results(self, part_id: Optional[str] = None, hard_bin: Optional[int] = None,
+                     soft_bin: Optional[int] = None, x: Optional[int] = None,
+                     y: Optional[int] = None) -> List[TestResult]:
+        """Test results of the parts matching every given PRR field, in file order
+
+        E.g. ``part_results(hard_bin=7)`` for the parametrics of bin 7 parts;
+        pass the list to ``analyze_by_test()`` for their statistics.
+        """
+        parts = self.parts
+        store = self.test_results
+        return [store[row] for row in parts.rows_for(parts.find(part_id, hard_bin, soft_bin, x, y))]
 
     def generate_report(self) -> str:
         """Generate comprehensive analysis report"""
+        return self._cached('report', self._report, path=self.parser.filepath)
+
+    def _report(self) -> str:
         analysis = self.analyze_by_test()
         failing = self.get_failing_tests()
         outliers = self.find_outliers()
+        total = sum(stats['count'] for stats in analysis.values())
 
         report = f"""
 {'='*60}
@@ -98,7 +379,7 @@ STDF Data Analysis Report
 {'='*60}
 
 File: {self.parser.filepath}
-Total Tests: {len(self.test_results)}
+Total Tests: {total}
 Unique Test Numbers: {len(analysis)}
 
 Test Statistics:
@@ -106,7 +387,6 @@ Test Statistics:
 """
 
         for test_num, stats in analysis.items():
-            cpk = self.calculate_cpk(test_num)
             report += f"""
 Test #{test_num}:
   Count:    {stats['count']}
@@ -115,7 +395,7 @@ Test #{test_num}:
   Std Dev:  {stats['stdev']:.4f}
   Min:      {stats['min']:.4f}
   Max:      {stats['max']:.4f}
-  Cpk:      {cpk:.2f}
+  Cpk:      {stats['cpk']:.2f}
 """
 
         report += f"""
@@ -125,4 +405,116 @@ Outliers Detected: {len(outliers)}
 {'-'*60}
 """
 
+        bins = self.bin_summary
+        if bins.part_count:
+            part_stats = bins.statistics()
+            report += f"""
+Parts: {part_stats['part_count']}  Good: {part_stats['good_count']}  Yield: {part_stats['yield_rate']:.2f}%
+Hard Bins: {', '.join(f'{b}={n}' for b, n in bins.bin_counts('hard').items())}
+Soft Bins: {', '.join(f'{b}={n}' for b, n in bins.bin_counts('soft').items())}
+"""
+            for wafer in bins.wafer_yields():
+                report += (f"Wafer {wafer['wafer_id'] or '-'} (head {wafer['head_num']}): "
+                           f"{wafer['dies']} dies, yield {wafer['yield_rate']:.2f}%\n")
+            report += f"{'-'*60}\n"
+
         return report
+
+
+class StreamingAnalyzer:
+    """Per-test statistics folded one result at a time
+
+    Each test keeps a ``RunningStats`` (Welford mean/variance, min/max and a
+    quantile sketch for the median), so memory is O(#tests) however many
+    results are folded in. Analyzers of different files or workers can be
+    combined with ``merge()``.
+    """
+
+    def __init__(self, compression: int = 100):
+        self.compression = compression
+        self.tests: Dict[int, RunningStats] = {}
+        self.total_tests = 0
+        self.pass_count = 0
+
+    def add(self, result: TestResult) -> None:
+        """Fold in one ``TestResult``"""
+        self.add_row(result.test_num, result.test_name, result.result, result.unit,
+                     result.low_limit, result.high_limit, result.pass_fail)
+
+    def add_row(self, *row) -> None:
+        """Fold in one result given as the fields of a ``ResultRow``"""
+        test_num, _name, value, _unit, low_limit, high_limit, pass_fail = row
+        self.total_tests += 1
+        if pass_fail:
+            self.pass_count += 1
+        stats = self.tests.get(test_num)
+        if stats is None:
+            stats = self.tests[test_num] = RunningStats(low_limit, high_limit, self.compression)
+        stats.add(value)
+
+    def fold(self, results: Iterable[TestResult]) -> 'StreamingAnalyzer':
+        """Fold in every result of an iterable or stream"""
+        add_row = self.add_row
+        if isinstance(results, TestResultStore):
+            for row in zip(results.test_num, results.name_id, results.result, results.unit_id,
+                           results.low_limit, results.high_limit, results.pass_fail):
+                add_row(*row)
+        else:
+            for result in results:
+                add_row(result.test_num, result.test_name, result.result, result.unit,
+                        result.low_limit, result.high_limit, result.pass_fail)
+        return self
+
+    def merge(self, other: 'StreamingAnalyzer') -> 'StreamingAnalyzer':
+        """Fold another analyzer's state into this one"""
+        for test_num, other_stats in other.tests.items():
+            stats = self.tests.get(test_num)
+            if stats is None:
+                stats = self.tests[test_num] = RunningStats(compression=self.compression)
+            stats.merge(other_stats)
+        self.total_tests += other.total_tests
+        self.pass_count += other.pass_count
+        return self
+
+    def statistics(self) -> Dict[str, Any]:
+        """Pass/fail counts and yield of everything folded in"""
+        total = self.total_tests
+        return {
+            'total_tests': total,
+            'pass_count': self.pass_count,
+            'fail_count': total - self.pass_count,
+            'yield_rate': (self.pass_count / total * 100) if total else 0.0
+        }
+
+    def analyze_by_test(self) -> Dict[int, Dict[str, Any]]:
+        """Per-test statistics, as ``STDFAnalyzer.analyze_by_test()`` (median approximate)"""
+        return {test_num: stats.describe() for test_num, stats in self.tests.items()}
+
+    def calculate_cpk(self, test_num: int) -> float:
+        stats = self.tests.get(test_num)
+        if stats is None:
+            return 0.0
+        return _cpk(stats.count, stats.mean, stats.stdev, stats.low_limit, stats.high_limit)
+
+    def quantile(self, test_num: int, q: float) -> float:
+        """Approximate q-quantile of one test's values"""
+        return self.tests[test_num].sketch.quantile(q)
+
+    def outlier_thresholds(self, sigma: float = 3.0) -> Dict[int, Tuple[float, float]]:
+        """(low, high) outlier bounds per test with at least 3 values"""
+        thresholds = {}
+        for test_num, stats in self.tests.items():
+            bounds = stats.outlier_bounds(sigma)
+            if bounds is not None:
+                thresholds[test_num] = bounds
+        return thresholds
+
+    def find_outliers(self, results: Iterable[TestResult], sigma: float = 3.0) -> List[TestResult]:
+        """Outliers of a second pass over the results, using the folded state"""
+        thresholds = self.outlier_thresholds(sigma)
+        outliers = []
+        for result in results:
+            bounds = thresholds.get(result.test_num)
+            if bounds is not None and not bounds[0] <= result.result <= bounds[1]:
+                outliers.append(result)
+        return outliers
@@ -0,0 +1,395 @@
+"""Performance benchmarks for the STDF parser
+
+``python -m stdf.bench`` runs the decoder and writer micro-benchmarks; ``stdf bench``
+runs the throughput suite (``run_suite``) over generated fixture files.
+"""
+
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from . import __version__
+from .analyzer import STDFAnalyzer
+from .decoders import DECODERS
+from .generator import STDFGenerator
+from .parser import HEADER, STDFParser, STDFRecord
+from .records import ParametricTestRecord, RecordType
+from .writer import STDFWriter
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def _legacy_parse_record(parser: STDFParser, record: STDFRecord) -> Optional[tuple]:
+    """Reference: the original if/elif dispatch with per-field struct.unpack
+    calls and simplified PTR decoding (the current parser decodes full PTRs)"""
+    rec_id = (record.rec_type << 8) | record.rec_sub
+
+    if rec_id == RecordType.MIR:
+        data = record.data
+        if len(data) >= 8:
+            parser.file_info['setup_time'] = struct.unpack('<I', data[0:4])[0]
+            parser.file_info['start_time'] = struct.unpack('<I', data[4:8])[0]
+    elif rec_id == RecordType.PTR:
+        data = record.data
+        if len(data) < 8:
+            return None
+        test_num = struct.unpack('<I', data[0:4])[0]
+        result = struct.unpack('<f', data[4:8])[0]
+        return (test_num, f'Test_{test_num}', result, 'V', 0.0, 5.0, 0.0 <= result <= 5.0)
+    return None
+
+
+def _legacy_decode_ptr(data: bytes) -> ParametricTestRecord:
+    """Reference: field-by-field PTR decode with format strings and slices"""
+    test_num = struct.unpack('<I', data[0:4])[0]
+    head_num, site_num, test_flg, parm_flg = struct.unpack('<BBBB', data[4:8])
+    result = struct.unpack('<f', data[8:12])[0]
+    pos = 12
+    n = data[pos]
+    test_txt = data[pos + 1:pos + 1 + n].decode('latin-1')
+    pos += 1 + n
+    n = data[pos]
+    alarm_id = data[pos + 1:pos + 1 + n].decode('latin-1')
+    pos += 1 + n
+    opt_flag = struct.unpack('<B', data[pos:pos + 1])[0]
+    res_scal, llm_scal, hlm_scal = struct.unpack('<bbb', data[pos + 1:pos + 4])
+    lo_limit = struct.unpack('<f', data[pos + 4:pos + 8])[0]
+    hi_limit = struct.unpack('<f', data[pos + 8:pos + 12])[0]
+    pos += 12
+    n = data[pos]
+    units = data[pos + 1:pos + 1 + n].decode('latin-1')
+    return ParametricTestRecord(test_num, head_num, site_num, test_flg, parm_flg, result,
+                                test_txt, alarm_id, opt_flag, res_scal, llm_scal, hlm_scal,
+                                lo_limit, hi_limit, units)
+
+
+def _ptr_payload(test_num: int, result: float) -> bytes:
+    name = f'Test_{test_num}'.encode()
+    return (struct.pack('<IBBBBf', test_num, 1, 1, 0, 0, result)
+            + bytes([len(name)]) + name + b'\0'
+            + struct.pack('<Bbbbff', 0, 0, 0, 0, 0.0, 5.0) + b'\x01V')
+
+
+def _time_per_item(func: Callable[[], Any], count: int, repeat: int) -> float:
+    """Best-of-repeat wall time per item, in nanoseconds (GC paused, as timeit)"""
+    best = float('inf')
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return best / count * 1e9
+
+
+def bench_decoders(num_records: int = 200_000, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """Per-record cost of record dispatch and PTR decoding, old vs new
+
+    Returns ns/record for the legacy and precompiled/table-driven paths
+    plus the speedup ratio.
+    """
+    rng = random.Random(0)
+    mir = STDFRecord(0x01, 0x0A, 8, struct.pack('<II', 1, 2))
+    far = STDFRecord(0x00, 0x0A, 2, b'\x02\x04')
+    records: List[STDFRecord] = [far, mir]
+    ptr_payloads = []
+    for i in range(num_records):
+        payload = _ptr_payload(i % 100, rng.uniform(1.0, 4.0))
+        ptr_payloads.append(payload)
+        records.append(STDFRecord(RecordType.PTR >> 8, RecordType.PTR & 0xFF, len(payload), payload))
+
+    parser = STDFParser('bench.stdf')
+    parse_record = parser._parse_record
+    decode_ptr = DECODERS[(RecordType.PTR >> 8, RecordType.PTR & 0xFF)]
+
+    results = {}
+    dispatch_old = _time_per_item(lambda: [_legacy_parse_record(parser, r) for r in records],
+                                  len(records), repeat)
+    dispatch_new = _time_per_item(lambda: [parse_record(r) for r in records], len(records), repeat)
+    results['dispatch'] = {'legacy_ns': dispatch_old, 'new_ns': dispatch_new,
+                           'speedup': dispatch_old / dispatch_new}
+
+    decode_old = _time_per_item(lambda: [_legacy_decode_ptr(p) for p in ptr_payloads],
+                                len(ptr_payloads), repeat)
+    decode_new = _time_per_item(lambda: [decode_ptr(p, 0, len(p)) for p in ptr_payloads],
+                                len(ptr_payloads), repeat)
+    results['ptr_decode'] = {'legacy_ns': decode_old, 'new_ns': decode_new,
+                             'speedup': decode_old / decode_new}
+
+    return results
+
+
+def _legacy_write(path: str, records: List[ParametricTestRecord]) -> None:
+    """Reference: ``STDFGenerator._add_record`` per record, then ``_write_file``"""
+    generator = STDFGenerator(path)
+    for ptr in records:
+        test_txt = ptr.test_txt.encode('latin-1')
+        alarm_id = ptr.alarm_id.encode('latin-1')
+        units = ptr.units.encode('latin-1')
+        data = (struct.pack('<IBBBBf', ptr.test_num, ptr.head_num, ptr.site_num, ptr.test_flg,
+                            ptr.parm_flg, ptr.result)
+                + struct.pack('<B', len(test_txt)) + test_txt
+                + struct.pack('<B', len(alarm_id)) + alarm_id
+                + struct.pack('<Bbbbff', ptr.opt_flag, ptr.res_scal, ptr.llm_scal, ptr.hlm_scal,
+                              ptr.lo_limit, ptr.hi_limit)
+                + struct.pack('<B', len(units)) + units)
+        generator._add_record(0x0F, 0x0A, data)
+    generator._write_file()
+
+
+def _writer_write(path: str, records: List[ParametricTestRecord]) -> None:
+    with STDFWriter(path) as writer:
+        writer.write_records(records)
+
+
+def bench_writer(num_records: int = 200_000, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """Per-record cost of serializing PTRs to a file, generator vs ``STDFWriter``"""
+    rng = random.Random(0)
+    records = [ParametricTestRecord(i % 100, 1, 1 + i % 4, 0, 0, rng.uniform(1.0, 4.0), f'Test_{i % 100}',
+                                    '', 0x0E, 0, 0, 0, 0.0, 5.0, 'V')
+               for i in range(num_records)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'write.stdf')
+        write_old = _time_per_item(lambda: _legacy_write(path, records), len(records), repeat)
+        write_new = _time_per_item(lambda: _writer_write(path, records), len(records), repeat)
+    return {'ptr_write': {'legacy_ns': write_old, 'new_ns': write_new, 'speedup': write_old / write_new}}
+
+
+_PTR_KEY = (RecordType.PTR >> 8, RecordType.PTR & 0xFF)
+
+
+def _eager_fields(parser: STDFParser) -> List[tuple]:
+    fields = []
+    for record in parser.iter_records():
+        if (record.rec_type, record.rec_sub) == _PTR_KEY:
+            ptr = parser.decode_record(record)
+            fields.append((ptr.test_num, ptr.result))
+    return fields
+
+
+def _lazy_fields(parser: STDFParser) -> List[tuple]:
+    return [(record.test_num, record.result) for record in parser.iter_records(lazy=True)
+            if (record.rec_type, record.rec_sub) == _PTR_KEY]
+
+
+def bench_lazy(num_records: int = 200_000, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """Per-record cost of reading two PTR fields of a mapped file, decoded records vs lazy views"""
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'lazy.stdf')
+        with open(path, 'wb') as f:
+            for i in range(num_records):
+                payload = _ptr_payload(i % 100, rng.uniform(1.0, 4.0))
+                f.write(HEADER.pack(len(payload), *_PTR_KEY) + payload)
+
+        with STDFParser(path, use_mmap=True) as parser:
+            fields_old = _time_per_item(lambda: _eager_fields(parser), num_records, repeat)
+            fields_new = _time_per_item(lambda: _lazy_fields(parser), num_records, repeat)
+    return {'lazy_fields': {'legacy_ns': fields_old, 'new_ns': fields_new, 'speedup': fields_old / fields_new}}
+
+
+# Default fixture sizes of the throughput suite
+DEFAULT_SIZES = (1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+
+# Fixture shape: tests per part and sites per touchdown
+FIXTURE_TESTS = 100
+FIXTURE_SITES = 4
+
+ANALYZER_METHODS = ('analyze_by_test', 'find_outliers', 'calculate_cpk',
+                    'get_failing_tests', 'generate_report')
+
+
+def _peak_rss(children: bool = False) -> Optional[int]:
+    """Peak resident set size in bytes of this process (or its children)"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def fixture_path(workdir: str, size: int) -> str:
+    """Generate (once) a seeded bulk fixture of roughly ``size`` bytes"""
+    path = os.path.join(workdir, f'bench_{size}.stdf')
+    if not os.path.exists(path):
+        parts = max(1, size // STDFGenerator.bulk_part_size(FIXTURE_TESTS))
+        STDFGenerator(path).generate_bulk(num_parts=parts, num_tests=FIXTURE_TESTS,
+                                          num_sites=FIXTURE_SITES, seed=0)
+    return path
+
+
+def _case_parse(path: str, use_mmap: bool) -> Dict[str, Any]:
+    with STDFParser(path, use_mmap=use_mmap) as parser:
+        start = time.perf_counter()
+        parser.parse()
+        seconds = time.perf_counter() - start
+        return {'seconds': seconds, 'records': len(parser.records), 'peak_rss': _peak_rss()}
+
+
+def _case_analyzer(path: str, method: str) -> Dict[str, Any]:
+    parser = STDFParser(path)
+    parser.parse()
+    analyzer = STDFAnalyzer(parser)
+    args = (parser.test_results.test_num[0],) if method == 'calculate_cpk' else ()
+
+    start = time.perf_counter()
+    getattr(analyzer, method)(*args)
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'records': len(parser.records), 'peak_rss': _peak_rss()}
+
+
+def _case_export_csv(path: str) -> Dict[str, Any]:
+    parser = STDFParser(path)
+    parser.parse()
+    output = path + '.csv'
+
+    start = time.perf_counter()
+    parser.export_csv(output)
+    seconds = time.perf_counter() - start
+    os.remove(output)
+    return {'seconds': seconds, 'records': len(parser.records), 'peak_rss': _peak_rss()}
+
+
+def _case_cli(path: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'stdf.cli', 'parse', path, '--summary'],
+                   stdout=subprocess.DEVNULL, check=True)
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'records': None, 'peak_rss': _peak_rss(children=True)}
+
+
+def _run_isolated(func: Callable[..., Dict[str, Any]], *args: Any) -> Dict[str, Any]:
+    """Run one case in a fresh interpreter so its peak RSS is its own"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(func, *args).result()
+
+
+def run_suite(sizes: Iterable[int] = DEFAULT_SIZES, workdir: Optional[str] = None,
+              cli: bool = True, repeat: int = 3,
+              progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Time parse, analyzer methods, CSV export and the CLI on fixture files
+
+    Each case runs ``repeat`` times, each in its own process, and the best
+    time is reported; the parse that analyzer and export cases need is not
+    timed but is included in their peak RSS. Fixtures
+    are generated into ``workdir`` (a temporary directory by default) and
+    reused if already there.
+    """
+    cases = [('parse', _case_parse, (False,)), ('parse_mmap', _case_parse, (True,))]
+    cases += [(f'analyzer.{method}', _case_analyzer, (method,)) for method in ANALYZER_METHODS]
+    cases.append(('export_csv', _case_export_csv, ()))
+    if cli:
+        cases.append(('cli_parse', _case_cli, ()))
+
+    temp_dir = None
+    if workdir is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        workdir = temp_dir.name
+
+    results = []
+    try:
+        for size in sizes:
+            path = fixture_path(workdir, size)
+            file_size = os.path.getsize(path)
+            records = None
+            for name, func, args in cases:
+                timings = [_run_isolated(func, path, *args) for _ in range(max(1, repeat))]
+                timing = min(timings, key=lambda t: t['seconds'])
+                records = timing['records'] or records
+                seconds = timing['seconds']
+                entry = {
+                    'case': name,
+                    'size': size,
+                    'file_bytes': file_size,
+                    'records': records,
+                    'seconds': seconds,
+                    'records_per_s': records / seconds if records and seconds else None,
+                    'mb_per_s': file_size / 1e6 / seconds if seconds else None,
+                    'peak_rss_mb': timing['peak_rss'] / 1e6 if timing['peak_rss'] else None
+                }
+                results.append(entry)
+                if progress is not None:
+                    progress(entry)
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    return {
+        'version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def save_results(report: Dict[str, Any], path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = 0.10) -> List[Dict[str, Any]]:
+    """Cases present in both reports, with the relative change in time
+
+    ``regression`` is set when a case got slower by more than ``threshold``.
+    """
+    before = {(r['case'], r['size']): r for r in baseline['results']}
+    changes = []
+    for result in current['results']:
+        old = before.get((result['case'], result['size']))
+        if old is None or not old['seconds']:
+            continue
+        change = result['seconds'] / old['seconds'] - 1
+        changes.append({
+            'case': result['case'],
+            'size': result['size'],
+            'baseline_seconds': old['seconds'],
+            'seconds': result['seconds'],
+            'change': change,
+            'regression': change > threshold
+        })
+    return changes
+
+
+def format_result(entry: Dict[str, Any]) -> str:
+    """One line of the suite's progress output"""
+    rate = f"{entry['records_per_s']:>12,.0f} rec/s" if entry['records_per_s'] else ' ' * 18
+    rss = f"{entry['peak_rss_mb']:8.1f} MB RSS" if entry['peak_rss_mb'] else ''
+    return (f"{entry['size'] / 1024 ** 2:8.0f} MB  {entry['case']:28s} {entry['seconds']:9.3f} s "
+            f"{rate} {entry['mb_per_s']:9.1f} MB/s {rss}")
+
+
+def print_micro(results: Dict[str, Dict[str, float]]) -> None:
+    """Print micro-benchmark timings"""
+    for name, timing in results.items():
+        print(f"{name:12s} legacy {timing['legacy_ns']:8.1f} ns/rec   "
+              f"new {timing['new_ns']:8.1f} ns/rec   speedup {timing['speedup']:.2f}x")
+
+
+def main() -> None:
+    print_micro({**bench_decoders(), **bench_writer(), **bench_lazy()})
+
+
+if __name__ == '__main__':
+    main()
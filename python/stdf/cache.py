@@ -0,0 +1,198 @@
+"""Two-tier cache of analysis results keyed by file fingerprint
+
+``AnalysisCache`` memoizes values such as ``STDFAnalyzer`` statistics,
+outliers and reports. Keys combine a file's fingerprint (size, mtime and
+content hash, see ``index.file_fingerprint``) with the name of the
+analysis and its parameters, so a changed file never hits old entries.
+
+Entries live in an in-process LRU of ``max_entries`` values and, with a
+``cache_dir``, in pickle files shared across processes, evicted oldest
+first beyond ``max_disk_bytes``. Only point ``cache_dir`` at a directory
+you trust: entries are unpickled on load.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from .index import file_fingerprint
+
+CACHE_SUFFIX = '.pkl'
+CACHE_VERSION = 1
+
+# Default bounds of the two tiers
+MAX_ENTRIES = 128
+MAX_DISK_BYTES = 256 * 1024 * 1024
+
+_MISSING = object()
+
+
+class AnalysisCache:
+    """In-process LRU plus optional on-disk cache of analysis results
+
+    Cached values are shared, not copied, by the in-process tier; treat
+    them as read-only.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, cache_dir: Optional[str] = None,
+                 max_disk_bytes: int = MAX_DISK_BYTES, full_hash: bool = False):
+        self.max_entries = max_entries
+        self.cache_dir = None if cache_dir is None else os.path.expanduser(cache_dir)
+        self.max_disk_bytes = max_disk_bytes
+        self.full_hash = full_hash
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, Any]' = OrderedDict()
+        # abspath -> (size, mtime_ns, file id); file ids ever seen per abspath
+        self._fingerprints: Dict[str, Tuple[int, int, str]] = {}
+        self._file_ids: Dict[str, Set[str]] = {}
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def file_id(self, filepath: str) -> str:
+        """Identifier of the file's current version; hashed again only if its size or mtime changed"""
+        path = os.path.abspath(filepath)
+        stat = os.stat(path)
+        known = self._fingerprints.get(path)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            return known[2]
+
+        fingerprint = file_fingerprint(path, self.full_hash)
+        file_id = hashlib.sha256(json.dumps(
+            [CACHE_VERSION, fingerprint['size'], fingerprint['mtime_ns'], fingerprint['sha256']]
+        ).encode('ascii')).hexdigest()[:32]
+        self._fingerprints[path] = (fingerprint['size'], fingerprint['mtime_ns'], file_id)
+        self._file_ids.setdefault(path, set()).add(file_id)
+        return file_id
+
+    def key(self, filepath: str, name: str, **params: Any) -> str:
+        """Key of an analysis of a file with the given (JSON-serializable) parameters"""
+        digest = hashlib.sha256(json.dumps([name, params], sort_keys=True, default=repr).encode('utf-8'))
+        return f'{self.file_id(filepath)}-{digest.hexdigest()[:32]}'
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Cached value of a key, from memory or disk; ``default`` if absent"""
+        value = self._entries.get(key, _MISSING)
+        if value is not _MISSING:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+        value = self._load(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store a value in both tiers"""
+        self._remember(key, value)
+        if self.cache_dir is not None:
+            self._save(key, value)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Cached value of a key, computing and storing it on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def invalidate(self, filepath: str) -> int:
+        """Drop every entry of a file, for all its versions seen; returns the entries dropped"""
+        path = os.path.abspath(filepath)
+        file_ids = self._file_ids.get(path, set())
+        if os.path.exists(path):
+            file_ids.add(self.file_id(path))  # entries on disk may predate this process
+        self._file_ids.pop(path, None)
+        self._fingerprints.pop(path, None)
+        prefixes = tuple(f'{file_id}-' for file_id in file_ids)
+        if not prefixes:
+            return 0
+
+        dropped = [key for key in self._entries if key.startswith(prefixes)]
+        for key in dropped:
+            del self._entries[key]
+        removed = set(dropped)
+        for entry in self._disk_entries():
+            if entry.name.startswith(prefixes):
+                removed.add(entry.name[:-len(CACHE_SUFFIX)])
+                _remove(entry.path)
+        return len(removed)
+
+    def clear(self) -> None:
+        """Drop every entry of both tiers"""
+        self._entries.clear()
+        for entry in self._disk_entries():
+            _remove(entry.path)
+
+    def _remember(self, key: str, value: Any) -> None:
+        entries = self._entries
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def _load(self, key: str) -> Any:
+        if self.cache_dir is None:
+            return _MISSING
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)  # most recently used
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return _MISSING
+        return value
+
+    def _save(self, key: str, value: Any) -> None:
+        """Write an entry atomically, then evict the oldest beyond ``max_disk_bytes``"""
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            _remove(tmp_path)
+            return  # e.g. a full or read-only disk; the value stays cached in memory
+
+        entries = []
+        total = 0
+        for entry in self._disk_entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total += stat.st_size
+        entries.sort()
+        for _mtime, size, entry_path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            _remove(entry_path)
+            total -= size
+
+    def _disk_entries(self) -> list:
+        if self.cache_dir is None:
+            return []
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                return [entry for entry in entries if entry.name.endswith(CACHE_SUFFIX)]
+        except OSError:
+            return []
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
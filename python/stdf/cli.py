@@ -2,11 +2,360 @@
 """Command-line interface for STDF parser"""
 
 import argparse
+import random
 import sys
+import time
+from contextlib import nullcontext
 from pathlib import Path
-from .parser import STDFParser
+from typing import Optional, Union
+from .parser import RecordType, STDFParser
 from .analyzer import STDFAnalyzer
-from .generator import STDFGenerator
+from .generator import MAX_SITES, STDFGenerator
+from .export import FORMATS, export_results
+from .follow import follow
+from .parallel import ParsedFiles, parse_chunked, parse_many
+from .profiling import Profiler
+from .wafer import BIN_KINDS, render_grid
+
+
+def _parse_types(value: str):
+    """Comma-separated record type names, e.g. 'PTR,MIR'"""
+    try:
+        return {RecordType[name.strip().upper()] for name in value.split(',') if name.strip()}
+    except KeyError as e:
+        raise argparse.ArgumentTypeError(f'unknown record type {e.args[0]}')
+
+
+def _parse_int_set(value: str):
+    """Comma-separated integers, e.g. '1005,1006'"""
+    try:
+        return {int(num) for num in value.split(',') if num.strip()}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid numbers: {value}')
+
+
+def _parse_bounds(value: str):
+    """Grid bounds 'X_MIN,X_MAX,Y_MIN,Y_MAX', e.g. '-50,50,-50,50'"""
+    try:
+        x_min, x_max, y_min, y_max = (int(num) for num in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid bounds: {value} (expected X_MIN,X_MAX,Y_MIN,Y_MAX)')
+    return x_min, x_max, y_min, y_max
+
+
+def _parse_site_count(value: str) -> int:
+    """Number of sites, 1..255 (SITE_NUM is a U1)"""
+    try:
+        sites = int(value)
+    except ValueError:
+        sites = 0
+    if not 1 <= sites <= MAX_SITES:
+        raise argparse.ArgumentTypeError(f'invalid site count: {value} (expected 1..{MAX_SITES})')
+    return sites
+
+
+def _parse_size(value: str) -> int:
+    """Byte size with an optional K/M/G suffix, e.g. '500M'"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    try:
+        if value and value[-1].upper() in units:
+            return int(float(value[:-1]) * units[value[-1].upper()])
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid size: {value}')
+
+
+def _phase(profiler: Optional[Profiler], name: str):
+    """Time a block under ``name`` when profiling"""
+    return profiler.timer(name) if profiler is not None else nullcontext()
+
+
+def _write_profile(profiler: Profiler, path: Optional[str]) -> None:
+    """Print the profile as JSON to stderr, or save it to ``path``"""
+    if path:
+        with open(path, 'w') as f:
+            f.write(profiler.to_json(indent=2))
+        print(f'Profile saved to: {path}', file=sys.stderr)
+    else:
+        print(profiler.to_json(indent=2), file=sys.stderr)
+
+
+def _parse_parallel(args: argparse.Namespace, profiler: Optional[Profiler]) -> ParsedFiles:
+    """Parse several files, or one file in chunks, in ``args.jobs`` processes"""
+    if len(args.files) > 1:
+        with _phase(profiler, 'parse'):
+            return parse_many(args.files, workers=args.jobs, use_mmap=args.mmap, record_types=args.types,
+                              tests=args.tests, use_index=args.index)
+
+    index = None
+    if args.index:
+        with _phase(profiler, 'index'):
+            index = STDFParser(args.files[0]).load_index()
+    with _phase(profiler, 'parse'):
+        return parse_chunked(args.files[0], workers=args.jobs, use_mmap=args.mmap,
+                             record_types=args.types, tests=args.tests, index=index)
+
+
+def _show_parsed(args: argparse.Namespace, parsed: Union[STDFParser, ParsedFiles]) -> None:
+    """Print the summary and write the exports requested for parsed results"""
+    if args.summary:
+        print(parsed.get_summary())
+
+    if args.csv:
+        parsed.export_csv(args.csv)
+        print(f'Results exported to: {args.csv}')
+
+    if args.output:
+        export_results(args.output, parsed.test_results, args.format)
+        print(f'Results exported to: {args.output}')
+
+
+def _cmd_parse(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    if len(args.files) > 1 or args.jobs > 1:
+        _show_parsed(args, _parse_parallel(args, profiler))
+        return 0
+
+    index = None
+    if args.index:
+        with _phase(profiler, 'index'):
+            index = STDFParser(args.files[0]).load_index()
+
+    with STDFParser(args.files[0], use_mmap=args.mmap, record_types=args.types,
+                    tests=args.tests, index=index, profiler=profiler) as stdf_parser:
+        stdf_parser.parse()
+        _show_parsed(args, stdf_parser)
+    return 0
+
+
+def _cmd_analyze(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    cache = None
+    if args.cache_dir:
+        from .cache import AnalysisCache
+
+        # On a miss the analyzer parses the one file itself, serially
+        if len(args.files) > 1 or args.jobs > 1:
+            raise ValueError('--cache-dir analyzes a single file and cannot be combined with --jobs')
+        cache = AnalysisCache(cache_dir=args.cache_dir)
+
+    if cache is not None:
+        # Parsed by the analyzer only if the report is not cached
+        stdf_parser = STDFParser(args.files[0], profiler=profiler)
+    elif len(args.files) > 1:
+        with _phase(profiler, 'parse'):
+            stdf_parser = parse_many(args.files, workers=args.jobs)
+    elif args.jobs > 1:
+        with _phase(profiler, 'parse'):
+            stdf_parser = parse_chunked(args.files[0], workers=args.jobs)
+    else:
+        stdf_parser = STDFParser(args.files[0], profiler=profiler)
+        stdf_parser.parse()
+
+    analyzer = STDFAnalyzer(stdf_parser, profiler=profiler, cache=cache)
+    with _phase(profiler, 'report'):
+        report = analyzer.generate_report()
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(report)
+        print(f'Report saved to: {args.report}')
+    else:
+        print(report)
+    return 0
+
+
+def _cmd_index(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    with _phase(profiler, 'index'):
+        index = STDFParser(args.file).load_index(cache_dir=args.cache_dir)
+    print(f'Indexed {index.total_records} records, '
+          f'{len(index.test_offsets_by_num)} test numbers')
+    for name, count in index.record_counts().items():
+        print(f'  {name}: {count}')
+    return 0
+
+
+def _cmd_wafermap(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    import json
+
+    # Only bin/wafer records are decoded; PTRs are skipped unread
+    types = {RecordType.MIR, RecordType.WIR, RecordType.WRR, RecordType.PRR}
+    with STDFParser(args.file, record_types=types, profiler=profiler) as stdf_parser:
+        stdf_parser.parse()
+    bins = stdf_parser.bin_summary
+    wafers = bins.wafers if args.wafer is None else [bins.find_wafer(args.wafer)]
+
+    if args.json:
+        report = bins.report(args.bins, bounds=args.clip)
+        if args.wafer is not None:
+            report['wafers'] = [entry for entry, wafer in zip(report['wafers'], bins.wafers)
+                                if wafer in wafers]
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Wafer map saved to: {args.json}')
+        return 0
+
+    stats = bins.statistics()
+    print(f"Parts: {stats['part_count']}  Good: {stats['good_count']}  "
+          f"Yield: {stats['yield_rate']:.2f}%")
+    print(f'{args.bins.capitalize()} bins:')
+    for bin_num, count in bins.bin_counts(args.bins).items():
+        print(f'  {bin_num:5d}: {count:8d} ({count / stats["part_count"] * 100:6.2f}%)')
+    for (head, site), counts in bins.bin_counts(args.bins, by_site=True).items():
+        print(f'  head {head} site {site}: ' + ', '.join(f'{b}={n}' for b, n in counts.items()))
+
+    for wafer in wafers:
+        summary = wafer.summary()
+        print(f"\nWafer {summary['wafer_id'] or '-'} (head {summary['head_num']}): "
+              f"{summary['dies']} dies, {summary['good']} good, yield {summary['yield_rate']:.2f}%")
+        if args.no_map:
+            continue
+        try:
+            grid = wafer.grid(args.bins, bounds=args.clip)
+        except ValueError as e:
+            print(f'No map: {e}; --clip bounds the grid')
+            continue
+        if grid.width:
+            print(f'x {grid.x_min}..{grid.x_min + grid.width - 1}, '
+                  f'y {grid.y_min}..{grid.y_min + grid.height - 1}')
+            print(render_grid(grid))
+    return 0
+
+
+def _cmd_ingest(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    from .database import ResultDatabase
+
+    with ResultDatabase(args.database) as database:
+        for filepath in args.files:
+            with _phase(profiler, 'ingest'):
+                lot = database.ingest_file(filepath, jobs=args.jobs, force=args.force)
+            print(f'{filepath}: ' + ('unchanged, skipped' if lot is None else f'lot {lot}'))
+    return 0
+
+
+def _cmd_history(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    from .database import ResultDatabase
+
+    with ResultDatabase(args.database) as database:
+        if args.test is not None:
+            print(f'Test #{args.test}')
+            print(f"{'lot':>5}  {'lot_id':<16}{'count':>8}{'mean':>12}{'stdev':>12}{'cpk':>8}")
+            for entry in database.test_history(args.test, args.lot):
+                print(f"{entry['lot']:5d}  {entry['lot_id'] or '-':<16}{entry['count']:8d}"
+                      f"{entry['mean']:12.4f}{entry['stdev']:12.4f}{entry['cpk']:8.2f}")
+            return 0
+
+        analyzer = STDFAnalyzer(database.select(args.lot), profiler=profiler)
+        with _phase(profiler, 'report'):
+            print(analyzer.generate_report())
+    return 0
+
+
+def _cmd_split(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    from .tools import split_file
+
+    with _phase(profiler, 'split'):
+        paths = split_file(args.file, args.output_dir, by=args.by)
+    for key, path in paths.items():
+        print(f"{'/'.join(map(str, key))}: {path}")
+    return 0
+
+
+def _cmd_merge(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    from .tools import merge_files
+
+    with _phase(profiler, 'merge'):
+        written = merge_files(args.files, args.output)
+    print(f'Merged {len(args.files)} files into {args.output} ({written} bytes)')
+    return 0
+
+
+def _cmd_filter(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    from .tools import filter_file
+
+    with _phase(profiler, 'filter'):
+        written = filter_file(args.file, args.output, record_types=args.types, heads=args.heads,
+                              sites=args.sites, tests=args.tests, parts=args.parts,
+                              hard_bins=args.hard_bins, soft_bins=args.soft_bins)
+    print(f'Filtered records written to: {args.output} ({written} bytes)')
+    return 0
+
+
+def _cmd_follow(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    def show(incremental):
+        stats = incremental.statistics()
+        print(f"{time.strftime('%H:%M:%S')} records={incremental.total_records} "
+              f"tests={stats['total_tests']} pass={stats['pass_count']} "
+              f"fail={stats['fail_count']} yield={stats['yield_rate']:.2f}%", flush=True)
+
+    try:
+        follow(args.file, show, interval=args.interval, count=args.count)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _cmd_serve(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    import asyncio
+    from .aio import serve
+
+    print(f'Listening on http://{args.host}:{args.port} (POST an STDF file)', flush=True)
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_concurrent, args.max_body_mb * 1024 * 1024))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _cmd_bench(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    import json
+    from . import bench
+
+    sizes = [_parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    if args.workdir:
+        Path(args.workdir).mkdir(parents=True, exist_ok=True)
+    report = bench.run_suite(sizes, workdir=args.workdir, cli=not args.no_cli, repeat=args.repeat,
+                             progress=lambda entry: print(bench.format_result(entry), flush=True))
+    if args.micro:
+        report['decoders'] = bench.bench_decoders()
+        report['writer'] = bench.bench_writer()
+        report['lazy'] = bench.bench_lazy()
+        bench.print_micro({**report['decoders'], **report['writer'], **report['lazy']})
+
+    if args.json:
+        bench.save_results(report, args.json)
+        print(f'Results saved to: {args.json}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        changes = bench.compare_results(baseline, report, args.threshold)
+        for change in changes:
+            flag = '  REGRESSION' if change['regression'] else ''
+            print(f"{change['size'] / 1024 ** 2:8.0f} MB  {change['case']:28s} "
+                  f"{change['baseline_seconds']:9.3f} s -> {change['seconds']:9.3f} s "
+                  f"({change['change']:+.1%}){flag}")
+        if any(change['regression'] for change in changes):
+            return 2
+    return 0
+
+
+def _cmd_generate(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    generator = STDFGenerator(args.output)
+    if args.parts is None and args.size is None:
+        if args.seed is not None:
+            random.seed(args.seed)
+        with _phase(profiler, 'generate'):
+            generator.generate_sample_file(num_tests=args.tests)
+        print(f'Sample STDF file generated: {args.output}')
+        return 0
+
+    parts = args.parts
+    if parts is None:
+        parts = max(1, args.size // STDFGenerator.bulk_part_size(args.tests))
+    with _phase(profiler, 'generate'):
+        size = generator.generate_bulk(num_parts=parts, num_tests=args.tests,
+                                       num_sites=args.sites, seed=args.seed)
+    print(f'STDF file generated: {args.output} ({parts} parts, {size} bytes)')
+    return 0
 
 
 def main():
@@ -16,21 +365,161 @@ def main():
     )
     subparsers = parser.add_subparsers(dest='command', help='Commands')
 
+    # Options shared by every command
+    profile_options = argparse.ArgumentParser(add_help=False)
+    profile_options.add_argument('--profile', action='store_true',
+                                 help='Report record counts/bytes and io/decode/statistics timings as JSON')
+    profile_options.add_argument('--profile-memory', action='store_true',
+                                 help='Also trace allocations with tracemalloc (slow)')
+    profile_options.add_argument('--profile-output', help='Save the profile JSON here instead of stderr')
+
     # Parse command
-    parse_parser = subparsers.add_parser('parse', help='Parse STDF file')
-    parse_parser.add_argument('file', help='STDF file path')
+    parse_parser = subparsers.add_parser('parse', parents=[profile_options], help='Parse STDF file')
+    parse_parser.set_defaults(func=_cmd_parse)
+    parse_parser.add_argument('files', nargs='+', metavar='file', help='STDF file path(s)')
     parse_parser.add_argument('--csv', help='Export to CSV file')
+    parse_parser.add_argument('--output', '-o', help='Export results to this file (see --format)')
+    parse_parser.add_argument('--format', choices=FORMATS, default='csv',
+                              help='Format for --output (parquet/arrow need pyarrow, npz needs numpy)')
     parse_parser.add_argument('--summary', action='store_true', help='Show summary')
+    parse_parser.add_argument('--mmap', action='store_true',
+                              help='Scan the file through a memory map (zero-copy)')
+    parse_parser.add_argument('--types', type=_parse_types,
+                              help='Only parse these record types, e.g. PTR,MIR')
+    parse_parser.add_argument('--tests', type=_parse_int_set,
+                              help='Only parse PTRs of these test numbers, e.g. 1005,1006')
+    parse_parser.add_argument('--index', action='store_true',
+                              help='Use (and build if needed) the sidecar index to seek to filtered records')
+    parse_parser.add_argument('--jobs', type=int, default=1,
+                              help='Parse in N worker processes (a single file is split into chunks)')
 
     # Analyze command
-    analyze_parser = subparsers.add_parser('analyze', help='Analyze STDF file')
-    analyze_parser.add_argument('file', help='STDF file path')
+    analyze_parser = subparsers.add_parser('analyze', parents=[profile_options],
+                                           help='Analyze STDF file')
+    analyze_parser.set_defaults(func=_cmd_analyze)
+    analyze_parser.add_argument('files', nargs='+', metavar='file', help='STDF file path(s)')
+    analyze_parser.add_argument('--jobs', type=int, default=1,
+                                help='Parse in N worker processes (a single file is split into chunks)')
     analyze_parser.add_argument('--report', help='Save report to file')
+    analyze_parser.add_argument('--cache-dir',
+                                help='Reuse results cached here by file fingerprint (single file, no --jobs)')
+
+    # Index command
+    index_parser = subparsers.add_parser('index', parents=[profile_options],
+                                         help='Build or refresh the sidecar record index')
+    index_parser.set_defaults(func=_cmd_index)
+    index_parser.add_argument('file', help='STDF file path')
+    index_parser.add_argument('--cache-dir', help='Store the index here instead of next to the file')
+
+    # Wafermap command
+    wafermap_parser = subparsers.add_parser('wafermap', parents=[profile_options],
+                                            help='Bin summary, yield and wafer maps from PRRs')
+    wafermap_parser.set_defaults(func=_cmd_wafermap)
+    wafermap_parser.add_argument('file', help='STDF file path')
+    wafermap_parser.add_argument('--bins', choices=BIN_KINDS, default='hard', help='Bins to map')
+    wafermap_parser.add_argument('--wafer', help='Only this WAFER_ID')
+    wafermap_parser.add_argument('--no-map', action='store_true', help='Omit the text wafer maps')
+    wafermap_parser.add_argument('--json', help='Save counts, yields and grids as JSON')
+    wafermap_parser.add_argument('--clip', type=_parse_bounds, metavar='X_MIN,X_MAX,Y_MIN,Y_MAX',
+                                 help='Leave dies outside these bounds off the maps. Without it, one stray '
+                                      'coordinate can make a wafer too large for a dense map: it is then '
+                                      'not drawn, and --json lists its dies as die_bins')
+
+    # Ingest command
+    ingest_parser = subparsers.add_parser('ingest', parents=[profile_options],
+                                          help='Load STDF files into a SQLite results database')
+    ingest_parser.set_defaults(func=_cmd_ingest)
+    ingest_parser.add_argument('database', help='Database file (created if missing)')
+    ingest_parser.add_argument('files', nargs='+', metavar='file', help='STDF file path(s)')
+    ingest_parser.add_argument('--jobs', type=int, default=1,
+                               help='Parse each file in N worker processes')
+    ingest_parser.add_argument('--force', action='store_true', help='Re-ingest files that did not change')
+
+    # History command
+    history_parser = subparsers.add_parser('history', parents=[profile_options],
+                                           help='Analyze results stored by ingest across lots')
+    history_parser.set_defaults(func=_cmd_history)
+    history_parser.add_argument('database', help='Database file')
+    history_parser.add_argument('--lot', action='append', help='Only this MIR LOT_ID (repeatable)')
+    history_parser.add_argument('--test', type=int, help='Per-lot statistics of this test number')
+
+    # Split/merge/filter commands (raw records, copied verbatim)
+    split_parser = subparsers.add_parser('split', parents=[profile_options],
+                                         help='Split a file into one file per head/site')
+    split_parser.set_defaults(func=_cmd_split)
+    split_parser.add_argument('file', help='STDF file path')
+    split_parser.add_argument('--by', choices=('site', 'head'), default='site', help='Output per site or head')
+    split_parser.add_argument('--output-dir', help='Directory for the outputs (default: next to the file)')
+
+    merge_parser = subparsers.add_parser('merge', parents=[profile_options],
+                                         help='Concatenate files, keeping one FAR/MIR and MRR')
+    merge_parser.set_defaults(func=_cmd_merge)
+    merge_parser.add_argument('output', help='Output file path')
+    merge_parser.add_argument('files', nargs='+', metavar='file', help='STDF file paths, in order')
+
+    filter_parser = subparsers.add_parser('filter', parents=[profile_options],
+                                          help='Copy only the records/parts matching filters')
+    filter_parser.set_defaults(func=_cmd_filter)
+    filter_parser.add_argument('file', help='STDF file path')
+    filter_parser.add_argument('output', help='Output file path')
+    filter_parser.add_argument('--types', type=_parse_types, help='Only these record types, e.g. MIR,PTR,PRR')
+    filter_parser.add_argument('--tests', type=_parse_int_set, help='Only PTR/FTR of these test numbers')
+    filter_parser.add_argument('--heads', type=_parse_int_set, help='Only these heads, e.g. 1')
+    filter_parser.add_argument('--sites', type=_parse_int_set, help='Only these sites, e.g. 1,3')
+    outcome = filter_parser.add_mutually_exclusive_group()
+    outcome.add_argument('--failing', dest='parts', action='store_const', const='failing',
+                         help='Only parts that failed')
+    outcome.add_argument('--passing', dest='parts', action='store_const', const='passing',
+                         help='Only parts that passed')
+    filter_parser.add_argument('--hard-bins', type=_parse_int_set, help='Only parts in these hard bins')
+    filter_parser.add_argument('--soft-bins', type=_parse_int_set, help='Only parts in these soft bins')
+
+    # Follow command
+    follow_parser = subparsers.add_parser('follow', parents=[profile_options],
+                                          help='Print yield of a file as it is being written')
+    follow_parser.set_defaults(func=_cmd_follow)
+    follow_parser.add_argument('file', help='STDF file path')
+    follow_parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls')
+    follow_parser.add_argument('--count', type=int, help='Stop after N polls')
+
+    # Serve command
+    serve_parser = subparsers.add_parser('serve', parents=[profile_options],
+                                         help='HTTP endpoint: POST an STDF stream, get summary JSON')
+    serve_parser.set_defaults(func=_cmd_serve)
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    serve_parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+    serve_parser.add_argument('--max-concurrent', type=int, default=16,
+                              help='Request bodies decoded at the same time')
+    serve_parser.add_argument('--max-body-mb', type=int, default=2048,
+                              help='Largest request body accepted, in MB (larger get 413)')
 
     # Generate command
-    generate_parser = subparsers.add_parser('generate', help='Generate sample STDF file')
+    generate_parser = subparsers.add_parser('generate', parents=[profile_options],
+                                            help='Generate sample STDF file')
+    generate_parser.set_defaults(func=_cmd_generate)
     generate_parser.add_argument('output', help='Output file path')
     generate_parser.add_argument('--tests', type=int, default=10, help='Number of tests')
+    generate_parser.add_argument('--parts', type=int,
+                                 help='Bulk mode: number of parts, each with PIR/PTRs/PRR')
+    generate_parser.add_argument('--sites', type=_parse_site_count, default=4, help='Bulk mode: sites tested in parallel')
+    generate_parser.add_argument('--size', type=_parse_size,
+                                 help='Bulk mode: approximate file size instead of --parts, e.g. 2G')
+    generate_parser.add_argument('--seed', type=int, help='Random seed for reproducible data')
+
+    # Bench command
+    bench_parser = subparsers.add_parser('bench', parents=[profile_options],
+                                         help='Run the parse/analyze/export throughput suite')
+    bench_parser.set_defaults(func=_cmd_bench)
+    bench_parser.add_argument('--sizes', default='1M,10M,100M',
+                              help='Comma-separated fixture sizes, e.g. 1M,100M,4G')
+    bench_parser.add_argument('--workdir', help='Keep (and reuse) fixture files here')
+    bench_parser.add_argument('--repeat', type=int, default=3, help='Runs per case; the best is kept')
+    bench_parser.add_argument('--no-cli', action='store_true', help='Skip the end-to-end CLI case')
+    bench_parser.add_argument('--micro', action='store_true', help='Also run the decoder and writer micro-benchmarks')
+    bench_parser.add_argument('--json', help='Save results as JSON')
+    bench_parser.add_argument('--compare', help='Compare against a previously saved JSON file')
+    bench_parser.add_argument('--threshold', type=float, default=0.10,
+                              help='Slowdown flagged as a regression by --compare (default 0.10)')
 
     args = parser.parse_args()
 
@@ -38,38 +527,18 @@ def main():
         parser.print_help()
         return 1
 
-    try:
-        if args.command == 'parse':
-            stdf_parser = STDFParser(args.file)
-            result = stdf_parser.parse()
-
-            if args.summary:
-                print(stdf_parser.get_summary())
-
-            if args.csv:
-                stdf_parser.export_csv(args.csv)
-                print(f'Results exported to: {args.csv}')
+    profiler = None
+    if args.profile or args.profile_memory:
+        profiler = Profiler(trace_memory=args.profile_memory)
 
-        elif args.command == 'analyze':
-            stdf_parser = STDFParser(args.file)
-            stdf_parser.parse()
-
-            analyzer = STDFAnalyzer(stdf_parser)
-            report = analyzer.generate_report()
-
-            if args.report:
-                with open(args.report, 'w') as f:
-                    f.write(report)
-                print(f'Report saved to: {args.report}')
-            else:
-                print(report)
-
-        elif args.command == 'generate':
-            generator = STDFGenerator(args.output)
-            generator.generate_sample_file(num_tests=args.tests)
-            print(f'Sample STDF file generated: {args.output}')
+    try:
+        if profiler is None:
+            return args.func(args, None)
 
-        return 0
+        with profiler, profiler.timer('total'):
+            status = args.func(args, profiler)
+        _write_profile(profiler, args.profile_output)
+        return status
 
     except Exception as e:
         print(f'Error: {e}', file=sys.stderr)
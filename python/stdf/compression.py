@@ -0,0 +1,249 @@
+"""Transparent reading of compressed STDF files
+
+Compression is detected from the leading magic bytes (gzip, bzip2, xz and,
+with the optional ``zstandard`` package, zstd), and the file is parsed
+straight from a streaming decompressor behind a large read buffer.
+
+Files whose compressed blocks can be located without inflating them --
+BGZF (blocked gzip, e.g. ``bgzip``) and zstd files made of several frames
+(e.g. ``zstd -T0`` or ``pzstd``) -- can be decompressed by several threads;
+zlib and zstandard release the GIL while decompressing.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+# Read buffer in front of a streaming decompressor
+READ_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Compressed bytes handed to one decompression task
+GROUP_SIZE = 4 * 1024 * 1024
+
+_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+
+_ZSTD_MAGIC = 0xFD2FB528
+_U4 = struct.Struct('<I')
+_U2 = struct.Struct('<H')
+
+Span = Tuple[int, int]
+
+
+def detect_compression(filepath: str) -> Optional[str]:
+    """'gzip', 'bz2', 'xz' or 'zstd' from the file's magic bytes; None if plain"""
+    with open(filepath, 'rb') as f:
+        head = f.read(6)
+    for magic, name in _MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('zstd input requires zstandard: pip install stdf-parser[compression]')
+    return zstandard
+
+
+def bgzf_blocks(filepath: str) -> Optional[List[Span]]:
+    """(offset, size) of every BGZF member; None if the file is not BGZF"""
+    blocks = []
+    with open(filepath, 'rb') as f:
+        size = f.seek(0, 2)
+        offset = 0
+        while offset < size:
+            f.seek(offset)
+            header = f.read(12)
+            # gzip magic, deflate, FEXTRA flag
+            if len(header) < 12 or header[:3] != b'\x1f\x8b\x08' or not header[3] & 0x04:
+                return None
+            extra = f.read(_U2.unpack_from(header, 10)[0])
+
+            # Find the 'BC' subfield holding BSIZE (total member size - 1)
+            pos = 0
+            block_size = None
+            while pos + 4 <= len(extra):
+                sub_len = _U2.unpack_from(extra, pos + 2)[0]
+                if extra[pos:pos + 2] == b'BC' and sub_len == 2:
+                    block_size = _U2.unpack_from(extra, pos + 4)[0] + 1
+                    break
+                pos += 4 + sub_len
+            if block_size is None:
+                return None
+
+            blocks.append((offset, block_size))
+            offset += block_size
+    return blocks
+
+
+def zstd_frames(filepath: str) -> Optional[List[Span]]:
+    """(offset, size) of every zstd frame, found from frame and block headers
+
+    Skippable frames are left out. None if the file is not zstd.
+    """
+    frames = []
+    with open(filepath, 'rb') as f:
+        size = f.seek(0, 2)
+        offset = 0
+        while offset < size:
+            f.seek(offset)
+            head = f.read(8)
+            if len(head) < 8:
+                return None
+            magic = _U4.unpack_from(head)[0]
+
+            if magic & 0xFFFFFFF0 == 0x184D2A50:
+                offset += 8 + _U4.unpack_from(head, 4)[0]
+                continue
+            if magic != _ZSTD_MAGIC:
+                return None
+
+            descriptor = head[4]
+            single_segment = descriptor & 0x20
+            fcs_size = (1 if single_segment else 0, 2, 4, 8)[descriptor >> 6]
+            dict_size = (0, 1, 2, 4)[descriptor & 0x03]
+            pos = offset + 5 + (0 if single_segment else 1) + dict_size + fcs_size
+
+            while True:
+                f.seek(pos)
+                block_header = f.read(3)
+                if len(block_header) < 3:
+                    return None
+                value = block_header[0] | block_header[1] << 8 | block_header[2] << 16
+                block_type = (value >> 1) & 0x03
+                pos += 3 + (1 if block_type == 1 else value >> 3)
+                if value & 0x01:
+                    break
+
+            if descriptor & 0x04:
+                pos += 4  # content checksum
+            frames.append((offset, pos - offset))
+            offset = pos
+    return frames
+
+
+def _inflate_bgzf(data: bytes) -> bytes:
+    """Decompress a run of whole gzip members"""
+    out = []
+    while data:
+        decompressor = zlib.decompressobj(31)
+        out.append(decompressor.decompress(data))
+        data = decompressor.unused_data
+    return b''.join(out)
+
+
+def _inflate_zstd(data: bytes) -> bytes:
+    """Decompress a run of whole zstd frames"""
+    zstandard = _import_zstandard()
+    out = []
+    while data:
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        out.append(decompressor.decompress(data))
+        data = decompressor.unused_data
+    return b''.join(out)
+
+
+def _groups(spans: List[Span]) -> Iterator[Span]:
+    """Coalesce consecutive spans into ranges of about GROUP_SIZE bytes"""
+    start = end = None
+    for offset, size in spans:
+        if start is None:
+            start = offset
+        elif end != offset or end - start >= GROUP_SIZE:
+            yield start, end - start
+            start = offset
+        end = offset + size
+    if start is not None:
+        yield start, end - start
+
+
+def decompress_parallel(filepath: str, spans: List[Span], inflate, workers: int) -> Iterator[bytes]:
+    """Yield decompressed data in order, inflating groups of spans in threads
+
+    At most ``2 * workers`` groups are in flight, which bounds memory.
+    """
+    with open(filepath, 'rb') as f, ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for offset, size in _groups(spans):
+            f.seek(offset)
+            pending.append(executor.submit(inflate, f.read(size)))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only raw stream over an iterator of byte chunks"""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._chunk = memoryview(b'')
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not len(self._chunk):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._chunk = memoryview(chunk)
+
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+    def close(self) -> None:
+        close = getattr(self._chunks, 'close', None)
+        if close is not None:
+            close()
+        super().close()
+
+
+def open_stdf(filepath: str, workers: int = 1, buffer_size: int = READ_BUFFER_SIZE) -> BinaryIO:
+    """Open an STDF file for reading, decompressing it if needed
+
+    With ``workers > 1``, BGZF and multi-frame zstd files are decompressed
+    by that many threads; other compressed files are read sequentially.
+    The stream is only seekable if the file is not compressed.
+    """
+    compression = detect_compression(filepath)
+    if compression is None:
+        return open(filepath, 'rb')
+
+    if workers > 1:
+        if compression == 'gzip':
+            spans, inflate = bgzf_blocks(filepath), _inflate_bgzf
+        elif compression == 'zstd':
+            spans, inflate = zstd_frames(filepath), _inflate_zstd
+        else:
+            spans = None
+        if spans is not None and len(spans) > 1:
+            chunks = decompress_parallel(filepath, spans, inflate, workers)
+            return io.BufferedReader(_ChunkReader(chunks), buffer_size)
+
+    if compression == 'gzip':
+        stream = gzip.open(filepath, 'rb')
+    elif compression == 'bz2':
+        stream = bz2.open(filepath, 'rb')
+    elif compression == 'xz':
+        stream = lzma.open(filepath, 'rb')
+    else:
+        zstandard = _import_zstandard()
+        stream = zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'), closefd=True,
+                                                            read_across_frames=True)
+    return io.BufferedReader(stream, buffer_size)
@@ -0,0 +1,423 @@
+"""Embedded SQLite store of parsed STDF files for cross-lot queries
+
+``ResultDatabase`` keeps one entry per ingested file (a "lot": its MIR
+``file_info`` plus the source path, size and mtime), and its test results
+and parts. Result rows are clustered on ``(lot, test_num, row)``, so each
+lot is a contiguous partition of the table: a lot is read, or replaced on
+re-ingest, by a range scan, and a test's values within a lot are adjacent.
+Rows are bulk-loaded with ``executemany`` in batches inside one
+transaction per lot.
+
+``select()`` returns ``StoredResults``, which can be handed to
+``STDFAnalyzer`` in place of a parser: per-test statistics, failing tests
+and outliers are then computed by aggregate queries in SQLite instead of
+over results loaded into memory.
+"""
+
+import json
+import math
+import os
+import sqlite3
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .parser import STDFParser, TestResult
+from .parts import NO_PART
+from .results import TestResultStore
+from .stats import cpk
+from .wafer import BinSummary
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency (stdf-parser[analysis])
+    np = None
+
+# Rows per executemany() call
+INSERT_BATCH_SIZE = 50000
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS lots (
+    lot INTEGER PRIMARY KEY,
+    filepath TEXT NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    lot_id TEXT,
+    part_typ TEXT,
+    job_nam TEXT,
+    node_nam TEXT,
+    start_time INTEGER,
+    file_info TEXT,
+    result_count INTEGER,
+    part_count INTEGER,
+    ingested_at REAL
+);
+CREATE INDEX IF NOT EXISTS lots_filepath ON lots (filepath);
+CREATE INDEX IF NOT EXISTS lots_lot_id ON lots (lot_id);
+
+CREATE TABLE IF NOT EXISTS tests (
+    lot INTEGER NOT NULL,
+    test_num INTEGER NOT NULL,
+    first_row INTEGER NOT NULL,
+    test_name TEXT,
+    unit TEXT,
+    low_limit REAL,
+    high_limit REAL,
+    PRIMARY KEY (lot, test_num)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS results (
+    lot INTEGER NOT NULL,
+    test_num INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    result REAL,
+    low_limit REAL,
+    high_limit REAL,
+    pass_fail INTEGER,
+    part INTEGER,
+    PRIMARY KEY (lot, test_num, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_value ON results (lot, test_num, result);
+
+CREATE TABLE IF NOT EXISTS parts (
+    lot INTEGER NOT NULL,
+    part INTEGER NOT NULL,
+    part_id TEXT,
+    head_num INTEGER,
+    site_num INTEGER,
+    part_flg INTEGER,
+    hard_bin INTEGER,
+    soft_bin INTEGER,
+    x_coord INTEGER,
+    y_coord INTEGER,
+    PRIMARY KEY (lot, part)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS parts_part_id ON parts (part_id);
+'''
+
+_FILE_INFO_COLUMNS = ('lot_id', 'part_typ', 'job_nam', 'node_nam', 'start_time')
+
+
+def _lot_filter(lots: Sequence[int], column: str = 'lot') -> str:
+    """SQL condition selecting the given lot keys (integers from the database)"""
+    return f"{column} IN ({', '.join(str(int(lot)) for lot in lots)})"
+
+
+def _batches(rows: Iterable[tuple], size: int = INSERT_BATCH_SIZE) -> Iterator[List[tuple]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _row_order(store: TestResultStore) -> Iterable[int]:
+    """Row numbers sorted by (test_num, row): the clustered key order"""
+    if np is not None and len(store):
+        return np.argsort(np.frombuffer(store.test_num, dtype=np.uintc), kind='stable').tolist()
+    return sorted(range(len(store)), key=store.test_num.__getitem__)
+
+
+class ResultDatabase:
+    """SQLite database of ingested STDF files"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self) -> 'ResultDatabase':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def ingest_file(self, filepath: str, jobs: int = 1, force: bool = False) -> Optional[int]:
+        """Parse and ingest one file; returns its lot key
+
+        A file already ingested with the same size and mtime is skipped
+        (returns None) unless ``force``; a changed file replaces its lot.
+        ``jobs > 1`` parses it with ``parallel.parse_chunked``.
+        """
+        stat = os.stat(filepath)
+        existing = self.connection.execute(
+            'SELECT lot, size, mtime FROM lots WHERE filepath = ?', (filepath,)).fetchone()
+        if existing is not None and not force and existing[1:] == (stat.st_size, stat.st_mtime):
+            return None
+
+        if jobs > 1:
+            from .parallel import parse_chunked
+            parsed = parse_chunked(filepath, workers=jobs)
+            file_info = parsed.files[0]['file_info']
+            return self.ingest(parsed, filepath, file_info, replace=existing is not None)
+
+        with STDFParser(filepath) as parser:
+            parser.parse()
+            return self.ingest(parser, filepath, parser.file_info, replace=existing is not None)
+
+    def ingest(self, parsed: Any, filepath: str, file_info: Dict[str, Any],
+               replace: bool = True) -> int:
+        """Store a parsed file (``STDFParser`` or ``ParsedFiles``) as a new lot
+
+        With ``replace``, earlier lots of ``filepath`` are deleted first.
+        """
+        store: TestResultStore = parsed.test_results
+        parts = getattr(parsed, 'parts', None)
+        row_parts = parts.row_parts() if parts is not None and len(parts.row_site) == len(store) else None
+        try:
+            stat = os.stat(filepath)
+            size, mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            size = mtime = None
+
+        with self.connection:
+            if replace:
+                for (lot,) in self.connection.execute(
+                        'SELECT lot FROM lots WHERE filepath = ?', (filepath,)).fetchall():
+                    self.delete_lot(lot, commit=False)
+
+            cursor = self.connection.execute(
+                f"INSERT INTO lots (filepath, size, mtime, {', '.join(_FILE_INFO_COLUMNS)}, file_info, "
+                f"result_count, part_count, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (filepath, size, mtime, *(file_info.get(name) for name in _FILE_INFO_COLUMNS),
+                 json.dumps(file_info), len(store), len(parts) if parts is not None else 0, time.time()))
+            lot = cursor.lastrowid
+
+            strings = store.strings
+            first: Dict[int, int] = {}
+            for row, test_num in enumerate(store.test_num):
+                if test_num not in first:
+                    first[test_num] = row
+            self.connection.executemany(
+                'INSERT INTO tests VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(lot, test_num, row, strings[store.name_id[row]], strings[store.unit_id[row]],
+                  store.low_limit[row], store.high_limit[row]) for test_num, row in first.items()])
+
+            test_num, result, low_limit, high_limit, pass_fail = (
+                store.test_num, store.result, store.low_limit, store.high_limit, store.pass_fail)
+            rows = ((lot, test_num[row], row, result[row], low_limit[row], high_limit[row], pass_fail[row],
+                     None if row_parts is None or row_parts[row] == NO_PART else row_parts[row])
+                    for row in _row_order(store))
+            for batch in _batches(rows):
+                self.connection.executemany('INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)', batch)
+
+            if parts is not None:
+                part_rows = ((lot, part, parts.part_id[part], parts.head_num[part], parts.site_num[part],
+                              parts.part_flg[part], parts.hard_bin[part], parts.soft_bin[part],
+                              parts.x_coord[part], parts.y_coord[part])
+                             for part in range(len(parts)) if parts.complete[part])
+                for batch in _batches(part_rows):
+                    self.connection.executemany('INSERT INTO parts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                                batch)
+        return lot
+
+    def delete_lot(self, lot: int, commit: bool = True) -> None:
+        """Remove a lot and its rows"""
+        for table in ('results', 'tests', 'parts', 'lots'):
+            self.connection.execute(f'DELETE FROM {table} WHERE lot = ?', (lot,))
+        if commit:
+            self.connection.commit()
+
+    def lots(self) -> List[Dict[str, Any]]:
+        """Ingested lots, oldest first"""
+        cursor = self.connection.execute(
+            'SELECT lot, filepath, lot_id, part_typ, job_nam, start_time, result_count, part_count '
+            'FROM lots ORDER BY lot')
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def select(self, lot_ids: Optional[Iterable[str]] = None,
+               lots: Optional[Iterable[int]] = None) -> 'StoredResults':
+        """Results of the lots with these MIR LOT_IDs or lot keys (all if neither)"""
+        query = 'SELECT lot FROM lots'
+        params: List[Any] = []
+        if lot_ids is not None:
+            lot_ids = list(lot_ids)
+            query += f" WHERE lot_id IN ({', '.join('?' * len(lot_ids))})"
+            params = lot_ids
+        selected = [lot for (lot,) in self.connection.execute(query + ' ORDER BY lot', params)]
+        if lots is not None:
+            wanted = set(lots)
+            selected = [lot for lot in selected if lot in wanted]
+        return StoredResults(self, selected)
+
+    def test_history(self, test_num: int, lot_ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Per-lot statistics and Cpk of one test, oldest lot first"""
+        history = []
+        for lot in self.select(lot_ids).lots:
+            stats = StoredResults(self, [lot]).aggregate_tests([test_num]).get(test_num)
+            if stats is None:
+                continue
+            info = self.connection.execute(
+                'SELECT filepath, lot_id, start_time FROM lots WHERE lot = ?', (lot,)).fetchone()
+            history.append({'lot': lot, 'filepath': info[0], 'lot_id': info[1], 'start_time': info[2],
+                            **stats})
+        return history
+
+
+class StoredResults:
+    """Results of some lots of a ``ResultDatabase``
+
+    Stands in for a parser in ``STDFAnalyzer``: ``aggregate_tests()``,
+    ``failing_tests()`` and ``find_outliers()`` run as queries, and
+    ``test_results`` is only loaded if a row-level method needs it.
+    """
+
+    def __init__(self, database: ResultDatabase, lots: List[int]):
+        self.database = database
+        self.lots = lots
+        self._test_results: Optional[TestResultStore] = None
+        self._bin_summary: Optional[BinSummary] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        return self.database.connection
+
+    @property
+    def filepath(self) -> str:
+        paths = [path for (path,) in self.connection.execute(
+            f'SELECT filepath FROM lots WHERE {_lot_filter(self.lots)} ORDER BY lot')]
+        return ', '.join(paths)
+
+    @property
+    def test_results(self) -> TestResultStore:
+        """All selected results in lot and file order (loaded on first use)"""
+        if self._test_results is None:
+            store = TestResultStore()
+            for row in self.connection.execute(
+                    f'SELECT r.test_num, t.test_name, r.result, t.unit, r.low_limit, r.high_limit, '
+                    f'r.pass_fail FROM results r JOIN tests t ON t.lot = r.lot AND t.test_num = r.test_num '
+                    f'WHERE {_lot_filter(self.lots, "r.lot")} ORDER BY r.lot, r.row'):
+                store.add(*row)
+            self._test_results = store
+        return self._test_results
+
+    @property
+    def bin_summary(self) -> BinSummary:
+        """Bin counts and yield of the selected lots' parts (one implicit wafer per lot and head)"""
+        if self._bin_summary is None:
+            summary = BinSummary()
+            for lot in self.lots:
+                lot_summary = BinSummary()
+                for row in self.connection.execute(
+                        'SELECT head_num, site_num, part_flg, hard_bin, soft_bin, x_coord, y_coord '
+                        'FROM parts WHERE lot = ? ORDER BY part', (lot,)):
+                    lot_summary.add_part(*row)
+                summary.merge(lot_summary)
+            self._bin_summary = summary
+        return self._bin_summary
+
+    def statistics(self) -> Dict[str, Any]:
+        """Pass/fail counts and yield of the selected results"""
+        total, passed = self.connection.execute(
+            f'SELECT COUNT(*), COALESCE(SUM(pass_fail), 0) FROM results WHERE {_lot_filter(self.lots)}'
+        ).fetchone()
+        return {
+            'total_tests': total,
+            'pass_count': passed,
+            'fail_count': total - passed,
+            'yield_rate': (passed / total * 100) if total else 0.0
+        }
+
+    def _tests(self, test_nums: Optional[Sequence[int]] = None) -> Dict[int, Tuple[float, float]]:
+        """Limits of the first appearance of each test, in order of first appearance"""
+        condition = _lot_filter(self.lots)
+        if test_nums is not None:
+            condition += f" AND test_num IN ({', '.join(str(int(num)) for num in test_nums)})"
+        limits: Dict[int, Tuple[float, float]] = {}
+        for test_num, low_limit, high_limit in self.connection.execute(
+                f'SELECT test_num, low_limit, high_limit FROM tests WHERE {condition} ORDER BY lot, first_row'):
+            limits.setdefault(test_num, (low_limit, high_limit))
+        return limits
+
+    def aggregate_tests(self, test_nums: Optional[Sequence[int]] = None) -> Dict[int, Dict[str, Any]]:
+        """Per-test statistics, as ``STDFAnalyzer.analyze_by_test()``, computed in SQLite
+
+        Count, mean, min, max and the sum of squared deviations are
+        aggregated in one grouped query; medians are read from the
+        ``(lot, test_num, result)`` index.
+        """
+        condition = _lot_filter(self.lots, 'r.lot')
+        if test_nums is not None:
+            condition += f" AND r.test_num IN ({', '.join(str(int(num)) for num in test_nums)})"
+
+        grouped = {}
+        for test_num, count, mean, low, high, sum_sq in self.connection.execute(
+                f'SELECT r.test_num, m.n, m.mean, m.low, m.high, '
+                f'SUM((r.result - m.mean) * (r.result - m.mean)) '
+                f'FROM results r JOIN (SELECT test_num, COUNT(result) AS n, AVG(result) AS mean, '
+                f'MIN(result) AS low, MAX(result) AS high FROM results r WHERE {condition} '
+                f'GROUP BY test_num) m ON m.test_num = r.test_num '
+                f'WHERE {condition} GROUP BY r.test_num'):
+            grouped[test_num] = (count, mean, low, high, sum_sq or 0.0)
+
+        stats = {}
+        for test_num, (low_limit, high_limit) in self._tests(test_nums).items():
+            if test_num not in grouped or not grouped[test_num][0]:
+                continue
+            count, mean, low, high, sum_sq = grouped[test_num]
+            stdev = math.sqrt(sum_sq / (count - 1)) if count > 1 else 0.0
+            stats[test_num] = {
+                'count': count,
+                'mean': mean,
+                'median': self._median(test_num, count),
+                'stdev': stdev,
+                'min': low,
+                'max': high,
+                'cpk': cpk(count, mean, stdev, low_limit, high_limit)
+            }
+        return stats
+
+    def _median(self, test_num: int, count: int) -> float:
+        values = [value for (value,) in self.connection.execute(
+            f'SELECT result FROM results WHERE {_lot_filter(self.lots)} AND test_num = ? '
+            f'AND result IS NOT NULL ORDER BY result LIMIT ? OFFSET ?',
+            (test_num, 2 - count % 2, (count - 1) // 2))]
+        return sum(values) / len(values)
+
+    def _rows(self, condition: str, params: Sequence[Any] = (), join: str = '',
+              order: str = 'r.lot, r.row') -> List[TestResult]:
+        return [TestResult(test_num, name, result, unit, low, high, bool(passed))
+                for test_num, name, result, unit, low, high, passed in self.connection.execute(
+                    f'SELECT r.test_num, t.test_name, r.result, t.unit, r.low_limit, r.high_limit, '
+                    f'r.pass_fail FROM results r JOIN tests t ON t.lot = r.lot AND t.test_num = r.test_num '
+                    f'{join} WHERE {_lot_filter(self.lots, "r.lot")} AND {condition} ORDER BY {order}',
+                    params)]
+
+    def failing_tests(self) -> List[TestResult]:
+        """Failing results, in lot and file order"""
+        return self._rows('r.pass_fail = 0')
+
+    def find_outliers(self, stats: Dict[int, Dict[str, Any]], sigma: float = 3.0) -> List[TestResult]:
+        """Results more than ``sigma`` stdevs from their test's mean, grouped by test"""
+        self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS outlier_bounds '
+                                '(test_num INTEGER PRIMARY KEY, position INTEGER, mean REAL, bound REAL)')
+        self.connection.execute('DELETE FROM outlier_bounds')
+        self.connection.executemany(
+            'INSERT INTO outlier_bounds VALUES (?, ?, ?, ?)',
+            [(test_num, position, group['mean'], sigma * group['stdev'])
+             for position, (test_num, group) in enumerate(stats.items()) if group['count'] >= 3])
+        return self._rows('ABS(r.result - b.mean) > b.bound',
+                          join='JOIN outlier_bounds b ON b.test_num = r.test_num',
+                          order='b.position, r.lot, r.row')
+
+    def get_summary(self) -> str:
+        """Get human-readable summary"""
+        stats = self.statistics()
+        return f"""
+STDF Database Summary
+{'=' * 50}
+Database: {self.database.path}
+Lots: {len(self.lots)}
+Total Tests: {stats['total_tests']}
+Pass Count: {stats['pass_count']}
+Fail Count: {stats['fail_count']}
+Yield Rate: {stats['yield_rate']:.2f}%
+{'=' * 50}
+"""
@@ -0,0 +1,243 @@
+"""Table-driven STDF V4 record decoders
+
+Each decoder turns a record payload into the matching dataclass from
+``records.py`` using precompiled ``struct.Struct`` objects and
+``unpack_from`` at buffer offsets, so no intermediate slices are made for
+fixed-size fields. Decoders take ``(buf, offset, end)`` where ``buf`` is any
+bytes-like object holding the payload in ``buf[offset:end]``.
+
+STDF allows trailing fields to be omitted; missing fields decode as zero,
+an empty string or a blank C1 character.
+"""
+
+import struct
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from .records import (
+    FileAttributeRecord, FunctionalTestRecord, MasterInformationRecord,
+    MasterResultsRecord, ParametricTestRecord, PartCountRecord,
+    PartInformationRecord, PartResultsRecord, RecordType, WaferInformationRecord,
+    WaferResultsRecord,
+)
+
+Buffer = Union[bytes, bytearray, memoryview]
+Decoder = Callable[[Buffer, int, int], Any]
+
+# PTR TEST_FLG bits
+TEST_FLG_NO_PASS_FAIL = 0x40  # no pass/fail indication; compare against limits
+TEST_FLG_FAILED = 0x80
+
+# PTR OPT_FLAG bits
+OPT_RES_SCAL_INVALID = 0x01
+OPT_LO_LIMIT_INVALID = 0x10  # use the first PTR's LO_LIMIT/LLM_SCAL
+OPT_HI_LIMIT_INVALID = 0x20  # use the first PTR's HI_LIMIT/HLM_SCAL
+OPT_NO_LO_LIMIT = 0x40
+OPT_NO_HI_LIMIT = 0x80
+
+# OPT_FLAG value standing in for a PTR that ends before OPT_FLAG:
+# RES_SCAL, LO_LIMIT and HI_LIMIT invalid, so the values of the first PTR
+# for the test apply.
+PTR_OPT_DEFAULTS = OPT_RES_SCAL_INVALID | OPT_LO_LIMIT_INVALID | OPT_HI_LIMIT_INVALID
+
+_FAR = struct.Struct('<BB')
+_MIR = struct.Struct('<IIBcccHc')
+_MRR = struct.Struct('<Ic')
+_PCR = struct.Struct('<BBIIIII')
+_PTR = struct.Struct('<IBBBBf')
+_PTR_OPT = struct.Struct('<Bbbbff')
+_FTR = struct.Struct('<IBBBBIIIIiihHH')
+_WIR = struct.Struct('<BBI')
+_WRR = struct.Struct('<BBIIIIII')
+_PIR = struct.Struct('<BB')
+_PRR = struct.Struct('<BBBHHHhhI')
+_U2 = struct.Struct('<H')
+
+
+def _fixed(fmt: struct.Struct, buf: Buffer, offset: int, end: int) -> Tuple:
+    """Unpack a fixed-size block, zero-filling fields past ``end``"""
+    if end - offset >= fmt.size:
+        return fmt.unpack_from(buf, offset)
+    return fmt.unpack(bytes(buf[offset:end]).ljust(fmt.size, b'\0'))
+
+
+def _cn(buf: Buffer, pos: int, end: int) -> Tuple[str, int]:
+    """Read a Cn string (length byte + chars); returns (text, next position)"""
+    if pos >= end:
+        return '', pos
+    start = pos + 1
+    stop = min(start + buf[pos], end)
+    return str(buf[start:stop], 'latin-1'), stop
+
+
+def _c1(value: bytes) -> str:
+    """Decode a C1 character; NUL (missing) becomes a space"""
+    return ' ' if value == b'\0' else value.decode('latin-1')
+
+
+def decode_far(buf: Buffer, offset: int, end: int) -> FileAttributeRecord:
+    return FileAttributeRecord(*_fixed(_FAR, buf, offset, end))
+
+
+def decode_mir(buf: Buffer, offset: int, end: int) -> MasterInformationRecord:
+    setup_t, start_t, stat_num, mode_cod, rtst_cod, prot_cod, _burn_tim, _cmod_cod = \
+        _fixed(_MIR, buf, offset, end)
+    pos = offset + _MIR.size
+    lot_id, pos = _cn(buf, pos, end)
+    part_typ, pos = _cn(buf, pos, end)
+    node_nam, pos = _cn(buf, pos, end)
+    tstr_typ, pos = _cn(buf, pos, end)
+    job_nam, pos = _cn(buf, pos, end)
+    return MasterInformationRecord(
+        setup_t, start_t, stat_num, _c1(mode_cod), _c1(rtst_cod), _c1(prot_cod),
+        lot_id, part_typ, node_nam, tstr_typ, job_nam
+    )
+
+
+def decode_mrr(buf: Buffer, offset: int, end: int) -> MasterResultsRecord:
+    finish_t, disp_cod = _fixed(_MRR, buf, offset, end)
+    pos = offset + _MRR.size
+    usr_desc, pos = _cn(buf, pos, end)
+    exc_desc, pos = _cn(buf, pos, end)
+    return MasterResultsRecord(finish_t, _c1(disp_cod), usr_desc, exc_desc)
+
+
+def decode_pcr(buf: Buffer, offset: int, end: int) -> PartCountRecord:
+    return PartCountRecord(*_fixed(_PCR, buf, offset, end))
+
+
+def decode_ptr(buf: Buffer, offset: int, end: int) -> ParametricTestRecord:
+    if end - offset < _PTR.size:
+        return _decode_ptr_partial(buf, offset, end)
+
+    test_num, head_num, site_num, test_flg, parm_flg, result = _PTR.unpack_from(buf, offset)
+
+    # Cn fields inlined on the hot path: length byte, then characters
+    # Stops are clamped to end: buf may hold the following records too
+    pos = offset + 12
+    if pos < end:
+        stop = min(pos + 1 + buf[pos], end)
+        test_txt = str(buf[pos + 1:stop], 'latin-1')
+        pos = stop
+    else:
+        test_txt = ''
+    if pos < end:
+        stop = min(pos + 1 + buf[pos], end)
+        alarm_id = str(buf[pos + 1:stop], 'latin-1')
+        pos = stop
+    else:
+        alarm_id = ''
+
+    if pos + 13 <= end:
+        opt_flag, res_scal, llm_scal, hlm_scal, lo_limit, hi_limit = _PTR_OPT.unpack_from(buf, pos)
+        pos += 12
+        stop = min(pos + 1 + buf[pos], end)
+        units = str(buf[pos + 1:stop], 'latin-1')
+    else:
+        return _decode_ptr_partial(buf, offset, end)
+
+    return ParametricTestRecord(
+        test_num, head_num, site_num, test_flg, parm_flg, result, test_txt, alarm_id,
+        opt_flag, res_scal, llm_scal, hlm_scal, lo_limit, hi_limit, units
+    )
+
+
+def _decode_ptr_partial(buf: Buffer, offset: int, end: int) -> ParametricTestRecord:
+    """PTR decode tolerating any truncation point"""
+    test_num, head_num, site_num, test_flg, parm_flg, result = _fixed(_PTR, buf, offset, end)
+    pos = offset + _PTR.size
+    test_txt, pos = _cn(buf, pos, end)
+    alarm_id, pos = _cn(buf, pos, end)
+
+    if pos < end:
+        opt_flag, res_scal, llm_scal, hlm_scal, lo_limit, hi_limit = _fixed(_PTR_OPT, buf, pos, end)
+        units, pos = _cn(buf, pos + _PTR_OPT.size, end)
+    else:
+        opt_flag, res_scal, llm_scal, hlm_scal, lo_limit, hi_limit = PTR_OPT_DEFAULTS, 0, 0, 0, 0.0, 0.0
+        units = ''
+
+    return ParametricTestRecord(
+        test_num, head_num, site_num, test_flg, parm_flg, result, test_txt, alarm_id,
+        opt_flag, res_scal, llm_scal, hlm_scal, lo_limit, hi_limit, units
+    )
+
+
+def decode_ftr(buf: Buffer, offset: int, end: int) -> FunctionalTestRecord:
+    (test_num, head_num, site_num, test_flg, opt_flag, cycl_cnt, rel_vadr, rept_cnt,
+     num_fail, xfail_ad, yfail_ad, vect_off, rtn_icnt, pgm_icnt) = _fixed(_FTR, buf, offset, end)
+
+    # Skip RTN_INDX (U2 each), RTN_STAT (N1 each), PGM_INDX, PGM_STAT, FAIL_PIN (Dn)
+    pos = offset + _FTR.size
+    pos += 2 * rtn_icnt + (rtn_icnt + 1) // 2
+    pos += 2 * pgm_icnt + (pgm_icnt + 1) // 2
+    if pos + 2 <= end:
+        pos += 2 + (_U2.unpack_from(buf, pos)[0] + 7) // 8
+    else:
+        pos = end
+
+    vect_nam, pos = _cn(buf, pos, end)
+    time_set, pos = _cn(buf, pos, end)
+    op_code, pos = _cn(buf, pos, end)
+    test_txt, pos = _cn(buf, pos, end)
+    alarm_id, pos = _cn(buf, pos, end)
+    prog_txt, pos = _cn(buf, pos, end)
+    rslt_txt, pos = _cn(buf, pos, end)
+    return FunctionalTestRecord(
+        test_num, head_num, site_num, test_flg, opt_flag, cycl_cnt, rel_vadr, rept_cnt,
+        num_fail, xfail_ad, yfail_ad, vect_off, vect_nam, time_set, op_code, test_txt,
+        alarm_id, prog_txt, rslt_txt
+    )
+
+
+def decode_wir(buf: Buffer, offset: int, end: int) -> WaferInformationRecord:
+    fields = _fixed(_WIR, buf, offset, end)
+    wafer_id, _pos = _cn(buf, offset + _WIR.size, end)
+    return WaferInformationRecord(*fields, wafer_id)
+
+
+def decode_wrr(buf: Buffer, offset: int, end: int) -> WaferResultsRecord:
+    fields = _fixed(_WRR, buf, offset, end)
+    pos = offset + _WRR.size
+    strings = []
+    for _ in range(6):  # WAFER_ID, FABWF_ID, FRAME_ID, MASK_ID, USR_DESC, EXC_DESC
+        text, pos = _cn(buf, pos, end)
+        strings.append(text)
+    return WaferResultsRecord(*fields, *strings)
+
+
+def decode_pir(buf: Buffer, offset: int, end: int) -> PartInformationRecord:
+    return PartInformationRecord(*_fixed(_PIR, buf, offset, end))
+
+
+def decode_prr(buf: Buffer, offset: int, end: int) -> PartResultsRecord:
+    fields = _fixed(_PRR, buf, offset, end)
+    pos = offset + _PRR.size
+    part_id, pos = _cn(buf, pos, end)
+    part_txt, pos = _cn(buf, pos, end)
+    return PartResultsRecord(*fields, part_id, part_txt)
+
+
+def _key(rec_type: RecordType) -> Tuple[int, int]:
+    return rec_type >> 8, rec_type & 0xFF
+
+
+# Decoder registry keyed by (rec_type, rec_sub)
+DECODERS: Dict[Tuple[int, int], Decoder] = {
+    _key(RecordType.FAR): decode_far,
+    _key(RecordType.MIR): decode_mir,
+    _key(RecordType.MRR): decode_mrr,
+    _key(RecordType.PCR): decode_pcr,
+    _key(RecordType.PTR): decode_ptr,
+    _key(RecordType.FTR): decode_ftr,
+    _key(RecordType.WIR): decode_wir,
+    _key(RecordType.WRR): decode_wrr,
+    _key(RecordType.PIR): decode_pir,
+    _key(RecordType.PRR): decode_prr,
+}
+
+
+def decode_record(rec_type: int, rec_sub: int, data: Buffer) -> Optional[Any]:
+    """Decode a record payload into its dataclass; None for unsupported types"""
+    decoder = DECODERS.get((rec_type, rec_sub))
+    if decoder is None:
+        return None
+    return decoder(data, 0, len(data))
@@ -0,0 +1,173 @@
+"""Columnar export of test results (Parquet, Arrow IPC, NumPy NPZ, CSV)
+
+Results are written in batches of typed columns taken straight from a
+``TestResultStore``; any other iterable of ``TestResult`` (e.g. a stream
+from ``STDFParser.iter_test_results()``) is gathered into compact column
+batches of ``batch_size`` rows first, so memory stays bounded. The
+exception is NPZ: each ``.npy`` member is written whole, so a stream is
+first collected into one ``TestResultStore``.
+
+Parquet and Arrow need ``pyarrow`` and NPZ needs ``numpy``
+(``pip install stdf-parser[export]``).
+"""
+
+import csv
+from typing import Any, Iterable, Iterator, Tuple
+
+from .results import TestResult, TestResultStore
+
+# Rows per batch / Parquet row group
+BATCH_SIZE = 65536
+
+# Write buffer for CSV output
+CSV_BUFFER_SIZE = 1024 * 1024
+
+CSV_HEADER = ['Test Number', 'Test Name', 'Result', 'Unit', 'Low Limit', 'High Limit', 'Pass/Fail']
+
+FORMATS = ('csv', 'parquet', 'arrow', 'npz')
+
+Batch = Tuple[TestResultStore, int, int]
+
+
+def iter_batches(results: Iterable[TestResult], batch_size: int = BATCH_SIZE) -> Iterator[Batch]:
+    """Split results into ``(store, start, stop)`` row ranges of at most batch_size rows"""
+    if isinstance(results, TestResultStore):
+        for start in range(0, len(results), batch_size):
+            yield results, start, min(start + batch_size, len(results))
+        return
+
+    batch = TestResultStore()
+    for result in results:
+        batch.append(result)
+        if len(batch) >= batch_size:
+            yield batch, 0, len(batch)
+            batch = TestResultStore()
+    if len(batch):
+        yield batch, 0, len(batch)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('Parquet/Arrow export requires pyarrow: pip install stdf-parser[export]')
+    return pyarrow
+
+
+def _arrow_schema(pa):
+    return pa.schema([
+        ('test_num', pa.uint32()),
+        ('test_name', pa.string()),
+        ('result', pa.float64()),
+        ('unit', pa.string()),
+        ('low_limit', pa.float64()),
+        ('high_limit', pa.float64()),
+        ('pass_fail', pa.bool_()),
+    ])
+
+
+def _arrow_batch(pa, schema, batch: Batch):
+    """One pyarrow RecordBatch from a store row range, without building rows"""
+    store, start, stop = batch
+    strings = pa.array(store.strings, pa.string())
+    return pa.RecordBatch.from_arrays([
+        pa.array(store.test_num[start:stop], pa.uint32()),
+        strings.take(pa.array(store.name_id[start:stop], pa.uint32())),
+        pa.array(store.result[start:stop], pa.float64()),
+        strings.take(pa.array(store.unit_id[start:stop], pa.uint32())),
+        pa.array(store.low_limit[start:stop], pa.float64()),
+        pa.array(store.high_limit[start:stop], pa.float64()),
+        pa.array(store.pass_fail[start:stop], pa.uint8()).cast(pa.bool_()),
+    ], schema=schema)
+
+
+def export_parquet(output_path: str, results: Iterable[TestResult],
+                   row_group_size: int = BATCH_SIZE, compression: str = 'snappy') -> None:
+    """Write results to a Parquet file, one row group per batch"""
+    pa = _import_pyarrow()
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa)
+    with pq.ParquetWriter(output_path, schema, compression=compression) as writer:
+        for batch in iter_batches(results, row_group_size):
+            writer.write_batch(_arrow_batch(pa, schema, batch))
+
+
+def export_arrow(output_path: str, results: Iterable[TestResult], batch_size: int = BATCH_SIZE) -> None:
+    """Write results to an Arrow IPC (Feather v2) file in record batches"""
+    pa = _import_pyarrow()
+
+    schema = _arrow_schema(pa)
+    with pa.OSFile(output_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for batch in iter_batches(results, batch_size):
+            writer.write_batch(_arrow_batch(pa, schema, batch))
+
+
+def export_npz(output_path: str, results: Iterable[TestResult], compressed: bool = False) -> None:
+    """Write results to a NumPy ``.npz`` archive of columns
+
+    Test names and units are stored once in ``strings`` and referenced by
+    ``name_id``/``unit_id``, as in ``TestResultStore``. All results are held
+    in memory while writing; use Parquet or Arrow for bounded memory.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError('NPZ export requires numpy: pip install stdf-parser[analysis]')
+
+    if not isinstance(results, TestResultStore):
+        store = TestResultStore()
+        for result in results:
+            store.append(result)
+        results = store
+
+    save = np.savez_compressed if compressed else np.savez
+    save(
+        output_path,
+        test_num=np.frombuffer(results.test_num, dtype=np.uintc),
+        result=np.frombuffer(results.result, dtype=np.float64),
+        low_limit=np.frombuffer(results.low_limit, dtype=np.float64),
+        high_limit=np.frombuffer(results.high_limit, dtype=np.float64),
+        pass_fail=np.frombuffer(results.pass_fail, dtype=np.uint8).astype(bool),
+        name_id=np.frombuffer(results.name_id, dtype=np.uintc),
+        unit_id=np.frombuffer(results.unit_id, dtype=np.uintc),
+        strings=np.array(results.strings, dtype=str)
+    )
+
+
+def export_csv(output_path: str, results: Iterable[TestResult], batch_size: int = BATCH_SIZE) -> None:
+    """Write results to CSV through a large buffer, ``writerows`` per batch"""
+    verdicts = ('FAIL', 'PASS')
+
+    with open(output_path, 'w', newline='', buffering=CSV_BUFFER_SIZE) as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+
+        for store, start, stop in iter_batches(results, batch_size):
+            strings = store.strings
+            writer.writerows(zip(
+                store.test_num[start:stop],
+                [strings[i] for i in store.name_id[start:stop]],
+                store.result[start:stop],
+                [strings[i] for i in store.unit_id[start:stop]],
+                store.low_limit[start:stop],
+                store.high_limit[start:stop],
+                [verdicts[p] for p in store.pass_fail[start:stop]]
+            ))
+
+
+EXPORTERS = {
+    'csv': export_csv,
+    'parquet': export_parquet,
+    'arrow': export_arrow,
+    'npz': export_npz,
+}
+
+
+def export_results(output_path: str, results: Iterable[TestResult], fmt: str = 'csv', **options: Any) -> None:
+    """Export results in one of ``FORMATS``"""
+    try:
+        exporter = EXPORTERS[fmt]
+    except KeyError:
+        raise ValueError(f"unknown export format '{fmt}' (expected one of {', '.join(FORMATS)})")
+    exporter(output_path, results, **options)
@@ -0,0 +1,133 @@
+"""Incremental parsing of STDF files that are still being written"""
+
+import time
+from typing import Any, Callable, Dict, Optional, Union
+
+from .analyzer import StreamingAnalyzer
+from .parser import HEADER, HEADER_SIZE, STDFParser, STDFRecord
+
+# Bytes read per block; at least one maximum-size record (U2 REC_LEN + header)
+BLOCK_SIZE = 1024 * 1024
+MAX_RECORD_SIZE = HEADER_SIZE + 0xFFFF
+
+
+class IncrementalParser:
+    """Resumable parser that only decodes bytes appended since the last call
+
+    ``offset`` is the end of the last complete record; a partial trailing
+    record is left for the next ``update()``. Pass/fail counts and per-test
+    statistics are kept up to date in a ``StreamingAnalyzer`` as records
+    arrive, so results are not stored unless ``keep_results`` is set (then
+    ``parser.test_results``, ``parser.part_results`` and ``parser.parts``
+    grow and ``parser`` can be handed to ``STDFAnalyzer``). Otherwise
+    memory stays bounded: ``parser.bin_summary`` only counts bins.
+    """
+
+    def __init__(self, filepath: str, keep_results: bool = False, block_size: int = BLOCK_SIZE):
+        self.filepath = filepath
+        self.keep_results = keep_results
+        self.block_size = max(block_size, MAX_RECORD_SIZE)
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all state and start again from the beginning of the file"""
+        self.parser = STDFParser(self.filepath)
+        if self.keep_results:
+            # Stored rows are linked to their parts, as in parse()
+            self.parser._link_rows(True)
+        else:
+            self.parser._count_parts_only()
+        self.offset = 0
+        self.total_records = 0
+        self.analyzer = StreamingAnalyzer()
+        self._pending = b''
+
+    @property
+    def file_info(self) -> Dict[str, Any]:
+        return self.parser.file_info
+
+    @property
+    def pending_bytes(self) -> int:
+        """Size of the buffered, incomplete trailing record"""
+        return len(self._pending)
+
+    def update(self) -> int:
+        """Parse whatever was appended to the file; returns the new record count
+
+        If the file shrank (rewritten by the tester), parsing restarts.
+        """
+        with open(self.filepath, 'rb') as f:
+            position = self.offset + len(self._pending)
+            if f.seek(0, 2) < position:
+                self.reset()
+                position = 0
+
+            f.seek(position)
+            new_records = 0
+            for block in iter(lambda: f.read(self.block_size), b''):
+                new_records += self.feed(block)
+
+        return new_records
+
+    def feed(self, data: Union[bytes, bytearray]) -> int:
+        """Parse the next bytes of the stream; returns the new record count
+
+        ``data`` may end, or start, in the middle of a record; the incomplete
+        tail is buffered until more data arrives.
+        """
+        buf = self._pending + bytes(data) if self._pending else bytes(data)
+        view = memoryview(buf)
+        unpack_header = HEADER.unpack_from
+        parse_record = self.parser._parse_record
+        add_result = self.parser.test_results.add if self.keep_results else None
+        add_row = self.analyzer.add_row
+        size = len(buf)
+        offset = 0
+        new_records = 0
+
+        while offset + HEADER_SIZE <= size:
+            rec_len, rec_type, rec_sub = unpack_header(view, offset)
+            start = offset + HEADER_SIZE
+            if start + rec_len > size:
+                break
+            offset = start + rec_len
+            new_records += 1
+
+            row = parse_record(STDFRecord(rec_type, rec_sub, rec_len, view[start:offset]))
+            if row is None:
+                continue
+
+            add_row(*row)
+            if add_result is not None:
+                add_result(*row)
+
+        self._pending = buf[offset:]
+        self.offset += offset
+        self.total_records += new_records
+        return new_records
+
+    def statistics(self) -> Dict[str, Any]:
+        """Pass/fail statistics so far, as ``STDFParser._calculate_statistics()``"""
+        return self.analyzer.statistics()
+
+    def analyze_by_test(self) -> Dict[int, Dict[str, Any]]:
+        """Per-test running statistics, in order of first appearance"""
+        return self.analyzer.analyze_by_test()
+
+
+def follow(filepath: str, callback: Callable[[IncrementalParser], None],
+           interval: float = 2.0, count: Optional[int] = None) -> IncrementalParser:
+    """Poll a growing file, calling ``callback`` whenever new records arrive
+
+    Polls ``count`` times (forever if None), sleeping ``interval`` seconds
+    in between.
+    """
+    incremental = IncrementalParser(filepath)
+    polls = 0
+    while count is None or polls < count:
+        if polls:
+            time.sleep(interval)
+        if incremental.update() or polls == 0:
+            callback(incremental)
+        polls += 1
+    return incremental
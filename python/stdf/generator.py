@@ -3,7 +3,38 @@
 import struct
 import random
 from datetime import datetime
-from typing import List
+from typing import List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency (stdf-parser[analysis])
+    np = None
+
+# Buffered output size of the bulk generator
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+
+_HEADER = struct.Struct('<HBB')
+_PIR = struct.Struct('<HBBBB')
+_PRR = struct.Struct('<HBBBBBHHHhhI')
+# Repeat PTR: header, fixed fields, empty TEST_TXT and ALARM_ID; the rest is
+# omitted so the limits/units of the first PTR of the test apply
+_REPEAT_PTR = struct.Struct('<HBBIBBBBfBB')
+_REPEAT_PTR_LEN = _REPEAT_PTR.size - _HEADER.size
+
+# Bulk parts are placed row by row, _DIE_COLUMNS per row; Y_COORD (I2)
+# wraps to 0 after 32767 rows
+_DIE_COLUMNS = 100
+_DIE_ROWS = 32768
+# SITE_NUM is a U1
+MAX_SITES = 255
+
+if np is not None:
+    _REPEAT_PTR_DTYPE = np.dtype([
+        ('rec_len', '<u2'), ('rec_typ', 'u1'), ('rec_sub', 'u1'),
+        ('test_num', '<u4'), ('head_num', 'u1'), ('site_num', 'u1'),
+        ('test_flg', 'u1'), ('parm_flg', 'u1'), ('result', '<f4'),
+        ('test_txt', 'u1'), ('alarm_id', 'u1'),
+    ])
 
 
 class STDFGenerator:
@@ -31,6 +62,146 @@ class STDFGenerator:
         # Write to file
         self._write_file()
 
+    def generate_bulk(self, num_parts: int = 1000, num_tests: int = 100, num_sites: int = 4,
+                      seed: Optional[int] = None, buffer_size: int = WRITE_BUFFER_SIZE) -> int:
+        """Stream a large, realistic file to disk; returns the bytes written
+
+        Parts are tested ``num_sites`` at a time: each touchdown writes a PIR
+        per site, then every test's PTR for each site, then a PRR per site
+        with bin and X/Y coordinates. Test numbers are sparse, each test has
+        its own mean/sigma and 3-sigma limits, and only the first PTR of a
+        test/site carries name, limits and units. Values come from numpy's
+        vectorized generator when available (one array per touchdown),
+        else from ``random``; the same ``seed`` reproduces the same data
+        with the same backend. ``num_sites`` must be 1..255 (SITE_NUM is a
+        U1); coordinates wrap, so any ``num_parts`` fits the I2 X/Y fields.
+        """
+        if not 1 <= num_sites <= MAX_SITES:
+            raise ValueError(f'num_sites must be 1..{MAX_SITES}, got {num_sites}')
+        rng = random.Random(seed)
+        test_nums = sorted(rng.sample(range(1000, 1000 + 100 * num_tests), num_tests))
+        means = [rng.uniform(1.0, 4.0) for _ in test_nums]
+        sigmas = [rng.uniform(0.02, 0.2) for _ in test_nums]
+        limits = [(mean - 3 * sigma, mean + 3 * sigma) for mean, sigma in zip(means, sigmas)]
+
+        if np is not None:
+            touchdowns = self._numpy_touchdowns(test_nums, means, sigmas, limits, num_sites, seed)
+        else:
+            touchdowns = self._python_touchdowns(test_nums, means, sigmas, limits, num_sites, rng)
+
+        with open(self.filepath, 'wb') as f:
+            self.records = []
+            self._add_far()
+            self._add_mir()
+            out = bytearray(b''.join(self.records))
+
+            part = 0
+            while part < num_parts:
+                sites = min(num_sites, num_parts - part)
+                self._write_touchdown(out, part, sites, touchdowns, test_nums, limits)
+                part += sites
+                if len(out) >= buffer_size:
+                    f.write(out)
+                    out.clear()
+
+            self.records = []
+            self._add_mrr()
+            out += b''.join(self.records)
+            f.write(out)
+            self.records = []
+            return f.tell()
+
+    @staticmethod
+    def bulk_part_size(num_tests: int = 100) -> int:
+        """Approximate bytes per part written by ``generate_bulk``"""
+        return _REPEAT_PTR.size * num_tests + _PIR.size + _PRR.size + 8
+
+    def _write_touchdown(self, out: bytearray, part: int, sites: int, touchdowns,
+                         test_nums: List[int], limits: List[tuple]) -> None:
+        """Append PIRs, PTRs and PRRs of one touchdown of ``sites`` parts"""
+        site_nums = range(1, sites + 1)
+        for site in site_nums:
+            out += _PIR.pack(2, 0x05, 0x0A, 1, site)
+
+        if part == 0:
+            # First PTR of every test/site: full record with name, limits, units
+            values, failed = touchdowns(sites)
+            for t, test_num in enumerate(test_nums):
+                test_txt = f'Test_{test_num}'.encode()
+                for s, site in enumerate(site_nums):
+                    data = (struct.pack('<IBBBBf', test_num, 1, site, 0x80 if failed[t][s] else 0, 0,
+                                        values[t][s])
+                            + bytes([len(test_txt)]) + test_txt + b'\0'
+                            + struct.pack('<Bbbbff', 0x0E, 0, 0, 0, *limits[t]) + b'\x01V')
+                    out += _HEADER.pack(len(data), 0x0F, 0x0A) + data
+            part_failed = [any(failed[t][s] for t in range(len(test_nums))) for s in range(sites)]
+        else:
+            block, part_failed = touchdowns(sites, packed=True)
+            out += block
+
+        for s, site in enumerate(site_nums):
+            part_no = part + s
+            part_id = str(part_no + 1).encode()
+            bin_num = 2 if part_failed[s] else 1
+            out += _PRR.pack(_PRR.size - _HEADER.size + len(part_id) + 2, 0x05, 0x14, 1, site,
+                             0x08 if part_failed[s] else 0, len(test_nums), bin_num, bin_num,
+                             part_no % _DIE_COLUMNS, part_no // _DIE_COLUMNS % _DIE_ROWS, 0)
+            out += bytes([len(part_id)]) + part_id + b'\0'
+
+    @staticmethod
+    def _numpy_touchdowns(test_nums, means, sigmas, limits, num_sites, seed):
+        """Touchdown factory: vectorized values, packed via a record dtype"""
+        rng = np.random.default_rng(seed)
+        means = np.array(means)[:, None]
+        sigmas = np.array(sigmas)[:, None]
+        lows = np.array([lo for lo, _ in limits], dtype=np.float32)[:, None]
+        highs = np.array([hi for _, hi in limits], dtype=np.float32)[:, None]
+        templates = {}
+
+        def touchdown(sites, packed=False):
+            values = (rng.standard_normal((len(test_nums), sites)) * sigmas + means).astype(np.float32)
+            failed = (values < lows) | (values > highs)
+            if not packed:
+                return values.tolist(), failed.tolist()
+
+            block = templates.get(sites)
+            if block is None:
+                # Constant fields, laid out test-major then site
+                block = templates[sites] = np.zeros(len(test_nums) * sites, dtype=_REPEAT_PTR_DTYPE)
+                block['rec_len'] = _REPEAT_PTR_LEN
+                block['rec_typ'] = 0x0F
+                block['rec_sub'] = 0x0A
+                block['test_num'] = np.repeat(test_nums, sites)
+                block['head_num'] = 1
+                block['site_num'] = np.tile(np.arange(1, sites + 1), len(test_nums))
+            block['result'] = values.ravel()
+            block['test_flg'] = failed.ravel() * 0x80
+            return block.tobytes(), failed.any(axis=0).tolist()
+
+        return touchdown
+
+    @staticmethod
+    def _python_touchdowns(test_nums, means, sigmas, limits, num_sites, rng):
+        """Touchdown factory without numpy: one gauss() and pack per PTR"""
+        pack = _REPEAT_PTR.pack
+        unpack_f = struct.Struct('<f')
+
+        def touchdown(sites, packed=False):
+            values = [[unpack_f.unpack(unpack_f.pack(rng.gauss(mean, sigma)))[0] for _ in range(sites)]
+                      for mean, sigma in zip(means, sigmas)]
+            failed = [[not lo <= value <= hi for value in row] for row, (lo, hi) in zip(values, limits)]
+            if not packed:
+                return values, failed
+
+            block = bytearray()
+            for test_num, row, row_failed in zip(test_nums, values, failed):
+                for site, (value, fail) in enumerate(zip(row, row_failed), 1):
+                    block += pack(_REPEAT_PTR_LEN, 0x0F, 0x0A, test_num, 1, site,
+                                  0x80 if fail else 0, 0, value, 0, 0)
+            return bytes(block), [any(column) for column in zip(*failed)]
+
+        return touchdown
+
     def _add_far(self) -> None:
         """Add File Attribute Record"""
         cpu_type = 2  # Sun
@@ -53,11 +224,19 @@ class STDFGenerator:
         result = random.uniform(1.0, 4.0)  # Random voltage 1-4V
         head_num = 1
         site_num = 1
-        test_flg = 0
+        low_limit = 0.0
+        high_limit = 5.0
+        test_flg = 0 if low_limit <= result <= high_limit else 0x80  # bit 7: test failed
+        parm_flg = 0
+        test_txt = f'Test_{test_num}'.encode()
+        opt_flag = 0x0E  # bit 1 reserved (set), no LO_SPEC/HI_SPEC
 
-        # Simplified PTR structure
-        data = struct.pack('<IBBBf', test_num, head_num, site_num, test_flg, result)
-        self._add_record(0x0F, 0x05, data)
+        data = (struct.pack('<IBBBBf', test_num, head_num, site_num, test_flg, parm_flg, result)
+                + struct.pack('<B', len(test_txt)) + test_txt
+                + struct.pack('<B', 0)  # ALARM_ID
+                + struct.pack('<Bbbbff', opt_flag, 0, 0, 0, low_limit, high_limit)
+                + struct.pack('<B', 1) + b'V')  # UNITS
+        self._add_record(0x0F, 0x0A, data)
 
     def _add_mrr(self) -> None:
         """Add Master Results Record"""
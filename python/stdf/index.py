@@ -0,0 +1,231 @@
+"""Persistent record index (sidecar cache) for STDF files"""
+
+import base64
+import hashlib
+import json
+import mmap
+import os
+import sys
+from array import array
+from typing import Any, Dict, Optional
+
+from .compression import detect_compression
+from .parser import HEADER, HEADER_SIZE, TEST_NUM, RecordType, STDFParser, STDFRecord
+from .records import record_name
+
+INDEX_SUFFIX = '.stdfidx'
+INDEX_VERSION = 1
+
+# Bytes hashed at each end of the file for the quick content check
+HASH_SPAN = 1024 * 1024
+
+
+def file_fingerprint(filepath: str, full_hash: bool = False) -> Dict[str, Any]:
+    """Size, mtime and content hash identifying one version of a file
+
+    By default only the first and last ``HASH_SPAN`` bytes are hashed, which
+    is cheap for multi-GB files; ``full_hash`` hashes the whole file.
+    """
+    stat = os.stat(filepath)
+    digest = hashlib.sha256()
+
+    with open(filepath, 'rb') as f:
+        if full_hash or stat.st_size <= 2 * HASH_SPAN:
+            for block in iter(lambda: f.read(HASH_SPAN), b''):
+                digest.update(block)
+        else:
+            digest.update(f.read(HASH_SPAN))
+            f.seek(-HASH_SPAN, 2)
+            digest.update(f.read(HASH_SPAN))
+
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest.hexdigest(),
+        'full_hash': full_hash
+    }
+
+
+def index_path(filepath: str, cache_dir: Optional[str] = None) -> str:
+    """Sidecar location: next to the file, or keyed by its path in cache_dir"""
+    if cache_dir is None:
+        return filepath + INDEX_SUFFIX
+
+    key = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, key + INDEX_SUFFIX)
+
+
+def _encode_offsets(offsets: array) -> str:
+    return base64.b64encode(offsets.tobytes()).decode('ascii')
+
+
+def _decode_offsets(data: str, byteorder: str) -> array:
+    offsets = array('Q')
+    offsets.frombytes(base64.b64decode(data))
+    if byteorder != sys.byteorder:
+        offsets.byteswap()
+    return offsets
+
+
+class RecordIndex:
+    """Record offsets of one STDF file, by record type and by test number
+
+    Built with a single header scan and persisted as a JSON sidecar so
+    later opens can seek straight to the records they need, or answer
+    ``file_info``/record-count questions without parsing at all.
+    """
+
+    def __init__(self, filepath: str, fingerprint: Dict[str, Any],
+                 record_offsets: Dict[int, array], test_offsets: Dict[int, array],
+                 file_info: Dict[str, Any]):
+        self.filepath = filepath
+        self.fingerprint = fingerprint
+        self.record_offsets = record_offsets
+        self.test_offsets_by_num = test_offsets
+        self.file_info = file_info
+
+    @property
+    def total_records(self) -> int:
+        return sum(len(offsets) for offsets in self.record_offsets.values())
+
+    def offsets(self, rec_type: int) -> array:
+        """Header offsets of all records of a ``RecordType``"""
+        return self.record_offsets.get(int(rec_type), array('Q'))
+
+    def test_offsets(self, test_num: int) -> array:
+        """Header offsets of the PTRs for one test number"""
+        return self.test_offsets_by_num.get(test_num, array('Q'))
+
+    def record_counts(self) -> Dict[str, int]:
+        """Record counts by type name (unknown types by hex id)"""
+        return {record_name(rec_id): len(offsets) for rec_id, offsets in self.record_offsets.items()}
+
+    @classmethod
+    def build(cls, filepath: str, full_hash: bool = False) -> 'RecordIndex':
+        """Scan the file's record headers and build a fresh index"""
+        if detect_compression(filepath) is not None:
+            raise ValueError(f'cannot index compressed file {filepath}; index the decompressed file')
+
+        fingerprint = file_fingerprint(filepath, full_hash)
+        record_offsets: Dict[int, array] = {}
+        test_offsets: Dict[int, array] = {}
+        parser = STDFParser(filepath)
+
+        with open(filepath, 'rb') as f:
+            size = fingerprint['size']
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+        try:
+            unpack_header = HEADER.unpack_from
+            unpack_test_num = TEST_NUM.unpack_from
+            offset = 0
+            end = size - HEADER_SIZE
+
+            while offset <= end:
+                rec_len, rec_type, rec_sub = unpack_header(view, offset)
+                rec_id = (rec_type << 8) | rec_sub
+                start = offset + HEADER_SIZE
+
+                offsets = record_offsets.get(rec_id)
+                if offsets is None:
+                    offsets = record_offsets[rec_id] = array('Q')
+                offsets.append(offset)
+
+                if rec_id == RecordType.PTR and rec_len >= 4 and start + 4 <= size:
+                    test_num = unpack_test_num(view, start)[0]
+                    by_test = test_offsets.get(test_num)
+                    if by_test is None:
+                        by_test = test_offsets[test_num] = array('Q')
+                    by_test.append(offset)
+                elif rec_id == RecordType.MIR:
+                    payload = view[start:start + rec_len]
+                    parser._parse_record(STDFRecord(rec_type, rec_sub, rec_len, payload))
+
+                offset = start + rec_len
+        finally:
+            if size:
+                view.close()
+
+        return cls(filepath, fingerprint, record_offsets, test_offsets, parser.file_info)
+
+    def is_current(self) -> bool:
+        """Whether the indexed file is unchanged on disk"""
+        try:
+            stat = os.stat(self.filepath)
+        except OSError:
+            return False
+
+        if (stat.st_size != self.fingerprint['size']
+                or stat.st_mtime_ns != self.fingerprint['mtime_ns']):
+            return False
+
+        current = file_fingerprint(self.filepath, self.fingerprint.get('full_hash', False))
+        return current['sha256'] == self.fingerprint['sha256']
+
+    def save(self, path: Optional[str] = None) -> str:
+        """Write the index as JSON (atomically); returns the path written"""
+        if path is None:
+            path = index_path(self.filepath)
+
+        payload = {
+            'version': INDEX_VERSION,
+            'filepath': os.path.abspath(self.filepath),
+            'fingerprint': self.fingerprint,
+            'byteorder': sys.byteorder,
+            'file_info': self.file_info,
+            'record_offsets': {str(k): _encode_offsets(v) for k, v in self.record_offsets.items()},
+            'test_offsets': {str(k): _encode_offsets(v) for k, v in self.test_offsets_by_num.items()}
+        }
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, filepath: str, path: Optional[str] = None) -> Optional['RecordIndex']:
+        """Load a saved index; None if missing, unreadable or stale"""
+        if path is None:
+            path = index_path(filepath)
+
+        try:
+            with open(path) as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if payload.get('version') != INDEX_VERSION:
+            return None
+
+        byteorder = payload['byteorder']
+        index = cls(
+            filepath,
+            payload['fingerprint'],
+            {int(k): _decode_offsets(v, byteorder) for k, v in payload['record_offsets'].items()},
+            {int(k): _decode_offsets(v, byteorder) for k, v in payload['test_offsets'].items()},
+            payload['file_info']
+        )
+        return index if index.is_current() else None
+
+    @classmethod
+    def load_or_build(cls, filepath: str, cache_dir: Optional[str] = None,
+                      full_hash: bool = False) -> 'RecordIndex':
+        """Return a valid index for filepath, rebuilding and saving it if needed
+
+        The sidecar is written next to the file unless ``cache_dir`` is given.
+        Failing to write it (e.g. a read-only directory) is not an error.
+        """
+        path = index_path(filepath, cache_dir)
+        index = cls.load(filepath, path)
+        if index is not None:
+            return index
+
+        index = cls.build(filepath, full_hash)
+        try:
+            if cache_dir is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+            index.save(path)
+        except OSError:
+            pass
+        return index
@@ -0,0 +1,245 @@
+"""Lazily decoded STDF records
+
+A lazy record is a ``__slots__`` view holding the record header and the
+offset of its payload in a shared buffer: the file's memory map, or a
+chunk read from the file. Nothing is decoded or copied when it is made.
+
+FAR, MIR, PTR and PRR views expose the fields of their ``records.py``
+dataclass. Their fixed-size block (e.g. a PTR's TEST_NUM..RESULT) is
+unpacked by one ``unpack_from`` on first access to any of its fields;
+the other fields (strings, PTR limits) come from a full decode on first
+access. Both are memoized on the view. Other record types only expose the
+header, ``data`` and ``decode()``.
+"""
+
+import struct
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional, Tuple, Type
+
+from .decoders import _FAR, _MIR, _PRR, _PTR, DECODERS, Buffer, _fixed as _unpack_fixed
+from .parser import HEADER, HEADER_SIZE
+from .records import RecordType
+
+# Bytes read per chunk when the file is not memory mapped
+LAZY_CHUNK_SIZE = 1024 * 1024
+
+
+class _Fixed:
+    """Field of a record's fixed-size block"""
+    __slots__ = ('index',)
+
+    def __init__(self, index: int):
+        self.index = index
+
+    def __get__(self, record: Optional['LazyRecord'], owner: Optional[type] = None) -> Any:
+        if record is None:
+            return self
+        fixed = record._fixed
+        if fixed is None:
+            layout = record._FIXED
+            buf, offset = record._buf, record._offset
+            if record.rec_len >= layout.size and offset + layout.size <= len(buf):
+                fixed = layout.unpack_from(buf, offset)
+            else:
+                fixed = _unpack_fixed(layout, buf, offset, record._end())
+            record._fixed = fixed
+        return fixed[self.index]
+
+
+class _Decoded:
+    """Field read from the fully decoded record"""
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, record: Optional['LazyRecord'], owner: Optional[type] = None) -> Any:
+        if record is None:
+            return self
+        return getattr(record.decode(), self.name)
+
+
+class LazyRecord:
+    """Record header plus the location of its payload; decoded on demand"""
+    __slots__ = ('rec_type', 'rec_sub', 'rec_len', '_buf', '_offset', '_fixed', '_record')
+
+    _FIXED: Optional[struct.Struct] = None
+
+    def __init__(self, rec_type: int, rec_sub: int, rec_len: int, buf: Buffer, offset: int):
+        self.rec_type = rec_type
+        self.rec_sub = rec_sub
+        self.rec_len = rec_len
+        self._buf = buf
+        self._offset = offset
+        self._fixed: Optional[Tuple] = None
+        self._record: Any = None
+
+    def _end(self) -> int:
+        # A truncated trailing record ends with the buffer
+        return min(self._offset + self.rec_len, len(self._buf))
+
+    @property
+    def data(self) -> Buffer:
+        """The payload: a ``memoryview`` of the mapping, or ``bytes``"""
+        return self._buf[self._offset:self._offset + self.rec_len]
+
+    def decode(self) -> Optional[Any]:
+        """The record's ``records.py`` dataclass (None if unsupported), decoded once"""
+        record = self._record
+        if record is None:
+            decoder = DECODERS.get((self.rec_type, self.rec_sub))
+            if decoder is None:
+                return None
+            record = self._record = decoder(self._buf, self._offset, self._end())
+        return record
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}(rec_type={self.rec_type}, rec_sub={self.rec_sub}, rec_len={self.rec_len})'
+
+
+class LazyFAR(LazyRecord):
+    """FAR view"""
+    __slots__ = ()
+    _FIXED = _FAR
+
+    cpu_type = _Fixed(0)
+    stdf_ver = _Fixed(1)
+
+
+class LazyMIR(LazyRecord):
+    """MIR view"""
+    __slots__ = ()
+    _FIXED = _MIR
+
+    setup_t = _Fixed(0)
+    start_t = _Fixed(1)
+    stat_num = _Fixed(2)
+    # C1 codes are normalized by the decoder
+    mode_cod = _Decoded('mode_cod')
+    rtst_cod = _Decoded('rtst_cod')
+    prot_cod = _Decoded('prot_cod')
+    lot_id = _Decoded('lot_id')
+    part_typ = _Decoded('part_typ')
+    node_nam = _Decoded('node_nam')
+    tstr_typ = _Decoded('tstr_typ')
+    job_nam = _Decoded('job_nam')
+
+
+class LazyPTR(LazyRecord):
+    """PTR view"""
+    __slots__ = ()
+    _FIXED = _PTR
+
+    test_num = _Fixed(0)
+    head_num = _Fixed(1)
+    site_num = _Fixed(2)
+    test_flg = _Fixed(3)
+    parm_flg = _Fixed(4)
+    result = _Fixed(5)
+    test_txt = _Decoded('test_txt')
+    alarm_id = _Decoded('alarm_id')
+    opt_flag = _Decoded('opt_flag')
+    res_scal = _Decoded('res_scal')
+    llm_scal = _Decoded('llm_scal')
+    hlm_scal = _Decoded('hlm_scal')
+    lo_limit = _Decoded('lo_limit')
+    hi_limit = _Decoded('hi_limit')
+    units = _Decoded('units')
+
+
+class LazyPRR(LazyRecord):
+    """PRR view"""
+    __slots__ = ()
+    _FIXED = _PRR
+
+    head_num = _Fixed(0)
+    site_num = _Fixed(1)
+    part_flg = _Fixed(2)
+    num_test = _Fixed(3)
+    hard_bin = _Fixed(4)
+    soft_bin = _Fixed(5)
+    x_coord = _Fixed(6)
+    y_coord = _Fixed(7)
+    test_t = _Fixed(8)
+    part_id = _Decoded('part_id')
+    part_txt = _Decoded('part_txt')
+
+
+def _key(rec_type: RecordType) -> Tuple[int, int]:
+    return rec_type >> 8, rec_type & 0xFF
+
+
+# View classes keyed by (rec_type, rec_sub); others get a plain LazyRecord
+LAZY_TYPES: Dict[Tuple[int, int], Type[LazyRecord]] = {
+    _key(RecordType.FAR): LazyFAR,
+    _key(RecordType.MIR): LazyMIR,
+    _key(RecordType.PTR): LazyPTR,
+    _key(RecordType.PRR): LazyPRR,
+}
+
+
+def lazy_record(rec_type: int, rec_sub: int, rec_len: int, buf: Buffer, offset: int = 0) -> LazyRecord:
+    """A view of the record whose payload starts at ``offset`` in ``buf``"""
+    return LAZY_TYPES.get((rec_type, rec_sub), LazyRecord)(rec_type, rec_sub, rec_len, buf, offset)
+
+
+def iter_lazy_records(buf: Buffer, start: int = 0, stop: Optional[int] = None) -> Iterator[LazyRecord]:
+    """Views of the records in a buffer (e.g. a memory map), from ``start``
+
+    ``start`` must be a record boundary; records starting before ``stop``
+    are yielded, a truncated trailing one with a short payload.
+    """
+    unpack_header = HEADER.unpack_from
+    lazy_types = LAZY_TYPES
+    offset = start
+    end = len(buf) - HEADER_SIZE
+    if stop is not None:
+        end = min(end, stop - 1)
+
+    while offset <= end:
+        rec_len, rec_type, rec_sub = unpack_header(buf, offset)
+        start = offset + HEADER_SIZE
+        offset = start + rec_len
+        yield lazy_types.get((rec_type, rec_sub), LazyRecord)(rec_type, rec_sub, rec_len, buf, start)
+
+
+def iter_lazy_stream(f: BinaryIO, chunk_size: int = LAZY_CHUNK_SIZE) -> Iterator[LazyRecord]:
+    """Views of the records of a stream, read in chunks the views share
+
+    Only a record split across two chunks is copied, to the next chunk.
+    """
+    unpack_header = HEADER.unpack_from
+    lazy_types = LAZY_TYPES
+    buf = b''
+    offset = 0
+
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            if len(buf) - offset >= HEADER_SIZE:  # truncated trailing record
+                rec_len, rec_type, rec_sub = unpack_header(buf, offset)
+                yield lazy_record(rec_type, rec_sub, rec_len, buf, offset + HEADER_SIZE)
+            return
+
+        buf = buf[offset:] + chunk if offset < len(buf) else chunk
+        offset = 0
+        size = len(buf)
+        last = size - HEADER_SIZE
+        while offset <= last:
+            rec_len, rec_type, rec_sub = unpack_header(buf, offset)
+            start = offset + HEADER_SIZE
+            if start + rec_len > size:
+                break
+            offset = start + rec_len
+            yield lazy_types.get((rec_type, rec_sub), LazyRecord)(rec_type, rec_sub, rec_len, buf, start)
+
+
+def iter_lazy_at(buf: Buffer, offsets: Iterable[int]) -> Iterator[LazyRecord]:
+    """Views of the records starting at the given offsets of a buffer"""
+    unpack_header = HEADER.unpack_from
+    end = len(buf) - HEADER_SIZE
+
+    for offset in offsets:
+        if offset > end:
+            break
+        rec_len, rec_type, rec_sub = unpack_header(buf, offset)
+        yield lazy_record(rec_type, rec_sub, rec_len, buf, offset + HEADER_SIZE)
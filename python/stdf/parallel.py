@@ -0,0 +1,376 @@
+"""Parallel parsing of STDF files with a process pool"""
+
+import io
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .compression import detect_compression
+from .parser import HEADER, HEADER_SIZE, STDFParser, TestLimits, calculate_statistics, write_csv
+from .records import PartResultsRecord, RecordType
+from .results import TestResultStore
+from .parts import PartIndex
+from .wafer import BinSummary
+
+if TYPE_CHECKING:
+    from .index import RecordIndex
+
+
+class ParsedFiles:
+    """Merged results of several STDF files
+
+    Exposes ``filepath`` and ``test_results`` like ``STDFParser``, so it can
+    be passed to ``STDFAnalyzer`` to analyze the whole set. ``files`` holds
+    one summary dict per input, including the ``rows`` range its results
+    occupy in the merged store; ``bin_summary`` combines their bins and
+    wafers and ``parts`` links the merged rows to their parts.
+    """
+
+    def __init__(self, files: List[Dict[str, Any]], test_results: TestResultStore,
+                 part_results: Optional[List[PartResultsRecord]] = None,
+                 bin_summary: Optional[BinSummary] = None,
+                 parts: Optional[PartIndex] = None):
+        self.files = files
+        self.test_results = test_results
+        self.part_results = part_results if part_results is not None else []
+        self.bin_summary = bin_summary if bin_summary is not None else BinSummary()
+        self.parts = parts if parts is not None else PartIndex()
+        self.filepath = ', '.join(info['filepath'] for info in files)
+
+    @property
+    def total_records(self) -> int:
+        return sum(info['total_records'] for info in self.files)
+
+    def statistics(self) -> Dict[str, Any]:
+        """Pass/fail statistics over all files"""
+        return calculate_statistics(self.test_results)
+
+    def export_csv(self, output_path: str) -> None:
+        """Export the merged test results to CSV"""
+        write_csv(output_path, self.test_results)
+
+    def get_summary(self) -> str:
+        """Get human-readable summary"""
+        stats = self.statistics()
+        return f"""
+STDF Multi-File Analysis Summary
+{'=' * 50}
+Files: {len(self.files)}
+Total Records: {self.total_records}
+Total Tests: {stats['total_tests']}
+Pass Count: {stats['pass_count']}
+Fail Count: {stats['fail_count']}
+Yield Rate: {stats['yield_rate']:.2f}%
+{'=' * 50}
+"""
+
+
+def _parse_file(filepath: str, use_mmap: bool, record_types: Optional[Iterable[int]] = None,
+                tests: Optional[Iterable[int]] = None, use_index: bool = False) -> Dict[str, Any]:
+    """Worker: parse one file and return its compact columnar results"""
+    index = STDFParser(filepath).load_index() if use_index else None
+    with STDFParser(filepath, use_mmap=use_mmap, record_types=record_types, tests=tests,
+                    index=index) as parser:
+        parser.parse()
+        return {
+            'filepath': filepath,
+            'file_info': parser.file_info,
+            'total_records': len(parser.records),
+            'test_results': parser.test_results,
+            'part_results': parser.part_results,
+            'bin_summary': parser.bin_summary,
+            'parts': parser.parts
+        }
+
+
+def parse_many(paths: Sequence[str], workers: Optional[int] = None, use_mmap: bool = False,
+               record_types: Optional[Iterable[int]] = None, tests: Optional[Iterable[int]] = None,
+               use_index: bool = False) -> ParsedFiles:
+    """Parse several STDF files, fanning them out to a process pool
+
+    Each worker returns its file's ``TestResultStore``, which pickles as raw
+    column arrays. Results are merged in the order of ``paths``. ``workers``
+    defaults to the CPU count; ``workers=1`` parses in-process.
+    ``record_types`` and ``tests`` filter every file as in ``STDFParser``;
+    ``use_index`` has each worker load (or build) its file's sidecar index
+    to seek to the selected records.
+    """
+    paths = list(paths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(paths)))
+
+    if workers == 1:
+        parsed = [_parse_file(path, use_mmap, record_types, tests, use_index) for path in paths]
+    else:
+        count = len(paths)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(_parse_file, paths, [use_mmap] * count, [record_types] * count,
+                                       [tests] * count, [use_index] * count))
+
+    return merge_parsed(parsed)
+
+
+def merge_parsed(parsed: Sequence[Dict[str, Any]]) -> ParsedFiles:
+    """Merge per-file ``_parse_file`` results, in order, into ``ParsedFiles``"""
+    merged = TestResultStore()
+    part_results: List[PartResultsRecord] = []
+    bin_summary = BinSummary()
+    parts = PartIndex()
+    files = []
+    for info in parsed:
+        start = len(merged)
+        merged.extend(info.pop('test_results'))
+        part_results.extend(info.pop('part_results'))
+        bin_summary.merge(info.pop('bin_summary'))
+        parts.merge(info.pop('parts'))
+        info['rows'] = (start, len(merged))
+        files.append(info)
+
+    return ParsedFiles(files, merged, part_results, bin_summary, parts)
+
+
+# Smallest byte range worth handing to a worker process
+MIN_CHUNK_SIZE = 4 * 1024 * 1024
+
+_REC_LEN = struct.Struct('<H')
+_PTR_KEY = struct.Struct('<IBB')
+
+
+def find_chunk_boundaries(filepath: str, chunks: int,
+                          test_limits: Optional[Dict[Tuple[int, int, int], TestLimits]] = None,
+                          index: Optional['RecordIndex'] = None) -> List[Tuple[int, int]]:
+    """Pre-scan record headers and split the file into byte ranges
+
+    Only the REC_LEN of each header is read to hop from record to record;
+    ranges start and end on record boundaries and are roughly equal in size.
+    If ``test_limits`` is given, the first PTR of every (test_num, head,
+    site) is also decoded into it, so chunk workers can resolve repeat PTRs
+    that rely on limits from an earlier chunk. With the file's ``index``
+    there is no scan: boundaries come from its record offsets and only the
+    PTRs' test/head/site keys are read.
+    """
+    with open(filepath, 'rb') as f:
+        size = f.seek(0, 2)
+        if size == 0:
+            return []
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        chunks = max(1, min(chunks, size // MIN_CHUNK_SIZE or 1))
+        if index is not None:
+            boundaries = _index_boundaries(index, size / chunks)
+            if test_limits is not None:
+                with memoryview(mapped) as view:
+                    _index_limits(index, view, size, test_limits)
+        elif test_limits is None:
+            boundaries = _scan_boundaries(mapped, size, size / chunks)
+        else:
+            with memoryview(mapped) as view:
+                boundaries = _scan_boundaries_and_limits(view, size, size / chunks, test_limits)
+    finally:
+        mapped.close()
+
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def _scan_boundaries(mapped: mmap.mmap, size: int, target: float) -> List[int]:
+    """Record offsets roughly ``target`` bytes apart, hopping on REC_LEN only"""
+    unpack_len = _REC_LEN.unpack_from
+    boundaries = [0]
+    next_cut = target
+    offset = 0
+    end = size - HEADER_SIZE
+
+    while offset <= end:
+        offset += unpack_len(mapped, offset)[0] + HEADER_SIZE
+        if offset >= next_cut and offset < size:
+            boundaries.append(offset)
+            next_cut = offset + target
+    return boundaries
+
+
+def _scan_boundaries_and_limits(view: memoryview, size: int, target: float,
+                                test_limits: Dict[Tuple[int, int, int], TestLimits]) -> List[int]:
+    """``_scan_boundaries()``, also decoding the first PTR of every test/head/site
+
+    Headers are unpacked in place; only a first PTR is decoded, from a
+    zero-copy slice of ``view``.
+    """
+    unpack_header = HEADER.unpack_from
+    unpack_key = _PTR_KEY.unpack_from
+    first_ptr_limits = STDFParser._first_ptr_limits
+    ptr_type, ptr_sub = RecordType.PTR >> 8, RecordType.PTR & 0xFF
+    boundaries = [0]
+    next_cut = target
+    offset = 0
+    end = size - HEADER_SIZE
+
+    while offset <= end:
+        rec_len, rec_type, rec_sub = unpack_header(view, offset)
+        start = offset + HEADER_SIZE
+        offset = start + rec_len
+        if rec_type == ptr_type and rec_sub == ptr_sub and rec_len >= 6 and start + 6 <= size:
+            key = unpack_key(view, start)
+            if key not in test_limits:
+                payload = view[start:offset]
+                test_limits[key] = first_ptr_limits(payload, len(payload))
+
+        if offset >= next_cut and offset < size:
+            boundaries.append(offset)
+            next_cut = offset + target
+    return boundaries
+
+
+def _index_boundaries(index: 'RecordIndex', target: float) -> List[int]:
+    """``_scan_boundaries()`` from the record offsets of an index"""
+    offsets = sorted(chain.from_iterable(index.record_offsets.values()))
+    boundaries = [0]
+    position = bisect_left(offsets, target)
+    while position < len(offsets):
+        boundaries.append(offsets[position])
+        position = bisect_left(offsets, offsets[position] + target, position + 1)
+    return boundaries
+
+
+def _index_limits(index: 'RecordIndex', view: memoryview, size: int,
+                  test_limits: Dict[Tuple[int, int, int], TestLimits]) -> None:
+    """Decode the first PTR of every test/head/site, found through an index"""
+    unpack_len = _REC_LEN.unpack_from
+    unpack_key = _PTR_KEY.unpack_from
+    first_ptr_limits = STDFParser._first_ptr_limits
+    for offsets in index.test_offsets_by_num.values():
+        for offset in offsets:
+            rec_len = unpack_len(view, offset)[0]
+            start = offset + HEADER_SIZE
+            if rec_len < 6 or start + 6 > size:
+                continue
+            key = unpack_key(view, start)
+            if key not in test_limits:
+                payload = view[start:start + rec_len]
+                test_limits[key] = first_ptr_limits(payload, len(payload))
+
+
+def _chunk_records(parser: STDFParser, start: int, stop: int, offsets: Optional[List[int]]) -> Iterator[Any]:
+    """Records of a byte range passing the parser's filters, mapped or read"""
+    if parser.use_mmap:
+        if offsets is None:
+            yield from parser._read_records_mmap(start, stop)
+        else:
+            yield from parser._read_records_mmap_at(offsets)
+        return
+
+    with open(parser.filepath, 'rb') as f:
+        if offsets is None:
+            f.seek(start)
+            yield from parser._read_records(io.BytesIO(f.read(stop - start)))
+        else:
+            yield from parser._read_records_at(f, offsets)
+
+
+def _parse_chunk(filepath: str, start: int, stop: int,
+                 test_limits: Dict[Tuple[int, int, int], TestLimits], use_mmap: bool = True,
+                 record_types: Optional[Iterable[int]] = None, tests: Optional[Iterable[int]] = None,
+                 offsets: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Worker: decode the records in one byte range of a file
+
+    ``offsets``, from a sidecar index, are those of the selected records in
+    the range; otherwise the range is scanned.
+    """
+    with STDFParser(filepath, use_mmap=use_mmap, record_types=record_types, tests=tests) as parser:
+        parser.test_limits.update(test_limits)
+        parser._link_rows(True)
+        add_result = parser.test_results.add
+        parse_record = parser._parse_record
+        total_records = 0
+
+        for record in _chunk_records(parser, start, stop, offsets):
+            total_records += 1
+            row = parse_record(record)
+            if row is not None:
+                add_result(*row)
+
+        return {
+            'file_info': parser.file_info,
+            'total_records': total_records,
+            'test_results': parser.test_results,
+            'part_results': parser.part_results,
+            'bin_summary': parser.bin_summary,
+            'parts': parser.parts
+        }
+
+
+def parse_chunked(filepath: str, workers: Optional[int] = None, use_mmap: bool = True,
+                  record_types: Optional[Iterable[int]] = None, tests: Optional[Iterable[int]] = None,
+                  index: Optional['RecordIndex'] = None) -> ParsedFiles:
+    """Parse one large STDF file using several worker processes
+
+    A header-only pre-scan finds record boundaries, the file is cut into a
+    few ranges per worker, and each range is decoded from a read-only
+    memory map (``use_mmap``) or read into memory. Per-chunk results are
+    merged in file order. ``record_types``, ``tests`` and ``index`` select
+    records as in ``STDFParser``.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if detect_compression(filepath) is not None:
+        # Record boundaries can't be found without decompressing; use the
+        # workers for (block-parallel) decompression instead
+        with STDFParser(filepath, record_types=record_types, tests=tests,
+                        decompress_workers=workers) as parser:
+            parser.parse()
+            info = {
+                'filepath': filepath,
+                'file_info': parser.file_info,
+                'total_records': len(parser.records),
+                'rows': (0, len(parser.test_results))
+            }
+            return ParsedFiles([info], parser.test_results, parser.part_results, parser.bin_summary,
+                               parser.parts)
+
+    test_limits: Dict[Tuple[int, int, int], TestLimits] = {}
+    ranges = find_chunk_boundaries(filepath, workers * 4, test_limits, index)
+    workers = max(1, min(workers, len(ranges)))
+    count = len(ranges)
+    selected = STDFParser(filepath, record_types=record_types, tests=tests, index=index)._indexed_offsets()
+    if selected is None:
+        chunk_offsets: List[Optional[List[int]]] = [None] * count
+    else:
+        cuts = [bisect_left(selected, stop) for _start, stop in ranges]
+        chunk_offsets = [selected[first:last] for first, last in zip([0] + cuts, cuts)]
+
+    args = ([filepath] * count, *zip(*ranges), [test_limits] * count, [use_mmap] * count,
+            [record_types] * count, [tests] * count, chunk_offsets)
+    if workers == 1:
+        parsed = list(map(_parse_chunk, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(_parse_chunk, *args))
+
+    merged = TestResultStore()
+    part_results: List[PartResultsRecord] = []
+    bin_summary = BinSummary()
+    parts = PartIndex()
+    file_info: Dict[str, Any] = {}
+    total_records = 0
+    for chunk in parsed:
+        merged.extend(chunk['test_results'])
+        part_results.extend(chunk['part_results'])
+        bin_summary.merge(chunk['bin_summary'], continued=True)
+        parts.merge(chunk['parts'], continued=True)
+        file_info.update(chunk['file_info'])
+        total_records += chunk['total_records']
+
+    info = {
+        'filepath': filepath,
+        'file_info': file_info,
+        'total_records': total_records,
+        'rows': (0, len(merged))
+    }
+    return ParsedFiles([info], merged, part_results, bin_summary, parts)
@@ -1,166 +1,623 @@
 """STDF File Parser for semiconductor test data"""
 
+import mmap
 import struct
-from typing import Dict, List, Any, BinaryIO
+import time
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Callable, Dict, List, Any, BinaryIO, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
 from dataclasses import dataclass
-from enum import IntEnum
+from .compression import detect_compression, open_stdf
+from .decoders import (
+    OPT_HI_LIMIT_INVALID, OPT_LO_LIMIT_INVALID, OPT_NO_HI_LIMIT, OPT_NO_LO_LIMIT,
+    TEST_FLG_FAILED, TEST_FLG_NO_PASS_FAIL, decode_mir, decode_prr, decode_ptr, decode_record,
+    decode_pir, decode_wir, decode_wrr,
+)
+from .records import PartResultsRecord, RecordType
+from .results import ResultRow, TestResult, TestResultStore
+from .parts import PartIndex
+from .wafer import BinSummary
 
+if TYPE_CHECKING:
+    from .index import RecordIndex
+    from .lazy import LazyRecord
+    from .profiling import Profiler
 
-class RecordType(IntEnum):
-    """STDF Record Types"""
-    FAR = 0x00_0A  # File Attribute Record
-    MIR = 0x01_0A  # Master Information Record
-    MRR = 0x01_14  # Master Results Record
-    PCR = 0x01_1E  # Part Count Record
-    PTR = 0x0F_05  # Parametric Test Record
-    FTR = 0x0F_14  # Functional Test Record
-    PIR = 0x05_0A  # Part Information Record
-    PRR = 0x05_14  # Part Results Record
 
+# Record header: REC_LEN (U2), REC_TYP (U1), REC_SUB (U1)
+HEADER = struct.Struct('<HBB')
+HEADER_SIZE = HEADER.size
 
-@dataclass
-class STDFRecord:
-    """Base STDF Record"""
-    rec_type: int
-    rec_sub: int
-    rec_len: int
-    data: bytes
+# Leading TEST_NUM (U4) of PTR/FTR payloads
+TEST_NUM = struct.Struct('<I')
 
+# PTR fixed fields: TEST_NUM, HEAD_NUM, SITE_NUM, TEST_FLG, PARM_FLG, RESULT
+_PTR_FIXED = struct.Struct('<IBBBBf')
+_PTR_FIXED_SIZE = _PTR_FIXED.size
+# LO_LIMIT/HI_LIMIT (R4), 4 and 8 bytes after OPT_FLAG
+_R4 = struct.Struct('<f')
 
-@dataclass
-class TestResult:
-    """Parsed test result"""
-    test_num: int
+_MASK_LO = OPT_LO_LIMIT_INVALID | OPT_NO_LO_LIMIT
+_MASK_HI = OPT_HI_LIMIT_INVALID | OPT_NO_HI_LIMIT
+
+
+class TestLimits(NamedTuple):
+    """Metadata from the first PTR of a (test_num, head, site), reused by repeats"""
     test_name: str
-    result: float
     unit: str
     low_limit: float
     high_limit: float
-    pass_fail: bool
+    res_scal: int
+    llm_scal: int
+    hlm_scal: int
+
+
+@dataclass
+class STDFRecord:
+    """Base STDF Record
+
+    ``data`` is a ``bytes`` copy of the payload, or a ``memoryview`` into the
+    mapped file when the parser runs with ``use_mmap=True``.
+    """
+    rec_type: int
+    rec_sub: int
+    rec_len: int
+    data: Union[bytes, memoryview]
 
 
 class STDFParser:
-    """STDF file parser for semiconductor test data"""
+    """STDF file parser for semiconductor test data
+
+    ``record_types`` and ``tests`` restrict parsing to those record types and
+    PTR test numbers; other records are skipped by seeking past ``rec_len``
+    without reading their payload. With an ``index`` (see ``load_index()``)
+    a filtered parse only reads the matching records. A ``profiler`` (see
+    ``stdf.profiling``) collects record counts and io/decode/statistics
+    timings of ``parse()``.
+
+    PRRs, WIRs and WRRs are folded into ``bin_summary`` (bin counts per
+    site, yield and wafer maps, see ``stdf.wafer``) as they are decoded.
+    ``parse()`` also links every stored result row to the part tested on
+    its head/site in ``parts`` (see ``stdf.parts``).
+
+    gzip/bz2/xz/zstd compressed files are detected and decompressed on the
+    fly (``use_mmap`` is ignored for them); ``decompress_workers`` threads
+    decompress BGZF and multi-frame zstd files in parallel.
+    """
 
-    def __init__(self, filepath: str):
+    def __init__(self, filepath: str, use_mmap: bool = False,
+                 record_types: Optional[Iterable[int]] = None,
+                 tests: Optional[Iterable[int]] = None,
+                 index: Optional['RecordIndex'] = None,
+                 profiler: Optional['Profiler'] = None,
+                 decompress_workers: int = 1):
         self.filepath = filepath
+        self.use_mmap = use_mmap
+        self.record_types = None if record_types is None else {int(t) for t in record_types}
+        self.tests = None if tests is None else set(tests)
+        self.index = index
+        self.profiler = profiler
+        self.decompress_workers = decompress_workers
         self.records: List[STDFRecord] = []
-        self.test_results: List[TestResult] = []
+        self.test_results = TestResultStore()
         self.file_info: Dict[str, Any] = {}
+        self.part_results: List[PartResultsRecord] = []
+        self.bin_summary = BinSummary()
+        self.parts = PartIndex()
+        # Records the head/site of each stored result row, while storing
+        self._link_row: Optional[Callable[[int], None]] = None
+        # First-PTR limits/units/scales keyed by (test_num, head_num, site_num)
+        self.test_limits: Dict[Tuple[int, int, int], TestLimits] = {}
+        self._mmap: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+
+        # Record handlers keyed by (rec_type, rec_sub)
+        self._handlers = {
+            (RecordType.MIR >> 8, RecordType.MIR & 0xFF): self._parse_mir,
+            (RecordType.PTR >> 8, RecordType.PTR & 0xFF): self._parse_ptr,
+            (RecordType.PIR >> 8, RecordType.PIR & 0xFF): self._parse_pir,
+            (RecordType.PRR >> 8, RecordType.PRR & 0xFF): self._parse_prr,
+            (RecordType.WIR >> 8, RecordType.WIR & 0xFF): self._parse_wir,
+            (RecordType.WRR >> 8, RecordType.WRR & 0xFF): self._parse_wrr,
+        }
+
+    def __enter__(self) -> 'STDFParser':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     def parse(self) -> Dict[str, Any]:
         """Parse STDF file and extract test data"""
-        with open(self.filepath, 'rb') as f:
-            self._read_records(f)
-            self._extract_test_results()
+        self._link_rows(True)
+        try:
+            if self.profiler is not None:
+                self._parse_profiled(self.profiler)
+            else:
+                records = self.records
+                add_result = self.test_results.add
+                parse_record = self._parse_record
+
+                for record in self._iter_raw_records(self._indexed_offsets()):
+                    records.append(record)
+
+                    # Parse specific record types
+                    row = parse_record(record)
+                    if row is not None:
+                        add_result(*row)
+        finally:
+            self._link_rows(False)
+
+        self._extract_test_results()
+
+        with self.profiler.timer('statistics') if self.profiler is not None else nullcontext():
+            statistics = self._calculate_statistics()
 
         return {
             'file_info': self.file_info,
             'total_records': len(self.records),
             'test_results': self.test_results,
-            'statistics': self._calculate_statistics()
+            'statistics': statistics
         }
 
-    def _read_records(self, f: BinaryIO) -> None:
-        """Read all records from STDF file"""
+    def _parse_profiled(self, profiler: 'Profiler') -> None:
+        """The ``parse()`` loop, timing reads ('io') and decoding ('decode')"""
+        records = self.records
+        add_result = self.test_results.add
+        parse_record = self._parse_record
+        count_record = profiler.count_record
+        perf_counter = time.perf_counter
+        raw_records = self._iter_raw_records(self._indexed_offsets())
+        io_time = decode_time = 0.0
+
         while True:
-            header = f.read(4)
-            if len(header) < 4:
+            start = perf_counter()
+            record = next(raw_records, None)
+            read = perf_counter()
+            io_time += read - start
+            if record is None:
                 break
 
-            rec_len, rec_type, rec_sub = struct.unpack('<HBB', header)
-            data = f.read(rec_len)
+            records.append(record)
+            count_record(record.rec_type, record.rec_sub, record.rec_len)
+            row = parse_record(record)
+            if row is not None:
+                add_result(*row)
+            decode_time += perf_counter() - read
 
-            record = STDFRecord(rec_type, rec_sub, rec_len, data)
-            self.records.append(record)
+        profiler.add_time('io', io_time)
+        profiler.add_time('decode', decode_time)
 
-            # Parse specific record types
-            self._parse_record(record)
+    def _link_rows(self, enabled: bool) -> None:
+        """Record the head/site of each result row stored from now on in ``parts``"""
+        self._link_row = self.parts.row_site.append if enabled else None
 
-    def _parse_record(self, record: STDFRecord) -> None:
-        """Parse specific record types"""
-        rec_id = (record.rec_type << 8) | record.rec_sub
+    def iter_records(self, offsets: Optional[Iterable[int]] = None,
+                     lazy: bool = False) -> Iterator[Union[STDFRecord, 'LazyRecord']]:
+        """Lazily yield raw records without keeping them in ``self.records``
 
-        if rec_id == RecordType.MIR:
-            self._parse_mir(record.data)
-        elif rec_id == RecordType.PTR:
-            self._parse_ptr(record.data)
+        ``offsets`` restricts the scan to records starting at those byte
+        offsets, e.g. from ``RecordIndex.test_offsets()``. With ``lazy=True``
+        the records are ``stdf.lazy`` views whose fields are decoded on first
+        access; with ``use_mmap`` they share a mapping of their own, which
+        stays valid after ``close()`` until the last view is gone.
+        """
+        if lazy:
+            return self._iter_lazy_records(offsets)
+        return self._iter_raw_records(offsets)
 
-    def _parse_mir(self, data: bytes) -> None:
-        """Parse Master Information Record"""
-        # Simplified MIR parsing
-        if len(data) >= 8:
-            setup_time = struct.unpack('<I', data[0:4])[0]
-            start_time = struct.unpack('<I', data[4:8])[0]
-            self.file_info['setup_time'] = setup_time
-            self.file_info['start_time'] = start_time
-
-    def _parse_ptr(self, data: bytes) -> None:
-        """Parse Parametric Test Record (simplified)"""
-        if len(data) < 8:
+    def iter_test_results(self, offsets: Optional[Iterable[int]] = None) -> Iterator[TestResult]:
+        """Lazily yield parsed test results without keeping them in memory
+
+        ``file_info`` is still filled in as the MIR is encountered.
+        ``offsets`` works as for ``iter_records()``.
+        """
+        parse_record = self._parse_record
+        for record in self._iter_raw_records(offsets):
+            row = parse_record(record)
+            if row is not None:
+                yield TestResult(*row)
+
+    def load_index(self, cache_dir: Optional[str] = None) -> 'RecordIndex':
+        """Load this file's sidecar record index, building it if stale or missing"""
+        from .index import RecordIndex
+        return RecordIndex.load_or_build(self.filepath, cache_dir=cache_dir)
+
+    def _indexed_offsets(self) -> Optional[List[int]]:
+        """Sorted offsets of the records selected by the filters, via the index"""
+        if self.index is None or (self.record_types is None and self.tests is None):
+            return None
+
+        offsets = []
+        for rec_id, type_offsets in self.index.record_offsets.items():
+            if self.record_types is not None and rec_id not in self.record_types:
+                continue
+            if rec_id == RecordType.PTR and self.tests is not None:
+                continue
+            offsets.extend(type_offsets)
+
+        if self.tests is not None and (self.record_types is None or RecordType.PTR in self.record_types):
+            for test_num in self.tests:
+                offsets.extend(self.index.test_offsets(test_num))
+
+        offsets.sort()
+        return offsets
+
+    def _iter_raw_records(self, offsets: Optional[Iterable[int]] = None) -> Iterator[STDFRecord]:
+        """Yield records using the configured scan mode"""
+        if self.use_mmap and detect_compression(self.filepath) is None:
+            if offsets is None:
+                yield from self._read_records_mmap()
+            else:
+                yield from self._read_records_mmap_at(offsets)
+        else:
+            with open_stdf(self.filepath, workers=self.decompress_workers) as f:
+                if offsets is None:
+                    yield from self._read_records(f)
+                else:
+                    yield from self._read_records_at(f, offsets)
+
+    def _iter_lazy_records(self, offsets: Optional[Iterable[int]] = None) -> Iterator['LazyRecord']:
+        """Yield lazy record views passing the type/test filters"""
+        from .lazy import iter_lazy_at, iter_lazy_records, iter_lazy_stream, lazy_record
+
+        if self.use_mmap and detect_compression(self.filepath) is None:
+            mapping = _map_file(self.filepath)
+            if mapping is None:
+                return
+            view = memoryview(mapping)  # unmapped once no view refers to it
+            records = iter_lazy_records(view) if offsets is None else iter_lazy_at(view, offsets)
+            yield from self._filter_lazy(records)
             return
 
+        with open_stdf(self.filepath, workers=self.decompress_workers) as f:
+            if offsets is None:
+                yield from self._filter_lazy(iter_lazy_stream(f))
+            else:
+                for record in self._read_records_at(f, offsets):
+                    yield lazy_record(record.rec_type, record.rec_sub, record.rec_len, record.data)
+
+    def _filter_lazy(self, records: Iterator['LazyRecord']) -> Iterator['LazyRecord']:
+        """Drop views failing the type/test filters; a PTR's TEST_NUM is unpacked to decide"""
+        record_types = self.record_types
+        tests = self.tests
+        if record_types is None and tests is None:
+            yield from records
+            return
+
+        for record in records:
+            rec_id = (record.rec_type << 8) | record.rec_sub
+            if record_types is not None and rec_id not in record_types:
+                continue
+            if tests is not None and rec_id == RecordType.PTR:
+                if record.rec_len < 4 or record.test_num not in tests:
+                    continue
+            yield record
+
+    def _read_records_at(self, f: BinaryIO, offsets: Iterable[int]) -> Iterator[STDFRecord]:
+        """Seek to and read the records starting at the given offsets"""
+        if not f.seekable():
+            raise ValueError('reading records at offsets needs a seekable stream '
+                             '(parallel decompression is not seekable)')
+        seek = f.seek
+        read = f.read
+        unpack_header = HEADER.unpack
+
+        for offset in offsets:
+            seek(offset)
+            header = read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE:
+                break
+
+            rec_len, rec_type, rec_sub = unpack_header(header)
+            yield STDFRecord(rec_type, rec_sub, rec_len, read(rec_len))
+
+    def _read_records_mmap_at(self, offsets: Iterable[int]) -> Iterator[STDFRecord]:
+        """Yield the mapped records starting at the given offsets"""
+        view = self._open_mmap()
+        if view is None:
+            return
+
+        unpack_header = HEADER.unpack_from
+        end = len(view) - HEADER_SIZE
+
+        for offset in offsets:
+            if offset > end:
+                break
+            rec_len, rec_type, rec_sub = unpack_header(view, offset)
+            start = offset + HEADER_SIZE
+            yield STDFRecord(rec_type, rec_sub, rec_len, view[start:start + rec_len])
+
+    def _read_records(self, f: BinaryIO) -> Iterator[STDFRecord]:
+        """Read records from STDF file"""
+        if self.record_types is not None or self.tests is not None:
+            yield from self._read_records_filtered(f)
+            return
+
+        read = f.read
+        unpack_header = HEADER.unpack
+
+        while True:
+            header = read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE:
+                break
+
+            rec_len, rec_type, rec_sub = unpack_header(header)
+            yield STDFRecord(rec_type, rec_sub, rec_len, read(rec_len))
+
+    def _read_records_filtered(self, f: BinaryIO) -> Iterator[STDFRecord]:
+        """Read only records passing the type/test filters, seeking past the rest"""
+        read = f.read
+        seek = f.seek if f.seekable() else lambda size, _whence: read(size)
+        unpack_header = HEADER.unpack
+        unpack_test_num = TEST_NUM.unpack
+        record_types = self.record_types
+        tests = self.tests
+
+        while True:
+            header = read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE:
+                break
+
+            rec_len, rec_type, rec_sub = unpack_header(header)
+            rec_id = (rec_type << 8) | rec_sub
+
+            if record_types is not None and rec_id not in record_types:
+                seek(rec_len, 1)
+                continue
+
+            if tests is not None and rec_id == RecordType.PTR:
+                # Only the TEST_NUM prefix is read to decide
+                prefix = read(min(rec_len, 4))
+                if len(prefix) < 4 or unpack_test_num(prefix)[0] not in tests:
+                    seek(rec_len - len(prefix), 1)
+                    continue
+                yield STDFRecord(rec_type, rec_sub, rec_len, prefix + read(rec_len - 4))
+                continue
+
+            yield STDFRecord(rec_type, rec_sub, rec_len, read(rec_len))
+
+    def _read_records_mmap(self, start: int = 0, stop: Optional[int] = None) -> Iterator[STDFRecord]:
+        """Scan records directly in a memory-mapped view of the file
+
+        Payloads are handed out as ``memoryview`` slices of the mapping, so no
+        record data is copied. The mapping stays open until ``close()``.
+        ``start`` must be a record boundary; records starting before ``stop``
+        are yielded.
+        """
+        view = self._open_mmap()
+        if view is None:
+            return
+
+        unpack_header = HEADER.unpack_from
+        unpack_test_num = TEST_NUM.unpack_from
+        record_types = self.record_types
+        tests = self.tests
+        filtered = record_types is not None or tests is not None
+        offset = start
+        end = len(view) - HEADER_SIZE
+        if stop is not None:
+            end = min(end, stop - 1)
+
+        while offset <= end:
+            rec_len, rec_type, rec_sub = unpack_header(view, offset)
+            start = offset + HEADER_SIZE
+            offset = start + rec_len
+
+            if filtered:
+                rec_id = (rec_type << 8) | rec_sub
+                if record_types is not None and rec_id not in record_types:
+                    continue
+                if tests is not None and rec_id == RecordType.PTR:
+                    if rec_len < 4 or start + 4 > len(view) or unpack_test_num(view, start)[0] not in tests:
+                        continue
+
+            # A truncated trailing record yields a short payload, as with f.read()
+            yield STDFRecord(rec_type, rec_sub, rec_len, view[start:offset])
+
+    def _open_mmap(self) -> Optional[memoryview]:
+        """Map the file read-only, reusing an existing mapping"""
+        if self._view is not None:
+            return self._view
+
+        self._mmap = _map_file(self.filepath)
+        if self._mmap is None:
+            return None
+        self._view = memoryview(self._mmap)
+        return self._view
+
+    def close(self) -> None:
+        """Release the memory map used by ``use_mmap`` parsing
+
+        Record payloads obtained from the mapping are invalid afterwards.
+        """
+        if self._mmap is None:
+            return
+
+        for record in self.records:
+            if isinstance(record.data, memoryview):
+                record.data.release()
+        self._view.release()
+        self._view = None
         try:
-            test_num = struct.unpack('<I', data[0:4])[0]
-            result = struct.unpack('<f', data[4:8])[0]
-
-            # Simplified - in real STDF, need to parse full PTR structure
-            test_result = TestResult(
-                test_num=test_num,
-                test_name=f'Test_{test_num}',
-                result=result,
-                unit='V',
-                low_limit=0.0,
-                high_limit=5.0,
-                pass_fail=(0.0 <= result <= 5.0)
-            )
-            self.test_results.append(test_result)
-        except struct.error:
+            self._mmap.close()
+        except BufferError:
+            # Payload views are still referenced elsewhere; the mapping is
+            # closed once they are garbage collected.
             pass
+        self._mmap = None
+
+    def _parse_record(self, record: STDFRecord) -> Optional[ResultRow]:
+        """Parse specific record types, returning a test result row if any"""
+        handler = self._handlers.get((record.rec_type, record.rec_sub))
+        if handler is None:
+            return None
+        return handler(record.data)
+
+    def decode_record(self, record: STDFRecord) -> Optional[Any]:
+        """Decode a record into its ``records.py`` dataclass (None if unsupported)"""
+        return decode_record(record.rec_type, record.rec_sub, record.data)
+
+    def _parse_mir(self, data: bytes) -> None:
+        """Parse Master Information Record"""
+        if len(data) >= 8:
+            mir = decode_mir(data, 0, len(data))
+            self.file_info['setup_time'] = mir.setup_t
+            self.file_info['start_time'] = mir.start_t
+            self.file_info['stat_num'] = mir.stat_num
+            self.file_info['mode_cod'] = mir.mode_cod
+            self.file_info['lot_id'] = mir.lot_id
+            self.file_info['part_typ'] = mir.part_typ
+            self.file_info['node_nam'] = mir.node_nam
+            self.file_info['tstr_typ'] = mir.tstr_typ
+            self.file_info['job_nam'] = mir.job_nam
+
+    def _parse_ptr(self, data: bytes) -> Optional[ResultRow]:
+        """Parse Parametric Test Record
+
+        The first PTR of each (test_num, head, site) is fully decoded and its
+        name, units, limits and scales cached in ``test_limits``. Repeats only
+        unpack the fixed fields and, if they carry valid limits of their own,
+        the limit values; their strings are never re-decoded.
+        """
+        size = len(data)
+        if size < _PTR_FIXED_SIZE:
+            return None
+
+        test_num, head_num, site_num, test_flg, _parm_flg, result = _PTR_FIXED.unpack_from(data)
+        key = (test_num, head_num, site_num)
+        limits = self.test_limits.get(key)
+
+        if limits is None:
+            limits = self.test_limits[key] = self._first_ptr_limits(data, size)
+            low_limit = limits.low_limit
+            high_limit = limits.high_limit
+        else:
+            low_limit, high_limit = self._repeat_ptr_limits(data, size, limits)
+
+        if test_flg & TEST_FLG_NO_PASS_FAIL:
+            pass_fail = low_limit <= result <= high_limit
+        else:
+            pass_fail = not test_flg & TEST_FLG_FAILED
+
+        link_row = self._link_row
+        if link_row is not None:
+            link_row(head_num << 8 | site_num)
+
+        return (test_num, limits.test_name, result, limits.unit, low_limit, high_limit, pass_fail)
+
+    @staticmethod
+    def _repeat_ptr_limits(data: bytes, size: int, limits: TestLimits) -> Tuple[float, float]:
+        """Limits of a repeat PTR: its own valid ones, else the first PTR's"""
+        low_limit = limits.low_limit
+        high_limit = limits.high_limit
+
+        # Hop over TEST_TXT and ALARM_ID to OPT_FLAG
+        pos = _PTR_FIXED_SIZE
+        if pos < size:
+            pos += 1 + data[pos]
+        if pos < size:
+            pos += 1 + data[pos]
+        if pos + 12 <= size:
+            opt_flag = data[pos]
+            if opt_flag & OPT_NO_LO_LIMIT:
+                low_limit = float('-inf')
+            elif not opt_flag & OPT_LO_LIMIT_INVALID:
+                low_limit = _R4.unpack_from(data, pos + 4)[0]
+            if opt_flag & OPT_NO_HI_LIMIT:
+                high_limit = float('inf')
+            elif not opt_flag & OPT_HI_LIMIT_INVALID:
+                high_limit = _R4.unpack_from(data, pos + 8)[0]
+        return low_limit, high_limit
+
+    @staticmethod
+    def _first_ptr_limits(data: bytes, size: int) -> TestLimits:
+        """Fully decode the first PTR of a test into its cached metadata"""
+        ptr = decode_ptr(data, 0, size)
+        opt_flag = ptr.opt_flag
+
+        # Without a previous PTR, invalid limits mean no limit
+        low_limit = float('-inf') if opt_flag & _MASK_LO else ptr.lo_limit
+        high_limit = float('inf') if opt_flag & _MASK_HI else ptr.hi_limit
+
+        return TestLimits(
+            test_name=ptr.test_txt or f'Test_{ptr.test_num}',
+            unit=ptr.units,
+            low_limit=low_limit,
+            high_limit=high_limit,
+            res_scal=ptr.res_scal,
+            llm_scal=ptr.llm_scal,
+            hlm_scal=ptr.hlm_scal
+        )
+
+    def _parse_pir(self, data: bytes) -> None:
+        """Parse Part Information Record"""
+        pir = decode_pir(data, 0, len(data))
+        self.parts.begin(pir.head_num, pir.site_num)
+
+    def _parse_prr(self, data: bytes) -> None:
+        """Parse Part Results Record"""
+        prr = decode_prr(data, 0, len(data))
+        self.part_results.append(prr)
+        self.bin_summary.add_prr(prr)
+        self.parts.end(prr)
+
+    def _count_parts_only(self) -> None:
+        """Fold PRRs into bin counts only: no ``part_results``, ``parts`` or die maps"""
+        self.bin_summary = BinSummary(keep_dies=False)
+        del self._handlers[(RecordType.PIR >> 8, RecordType.PIR & 0xFF)]
+        self._handlers[(RecordType.PRR >> 8, RecordType.PRR & 0xFF)] = self._count_prr
+
+    def _count_prr(self, data: bytes) -> None:
+        """Parse a Part Results Record into the bin counts only"""
+        self.bin_summary.add_prr(decode_prr(data, 0, len(data)))
+
+    def _parse_wir(self, data: bytes) -> None:
+        """Parse Wafer Information Record"""
+        wir = decode_wir(data, 0, len(data))
+        self.bin_summary.start_wafer(wir.head_num, wir)
+
+    def _parse_wrr(self, data: bytes) -> None:
+        """Parse Wafer Results Record"""
+        self.bin_summary.end_wafer(decode_wrr(data, 0, len(data)))
 
     def _extract_test_results(self) -> None:
         """Extract and organize test results"""
         # Additional processing can be added here
         pass
 
-    def _calculate_statistics(self) -> Dict[str, Any]:
-        """Calculate test statistics"""
-        if not self.test_results:
-            return {
-                'total_tests': 0,
-                'pass_count': 0,
-                'fail_count': 0,
-                'yield_rate': 0.0
-            }
+    def _calculate_statistics(self, results: Optional[Iterable[TestResult]] = None) -> Dict[str, Any]:
+        """Calculate test statistics
 
-        pass_count = sum(1 for t in self.test_results if t.pass_fail)
-        fail_count = len(self.test_results) - pass_count
+        ``results`` may be any iterable, e.g. ``iter_test_results()``; it is
+        consumed in a single pass. Defaults to ``self.test_results``.
+        """
+        return calculate_statistics(self.test_results if results is None else results)
 
-        return {
-            'total_tests': len(self.test_results),
-            'pass_count': pass_count,
-            'fail_count': fail_count,
-            'yield_rate': (pass_count / len(self.test_results) * 100) if self.test_results else 0.0
-        }
+    def export_csv(self, output_path: str, results: Optional[Iterable[TestResult]] = None) -> None:
+        """Export test results to CSV
+
+        ``results`` may be a stream such as ``iter_test_results()`` so rows are
+        written without materializing the list. Defaults to ``self.test_results``.
+        """
+        write_csv(output_path, self.test_results if results is None else results)
+
+    def export_parquet(self, output_path: str, results: Optional[Iterable[TestResult]] = None,
+                       **options: Any) -> None:
+        """Export test results to Parquet (requires pyarrow); see ``export.export_parquet``"""
+        from .export import export_parquet
+        export_parquet(output_path, self.test_results if results is None else results, **options)
+
+    def export_arrow(self, output_path: str, results: Optional[Iterable[TestResult]] = None,
+                     **options: Any) -> None:
+        """Export test results to an Arrow IPC file (requires pyarrow)"""
+        from .export import export_arrow
+        export_arrow(output_path, self.test_results if results is None else results, **options)
 
-    def export_csv(self, output_path: str) -> None:
-        """Export test results to CSV"""
-        import csv
-
-        with open(output_path, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Test Number', 'Test Name', 'Result', 'Unit', 'Low Limit', 'High Limit', 'Pass/Fail'])
-
-            for test in self.test_results:
-                writer.writerow([
-                    test.test_num,
-                    test.test_name,
-                    test.result,
-                    test.unit,
-                    test.low_limit,
-                    test.high_limit,
-                    'PASS' if test.pass_fail else 'FAIL'
-                ])
+    def export_npz(self, output_path: str, results: Optional[Iterable[TestResult]] = None,
+                   **options: Any) -> None:
+        """Export test result columns to a NumPy .npz archive (requires numpy)"""
+        from .export import export_npz
+        export_npz(output_path, self.test_results if results is None else results, **options)
 
     def get_summary(self) -> str:
         """Get human-readable summary"""
@@ -176,3 +633,38 @@ Fail Count: {stats['fail_count']}
 Yield Rate: {stats['yield_rate']:.2f}%
 {'=' * 50}
 """
+
+
+def _map_file(filepath: str) -> Optional[mmap.mmap]:
+    """Read-only mapping of a file; None if it is empty"""
+    with open(filepath, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def calculate_statistics(results: Iterable[TestResult]) -> Dict[str, Any]:
+    """Pass/fail counts and yield of a set or stream of test results"""
+    if isinstance(results, TestResultStore):
+        total = len(results)
+        pass_count = sum(results.pass_fail)
+    else:
+        total = 0
+        pass_count = 0
+        for test in results:
+            total += 1
+            if test.pass_fail:
+                pass_count += 1
+
+    return {
+        'total_tests': total,
+        'pass_count': pass_count,
+        'fail_count': total - pass_count,
+        'yield_rate': (pass_count / total * 100) if total else 0.0
+    }
+
+
+def write_csv(output_path: str, results: Iterable[TestResult]) -> None:
+    """Write test results to a CSV file"""
+    from .export import export_csv
+    export_csv(output_path, results)
@@ -0,0 +1,304 @@
+"""Part-level linkage of test results (PIR -> PTR -> PRR)
+
+While the parser fills its ``TestResultStore``, the head/site of every
+stored result row is recorded, and each part notes the row count at its
+PIR and PRR; the PRR also completes its entry: part_id, bins, coordinates
+and flags, in compact ``array`` columns. A row belongs to the part of its
+head/site whose PIR..PRR span contains it.
+
+Lookups by part_id, bin or coordinate use dict indexes, and a part's rows
+come from a CSR index: one array of row numbers grouped by part, plus
+per-part offsets. Multi-site testing interleaves the rows of parts tested
+together, so rows are indexed rather than reordered. Both indexes are built
+on first use and rebuilt if parts or rows were added since.
+"""
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from .records import PartResultsRecord
+from .wafer import part_passed
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency (stdf-parser[analysis])
+    np = None
+
+# Part number of a result row tested outside any PIR/PRR span
+NO_PART = -1
+
+# end_row of a part whose PRR has not been seen (yet)
+OPEN_END = 0xFFFFFFFF
+
+
+def site_key(head_num: int, site_num: int) -> int:
+    """Compact head/site key stored per result row"""
+    return head_num << 8 | site_num
+
+
+class PartInfo(NamedTuple):
+    """One part, as recorded by its PIR and PRR"""
+    part: int
+    part_id: str
+    head_num: int
+    site_num: int
+    part_flg: int
+    hard_bin: int
+    soft_bin: int
+    x_coord: int
+    y_coord: int
+    passed: bool
+    complete: bool  # PRR seen
+
+
+class PartIndex:
+    """Parts of a file and the result rows measured on each
+
+    Part numbers are positions in test order. ``row_site`` holds the
+    ``site_key()`` of every stored result row; the rows of a part's
+    head/site from ``first_row`` up to ``end_row`` are its results.
+    """
+
+    def __init__(self):
+        self.row_site = array('H')
+        self.head_num = array('B')
+        self.site_num = array('B')
+        self.first_row = array('I')
+        self.end_row = array('I')
+        self.part_flg = array('B')
+        self.hard_bin = array('H')
+        self.soft_bin = array('H')
+        self.x_coord = array('h')
+        self.y_coord = array('h')
+        self.complete = array('B')
+        self.part_id: List[str] = []
+        # Part open on each site key
+        self._open: Dict[int, int] = {}
+        # For merging byte-range chunks: site keys with a PIR or PRR in this
+        # index, and parts completed by a PRR before anything else of their site
+        self._started: Set[int] = set()
+        self._closes_leading: Dict[int, int] = {}
+        self._lookups: Optional[Tuple[Dict, ...]] = None
+        self._lookups_size = -1
+        self._row_index: Optional[Tuple[List[int], array]] = None
+        self._row_index_size = (-1, -1)
+
+    def __len__(self) -> int:
+        return len(self.part_id)
+
+    def __repr__(self) -> str:
+        return f'PartIndex({len(self)} parts, {len(self.row_site)} rows)'
+
+    def _append_part(self, head_num: int, site_num: int, first_row: int) -> int:
+        part = len(self.part_id)
+        self.head_num.append(head_num)
+        self.site_num.append(site_num)
+        self.first_row.append(first_row)
+        self.end_row.append(OPEN_END)
+        self.part_flg.append(0)
+        self.hard_bin.append(0)
+        self.soft_bin.append(0)
+        self.x_coord.append(0)
+        self.y_coord.append(0)
+        self.complete.append(0)
+        self.part_id.append('')
+        return part
+
+    def begin(self, head_num: int, site_num: int) -> int:
+        """Open a part on a head/site (a PIR); returns its part number"""
+        key = site_key(head_num, site_num)
+        previous = self._open.get(key)
+        if previous is not None:
+            # No PRR for the previous part
+            self.end_row[previous] = len(self.row_site)
+        part = self._append_part(head_num, site_num, len(self.row_site))
+        self._open[key] = part
+        self._started.add(key)
+        return part
+
+    def end(self, prr: PartResultsRecord) -> int:
+        """Complete the open part of the PRR's head/site; returns its part number"""
+        key = site_key(prr.head_num, prr.site_num)
+        part = self._open.pop(key, None)
+        if part is None:
+            part = self._append_part(prr.head_num, prr.site_num, len(self.row_site))
+            if key not in self._started:
+                self._closes_leading[key] = part
+            self._started.add(key)
+
+        self.end_row[part] = len(self.row_site)
+        self._set_results(part, prr.part_flg, prr.hard_bin, prr.soft_bin, prr.x_coord,
+                          prr.y_coord, prr.part_id)
+        return part
+
+    def _set_results(self, part: int, part_flg: int, hard_bin: int, soft_bin: int,
+                     x_coord: int, y_coord: int, part_id: str) -> None:
+        self.part_flg[part] = part_flg
+        self.hard_bin[part] = hard_bin
+        self.soft_bin[part] = soft_bin
+        self.x_coord[part] = x_coord
+        self.y_coord[part] = y_coord
+        self.complete[part] = 1
+        self.part_id[part] = part_id
+
+    def info(self, part: int) -> PartInfo:
+        complete = bool(self.complete[part])
+        return PartInfo(
+            part, self.part_id[part], self.head_num[part], self.site_num[part],
+            self.part_flg[part], self.hard_bin[part], self.soft_bin[part],
+            self.x_coord[part], self.y_coord[part],
+            complete and part_passed(self.part_flg[part], self.hard_bin[part]), complete
+        )
+
+    def merge(self, other: 'PartIndex', continued: bool = False) -> 'PartIndex':
+        """Append the parts and rows of the results stored after these
+
+        With ``continued``, ``other`` covers the next byte range of the same
+        file: the first PRR of a head/site that has no PIR before it in
+        ``other`` completes this index's open part, and that site's rows in
+        between are the part's. Indexes are merged in order.
+        """
+        row_offset = len(self.row_site)
+        remap: Dict[int, int] = {}
+
+        if continued:
+            for key, part in other._closes_leading.items():
+                target = self._open.pop(key, None)
+                if target is not None:
+                    remap[part] = target
+                    self.end_row[target] = other.end_row[part] + row_offset
+                    self._set_results(target, other.part_flg[part], other.hard_bin[part],
+                                      other.soft_bin[part], other.x_coord[part],
+                                      other.y_coord[part], other.part_id[part])
+            for key, target in list(self._open.items()):
+                if key in other._started:
+                    # A PIR in ``other`` without a PRR for the open part first
+                    self.end_row[target] = row_offset + next(
+                        first for first_key, first, _end in other._spans() if first_key == key)
+                    del self._open[key]
+        else:
+            # Parts left open end with their file
+            for part in self._open.values():
+                self.end_row[part] = row_offset
+            self._open.clear()
+
+        for part in range(len(other)):
+            if part in remap:
+                continue
+            remap[part] = len(self.part_id)
+            end_row = other.end_row[part]
+            self.head_num.append(other.head_num[part])
+            self.site_num.append(other.site_num[part])
+            self.first_row.append(other.first_row[part] + row_offset)
+            self.end_row.append(end_row if end_row == OPEN_END else end_row + row_offset)
+            self.part_flg.append(other.part_flg[part])
+            self.hard_bin.append(other.hard_bin[part])
+            self.soft_bin.append(other.soft_bin[part])
+            self.x_coord.append(other.x_coord[part])
+            self.y_coord.append(other.y_coord[part])
+            self.complete.append(other.complete[part])
+            self.part_id.append(other.part_id[part])
+
+        self.row_site.extend(other.row_site)
+        for key, part in other._open.items():
+            self._open[key] = remap[part]
+        self._started |= other._started
+        self._lookups = self._row_index = None
+        return self
+
+    def _spans(self) -> Iterator[Tuple[int, int, int]]:
+        """(site key, first row, end row) of every part"""
+        total = len(self.row_site)
+        for head_num, site_num, first, end in zip(self.head_num, self.site_num,
+                                                  self.first_row, self.end_row):
+            yield site_key(head_num, site_num), first, min(end, total)
+
+    def _build_lookups(self) -> Tuple[Dict, ...]:
+        """part_id, hard bin, soft bin and (x, y) -> part numbers of complete parts"""
+        if self._lookups is None or self._lookups_size != len(self):
+            by_id: Dict[str, List[int]] = {}
+            by_hard: Dict[int, List[int]] = {}
+            by_soft: Dict[int, List[int]] = {}
+            by_xy: Dict[Tuple[int, int], List[int]] = {}
+            columns = zip(self.part_id, self.hard_bin, self.soft_bin, self.x_coord, self.y_coord,
+                          self.complete)
+            for part, (part_id, hard_bin, soft_bin, x, y, complete) in enumerate(columns):
+                if not complete:
+                    continue
+                by_id.setdefault(part_id, []).append(part)
+                by_hard.setdefault(hard_bin, []).append(part)
+                by_soft.setdefault(soft_bin, []).append(part)
+                by_xy.setdefault((x, y), []).append(part)
+            self._lookups = (by_id, by_hard, by_soft, by_xy)
+            self._lookups_size = len(self)
+        return self._lookups
+
+    def find(self, part_id: Optional[str] = None, hard_bin: Optional[int] = None,
+             soft_bin: Optional[int] = None, x: Optional[int] = None,
+             y: Optional[int] = None) -> List[int]:
+        """Numbers of the complete parts matching every given criterion, in test order
+
+        A retested part_id or die matches once per test.
+        """
+        if (x is None) != (y is None):
+            raise ValueError('x and y must be given together')
+
+        by_id, by_hard, by_soft, by_xy = self._build_lookups()
+        candidates = []
+        if part_id is not None:
+            candidates.append(by_id.get(part_id, []))
+        if hard_bin is not None:
+            candidates.append(by_hard.get(hard_bin, []))
+        if soft_bin is not None:
+            candidates.append(by_soft.get(soft_bin, []))
+        if x is not None:
+            candidates.append(by_xy.get((x, y), []))
+
+        if not candidates:
+            return [part for part, complete in enumerate(self.complete) if complete]
+        candidates.sort(key=len)
+        return sorted(set(candidates[0]).intersection(*candidates[1:]))
+
+    def _build_row_index(self) -> Tuple[List[int], array]:
+        """(offsets, rows): rows[offsets[p]:offsets[p + 1]] are part p's result rows"""
+        size = (len(self.row_site), len(self))
+        if self._row_index is None or self._row_index_size != size:
+            offsets = [0]
+            rows = array('I')
+            if np is not None:
+                row_site = np.frombuffer(self.row_site, dtype=np.uint16)
+                for key, first, end in self._spans():
+                    span = np.flatnonzero(row_site[first:end] == key) + first
+                    rows.frombytes(span.astype(np.uint32).tobytes())
+                    offsets.append(len(rows))
+            else:
+                row_site = self.row_site
+                for key, first, end in self._spans():
+                    rows.extend(row for row in range(first, end) if row_site[row] == key)
+                    offsets.append(len(rows))
+
+            self._row_index = (offsets, rows)
+            self._row_index_size = size
+        return self._row_index
+
+    def rows(self, part: int) -> array:
+        """Result row numbers of one part, in file order"""
+        offsets, rows = self._build_row_index()
+        return rows[offsets[part]:offsets[part + 1]]
+
+    def rows_for(self, parts: Iterable[int]) -> array:
+        """Result row numbers of several parts, in file order"""
+        offsets, rows = self._build_row_index()
+        selected = array('I')
+        for part in parts:
+            selected.extend(rows[offsets[part]:offsets[part + 1]])
+        return array('I', sorted(selected))
+
+    def row_parts(self) -> array:
+        """Part number of every result row (``NO_PART`` outside any part)"""
+        offsets, rows = self._build_row_index()
+        row_parts = array('i', [NO_PART]) * len(self.row_site)
+        for part in range(len(self)):
+            for row in rows[offsets[part]:offsets[part + 1]]:
+                row_parts[row] = part
+        return row_parts
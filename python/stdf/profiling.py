@@ -0,0 +1,99 @@
+"""Opt-in instrumentation of parsing and analysis
+
+A ``Profiler`` handed to ``STDFParser``/``STDFAnalyzer`` collects record
+counts and bytes per record type, accumulated phase timings (``io``,
+``decode``, ``statistics``, ...) and, with ``trace_memory``, tracemalloc
+allocation statistics. Without a profiler the hot loops are unchanged.
+"""
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .records import record_name
+
+
+class Profiler:
+    """Collects counts, timings and allocations of one run"""
+
+    def __init__(self, trace_memory: bool = False, top: int = 10):
+        self.trace_memory = trace_memory
+        self.top = top
+        self.record_counts: Dict[int, int] = {}
+        self.record_bytes: Dict[int, int] = {}
+        self.timings: Dict[str, float] = {}
+        self.memory: Optional[Dict[str, Any]] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._started_tracing = False
+
+    def __enter__(self) -> 'Profiler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Begin tracing allocations (if ``trace_memory``)"""
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+                tracemalloc.reset_peak()
+            self._snapshot = tracemalloc.take_snapshot()
+
+    def stop(self) -> None:
+        """Record the allocations made since ``start()``"""
+        if self._snapshot is None:
+            return
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        diff = snapshot.compare_to(self._snapshot, 'lineno')
+        self.memory = {
+            'current_bytes': current,
+            'peak_bytes': peak,
+            'top_allocations': [
+                {'location': str(stat.traceback), 'size_bytes': stat.size_diff, 'count': stat.count_diff}
+                for stat in diff[:self.top]
+            ]
+        }
+        self._snapshot = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def count_record(self, rec_type: int, rec_sub: int, rec_len: int) -> None:
+        rec_id = (rec_type << 8) | rec_sub
+        self.record_counts[rec_id] = self.record_counts.get(rec_id, 0) + 1
+        self.record_bytes[rec_id] = self.record_bytes.get(rec_id, 0) + rec_len
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        """Add the wall time of the ``with`` block to ``phase``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def report(self) -> Dict[str, Any]:
+        """Structured results, JSON-serializable"""
+        records: List[Dict[str, Any]] = [
+            {'type': record_name(rec_id), 'count': count, 'bytes': self.record_bytes[rec_id]}
+            for rec_id, count in sorted(self.record_counts.items(), key=lambda item: -item[1])
+        ]
+        return {
+            'records': records,
+            'timings': dict(self.timings),
+            'memory': self.memory
+        }
+
+    def to_json(self, **kwargs: Any) -> str:
+        return json.dumps(self.report(), **kwargs)
@@ -1,9 +1,32 @@
 """STDF Record Definitions"""
 
 from dataclasses import dataclass
+from enum import IntEnum
 from typing import Optional
 
 
+class RecordType(IntEnum):
+    """STDF Record Types"""
+    FAR = 0x00_0A  # File Attribute Record
+    MIR = 0x01_0A  # Master Information Record
+    MRR = 0x01_14  # Master Results Record
+    PCR = 0x01_1E  # Part Count Record
+    PTR = 0x0F_0A  # Parametric Test Record
+    FTR = 0x0F_14  # Functional Test Record
+    WIR = 0x02_0A  # Wafer Information Record
+    WRR = 0x02_14  # Wafer Results Record
+    PIR = 0x05_0A  # Part Information Record
+    PRR = 0x05_14  # Part Results Record
+
+
+def record_name(rec_id: int) -> str:
+    """Name of a record type id, or its hex id if unsupported"""
+    try:
+        return RecordType(rec_id).name
+    except ValueError:
+        return f'0x{rec_id:04X}'
+
+
 @dataclass
 class FileAttributeRecord:
     """FAR - File Attribute Record"""
@@ -27,6 +50,62 @@ class MasterInformationRecord:
     job_nam: str
 
 
+@dataclass
+class MasterResultsRecord:
+    """MRR - Master Results Record"""
+    finish_t: int
+    disp_cod: str
+    usr_desc: str
+    exc_desc: str
+
+
+@dataclass
+class PartCountRecord:
+    """PCR - Part Count Record"""
+    head_num: int
+    site_num: int
+    part_cnt: int
+    rtst_cnt: int
+    abrt_cnt: int
+    good_cnt: int
+    func_cnt: int
+
+
+@dataclass
+class WaferInformationRecord:
+    """WIR - Wafer Information Record"""
+    head_num: int
+    site_grp: int
+    start_t: int
+    wafer_id: str
+
+
+@dataclass
+class WaferResultsRecord:
+    """WRR - Wafer Results Record"""
+    head_num: int
+    site_grp: int
+    finish_t: int
+    part_cnt: int
+    rtst_cnt: int
+    abrt_cnt: int
+    good_cnt: int
+    func_cnt: int
+    wafer_id: str
+    fabwf_id: str
+    frame_id: str
+    mask_id: str
+    usr_desc: str
+    exc_desc: str
+
+
+@dataclass
+class PartInformationRecord:
+    """PIR - Part Information Record"""
+    head_num: int
+    site_num: int
+
+
 @dataclass
 class ParametricTestRecord:
     """PTR - Parametric Test Record"""
@@ -47,6 +126,30 @@ class ParametricTestRecord:
     units: str
 
 
+@dataclass
+class FunctionalTestRecord:
+    """FTR - Functional Test Record (pin/vector arrays are not kept)"""
+    test_num: int
+    head_num: int
+    site_num: int
+    test_flg: int
+    opt_flag: int
+    cycl_cnt: int
+    rel_vadr: int
+    rept_cnt: int
+    num_fail: int
+    xfail_ad: int
+    yfail_ad: int
+    vect_off: int
+    vect_nam: str
+    time_set: str
+    op_code: str
+    test_txt: str
+    alarm_id: str
+    prog_txt: str
+    rslt_txt: str
+
+
 @dataclass
 class PartResultsRecord:
     """PRR - Part Results Record"""
@@ -0,0 +1,150 @@
+"""Columnar storage for parsed test results"""
+
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+
+
+@dataclass
+class TestResult:
+    """Parsed test result"""
+    __test__ = False  # not a pytest test class
+
+    test_num: int
+    test_name: str
+    result: float
+    unit: str
+    low_limit: float
+    high_limit: float
+    pass_fail: bool
+
+
+# Field order of TestResult, as produced by the record decoders
+ResultRow = Tuple[int, str, float, str, float, float, bool]
+
+
+class TestResultStore:
+    """Array-backed, columnar container of test results
+
+    Numeric fields live in typed ``array`` columns and test names/units are
+    interned in a shared string table, so a result costs a few dozen bytes
+    instead of a dataclass instance. The store behaves like a read-only
+    ``List[TestResult]`` (``len``, indexing, iteration) for existing code,
+    materializing rows on access.
+    """
+    __test__ = False  # not a pytest test class
+
+    def __init__(self):
+        self.test_num = array('I')
+        self.result = array('d')
+        self.low_limit = array('d')
+        self.high_limit = array('d')
+        self.pass_fail = array('B')
+        self.name_id = array('I')
+        self.unit_id = array('I')
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.test_num)
+
+    def __iter__(self) -> Iterator[TestResult]:
+        strings = self.strings
+        for row in zip(self.test_num, self.name_id, self.result, self.unit_id,
+                       self.low_limit, self.high_limit, self.pass_fail):
+            yield TestResult(row[0], strings[row[1]], row[2], strings[row[3]],
+                             row[4], row[5], bool(row[6]))
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[TestResult, List[TestResult]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        strings = self.strings
+        return TestResult(
+            test_num=self.test_num[index],
+            test_name=strings[self.name_id[index]],
+            result=self.result[index],
+            unit=strings[self.unit_id[index]],
+            low_limit=self.low_limit[index],
+            high_limit=self.high_limit[index],
+            pass_fail=bool(self.pass_fail[index])
+        )
+
+    def __repr__(self) -> str:
+        return f'TestResultStore({len(self)} results)'
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Arrays pickle as raw bytes; the intern lookup is rebuilt on load
+        state = self.__dict__.copy()
+        del state['_string_ids']
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._string_ids = {value: i for i, value in enumerate(self.strings)}
+
+    def _intern(self, value: str) -> int:
+        """Return the string table id for value, adding it if new"""
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def add(self, test_num: int, test_name: str, result: float, unit: str,
+            low_limit: float, high_limit: float, pass_fail: bool) -> None:
+        """Append one result given its fields"""
+        self.test_num.append(test_num)
+        self.name_id.append(self._intern(test_name))
+        self.result.append(result)
+        self.unit_id.append(self._intern(unit))
+        self.low_limit.append(low_limit)
+        self.high_limit.append(high_limit)
+        self.pass_fail.append(1 if pass_fail else 0)
+
+    def append(self, test_result: TestResult) -> None:
+        """Append a TestResult (list compatibility)"""
+        self.add(test_result.test_num, test_result.test_name, test_result.result,
+                 test_result.unit, test_result.low_limit, test_result.high_limit,
+                 test_result.pass_fail)
+
+    def extend(self, results: Iterable[Union[TestResult, 'TestResultStore']]) -> None:
+        """Append results from an iterable of TestResult or another store"""
+        if isinstance(results, TestResultStore):
+            self._extend_store(results)
+            return
+        for test_result in results:
+            self.append(test_result)
+
+    def _extend_store(self, other: 'TestResultStore') -> None:
+        """Append another store column-wise, remapping its string ids"""
+        remap = [self._intern(value) for value in other.strings]
+        self.test_num.extend(other.test_num)
+        self.result.extend(other.result)
+        self.low_limit.extend(other.low_limit)
+        self.high_limit.extend(other.high_limit)
+        self.pass_fail.extend(other.pass_fail)
+        self.name_id.extend(array('I', (remap[i] for i in other.name_id)))
+        self.unit_id.extend(array('I', (remap[i] for i in other.unit_id)))
+
+    def clear(self) -> None:
+        """Remove all results"""
+        self.__init__()
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """Return the numeric columns as zero-copy NumPy arrays
+
+        Requires numpy (``pip install stdf-parser[analysis]``). The arrays
+        share memory with the store, which cannot grow while they are alive.
+        """
+        import numpy as np
+
+        return {
+            'test_num': np.frombuffer(self.test_num, dtype=np.uintc),
+            'result': np.frombuffer(self.result, dtype=np.float64),
+            'low_limit': np.frombuffer(self.low_limit, dtype=np.float64),
+            'high_limit': np.frombuffer(self.high_limit, dtype=np.float64),
+            'pass_fail': np.frombuffer(self.pass_fail, dtype=np.uint8).astype(bool),
+            'name_id': np.frombuffer(self.name_id, dtype=np.uintc),
+            'unit_id': np.frombuffer(self.unit_id, dtype=np.uintc),
+        }
@@ -0,0 +1,196 @@
+"""Running (single-pass, mergeable) per-test statistics"""
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def cpk(count: int, mean: float, stdev: float, low_limit: float, high_limit: float) -> float:
+    """Cpk from summary statistics; 0.0 when it is undefined"""
+    if count < 2 or stdev == 0:
+        return 0.0
+
+    cpu = (high_limit - mean) / (3 * stdev)
+    cpl = (mean - low_limit) / (3 * stdev)
+
+    return min(cpu, cpl)
+
+
+class QuantileSketch:
+    """Bounded-memory quantile estimator (merging t-digest)
+
+    Values are buffered and periodically compressed into at most about
+    ``compression`` weighted centroids, kept small near the tails so
+    extreme quantiles stay accurate. Sketches of disjoint data can be
+    merged. Quantiles are exact while every centroid still holds a single
+    value (up to about ``compression`` values).
+    """
+    __slots__ = ('compression', 'centroids', 'buffer', 'count', 'min', 'max')
+
+    def __init__(self, compression: int = 100):
+        self.compression = compression
+        self.centroids: List[Tuple[float, float]] = []  # (mean, weight), sorted by mean
+        self.buffer: List[float] = []
+        self.count = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def add(self, value: float) -> None:
+        self.buffer.append(value)
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self.buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Fold another sketch's data into this one"""
+        if not other.count:
+            return
+        self.centroids = self.centroids + other.centroids
+        self.centroids.sort()
+        self.buffer.extend(other.buffer)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _q_limit(self, q: float) -> float:
+        """Largest quantile a centroid starting at q may reach (k1 scale function)"""
+        k = self.compression / (2 * math.pi) * math.asin(2 * q - 1) + 1
+        angle = k * 2 * math.pi / self.compression
+        if angle >= math.pi / 2:
+            return 1.0
+        return (math.sin(angle) + 1) / 2
+
+    def _compress(self) -> None:
+        points = self.centroids
+        if self.buffer:
+            points = sorted(points + [(value, 1.0) for value in self.buffer])
+            self.buffer = []
+        if len(points) <= 1:
+            self.centroids = points
+            return
+
+        total = float(self.count)
+        merged = []
+        mean, weight = points[0]
+        weight_before = 0.0
+        q_limit = self._q_limit(0.0)
+
+        for point_mean, point_weight in points[1:]:
+            if (weight_before + weight + point_weight) / total <= q_limit:
+                weight += point_weight
+                mean += (point_mean - mean) * point_weight / weight
+            else:
+                merged.append((mean, weight))
+                weight_before += weight
+                q_limit = self._q_limit(weight_before / total)
+                mean, weight = point_mean, point_weight
+
+        merged.append((mean, weight))
+        self.centroids = merged
+
+    def quantile(self, q: float) -> float:
+        """Estimated q-quantile (0 <= q <= 1); NaN when empty"""
+        if not self.count:
+            return float('nan')
+        if self.buffer:
+            self._compress()
+
+        centroids = self.centroids
+        target = q * self.count
+        # Interpolate between centroid centers, anchored at min and max
+        prev_mean, prev_center = self.min, 0.0
+        cumulative = 0.0
+        for mean, weight in centroids:
+            center = cumulative + weight / 2
+            if target <= center:
+                if center == prev_center:
+                    return mean
+                return prev_mean + (mean - prev_mean) * (target - prev_center) / (center - prev_center)
+            prev_mean, prev_center = mean, center
+            cumulative += weight
+
+        if cumulative == prev_center:
+            return self.max
+        return prev_mean + (self.max - prev_mean) * (target - prev_center) / (cumulative - prev_center)
+
+
+class RunningStats:
+    """Welford mean/variance, min/max and a quantile sketch of one test
+
+    Keeps O(1) state regardless of how many values are added, and merges
+    with the state of other files or workers. The limits are those of the
+    first value, as in ``STDFAnalyzer``.
+    """
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max', 'low_limit', 'high_limit', 'sketch')
+
+    def __init__(self, low_limit: float = float('-inf'), high_limit: float = float('inf'),
+                 compression: int = 100):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.low_limit = low_limit
+        self.high_limit = high_limit
+        self.sketch = QuantileSketch(compression)
+
+    def add(self, value: float) -> None:
+        """Fold one value into the running state"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.sketch.add(value)
+
+    def merge(self, other: 'RunningStats') -> None:
+        """Fold another state into this one (Chan et al. pairwise update)"""
+        if not other.count:
+            return
+        if not self.count:
+            self.low_limit, self.high_limit = other.low_limit, other.high_limit
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def stdev(self) -> float:
+        """Sample standard deviation"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    @property
+    def median(self) -> float:
+        return self.sketch.quantile(0.5)
+
+    def outlier_bounds(self, sigma: float = 3.0) -> Optional[Tuple[float, float]]:
+        """Values outside these bounds are outliers; None below 3 values"""
+        if self.count < 3:
+            return None
+        spread = sigma * self.stdev
+        return self.mean - spread, self.mean + spread
+
+    def describe(self) -> Dict[str, Any]:
+        """Summary statistics in the shape of ``STDFAnalyzer.analyze_by_test()``"""
+        stdev = self.stdev
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'median': self.median,
+            'stdev': stdev,
+            'min': self.min,
+            'max': self.max,
+            'cpk': cpk(self.count, self.mean, stdev, self.low_limit, self.high_limit)
+        }
@@ -4,9 +4,10 @@ import pytest
 import tempfile
 import os
 from pathlib import Path
-from stdf.parser import STDFParser
+from stdf.parser import STDFParser, calculate_statistics
 from stdf.generator import STDFGenerator
 from stdf.analyzer import STDFAnalyzer
+from stdf.results import TestResult, TestResultStore
 
 
 @pytest.fixture
@@ -59,6 +60,861 @@ def test_stdf_statistics(sample_stdf_file):
     assert stats['total_tests'] == 10
 
 
+def test_mmap_parse_matches_default(sample_stdf_file):
+    """Test memory-mapped scanning produces the same results"""
+    parser = STDFParser(sample_stdf_file)
+    result = parser.parse()
+
+    with STDFParser(sample_stdf_file, use_mmap=True) as mmap_parser:
+        mmap_result = mmap_parser.parse()
+
+        assert isinstance(mmap_parser.records[0].data, memoryview)
+        assert mmap_result['total_records'] == result['total_records']
+        assert repr(list(mmap_parser.test_results)) == repr(list(parser.test_results))
+        assert mmap_parser.file_info == parser.file_info
+
+
+def test_result_store_columns(sample_stdf_file):
+    """Test parser fills the columnar store with list-style row access"""
+    parser = STDFParser(sample_stdf_file)
+    parser.parse()
+
+    store = parser.test_results
+    assert isinstance(store, TestResultStore)
+    assert len(store.test_num) == 10
+    assert list(store.test_num) == list(range(1, 11))
+    assert store.strings.count('V') == 1
+    assert isinstance(store[0], TestResult)
+    assert store[-1].test_num == 10
+    assert [r.test_num for r in store[2:4]] == [3, 4]
+
+    merged = TestResultStore()
+    merged.append(TestResult(99, 'Other', 1.0, 'A', 0.0, 2.0, True))
+    merged.extend(store)
+    assert len(merged) == 11
+    assert merged[1].test_name == 'Test_1'
+    assert merged[1].unit == 'V'
+    assert merged[0].unit == 'A'
+
+
+def test_streaming_iterators(sample_stdf_file):
+    """Test lazy iterators keep nothing on the parser"""
+    parser = STDFParser(sample_stdf_file)
+
+    records = list(parser.iter_records())
+    assert len(records) == 13
+    assert len(parser.records) == 0
+
+    stats = parser._calculate_statistics(parser.iter_test_results())
+    assert stats['total_tests'] == 10
+    assert len(parser.test_results) == 0
+    assert 'setup_time' in parser.file_info
+
+
+def test_streaming_analysis_and_export(sample_stdf_file):
+    """Test analyzer and CSV export consume streams directly"""
+    parser = STDFParser(sample_stdf_file)
+    analyzer = STDFAnalyzer(parser)
+    analysis = analyzer.analyze_by_test(parser.iter_test_results())
+    assert sum(stats['count'] for stats in analysis.values()) == 10
+
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
+        csv_path = f.name
+
+    try:
+        parser.export_csv(csv_path, parser.iter_test_results())
+        with open(csv_path) as f:
+            assert len(f.readlines()) == 11
+        assert len(parser.test_results) == 0
+    finally:
+        os.remove(csv_path)
+
+
+def test_parse_many_merges_files(sample_stdf_file):
+    """Test parallel multi-file parsing merges results in input order"""
+    from stdf.parallel import parse_many
+
+    single = STDFParser(sample_stdf_file)
+    single.parse()
+
+    merged = parse_many([sample_stdf_file, sample_stdf_file], workers=2)
+    assert len(merged.test_results) == 2 * len(single.test_results)
+    assert [info['rows'] for info in merged.files] == [(0, 10), (10, 20)]
+    assert merged.total_records == 2 * len(single.records)
+    assert merged.statistics()['total_tests'] == 20
+    assert list(merged.test_results.test_num) == 2 * list(single.test_results.test_num)
+
+    analysis = STDFAnalyzer(merged).analyze_by_test()
+    assert all(stats['count'] == 2 for stats in analysis.values())
+
+    test_num = single.test_results.test_num[0]
+    filtered = parse_many([sample_stdf_file, sample_stdf_file], workers=2, tests={test_num})
+    assert list(filtered.test_results.test_num) == [test_num, test_num]
+
+
+def test_parse_chunked_matches_serial(sample_stdf_file, monkeypatch, tmp_path):
+    """Test intra-file chunked parsing merges chunks in file order"""
+    from stdf import parallel
+
+    monkeypatch.setattr(parallel, 'MIN_CHUNK_SIZE', 32)
+    ranges = parallel.find_chunk_boundaries(sample_stdf_file, 4)
+    assert len(ranges) == 4
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == os.path.getsize(sample_stdf_file)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+    single = STDFParser(sample_stdf_file)
+    single.parse()
+
+    chunked = parallel.parse_chunked(sample_stdf_file, workers=2)
+    assert chunked.total_records == len(single.records)
+    assert chunked.files[0]['file_info'] == single.file_info
+    assert repr(list(chunked.test_results)) == repr(list(single.test_results))
+
+    # Filters, the sidecar index and plain reads apply to every chunk
+    tests = set(single.test_results.test_num[1::3])
+    index = single.load_index(cache_dir=str(tmp_path))
+    limits, indexed_limits = {}, {}
+    assert parallel.find_chunk_boundaries(sample_stdf_file, 4, limits) == ranges
+    assert parallel.find_chunk_boundaries(sample_stdf_file, 4, indexed_limits, index) == ranges
+    assert indexed_limits == limits and len(limits) == 10
+    expected = [result for result in single.test_results if result.test_num in tests]
+    for use_mmap, chunk_index in ((True, None), (False, None), (True, index), (False, index)):
+        filtered = parallel.parse_chunked(sample_stdf_file, workers=2, use_mmap=use_mmap, tests=tests,
+                                          index=chunk_index)
+        assert repr(list(filtered.test_results)) == repr(expected)
+
+
+def test_async_parse_api(sample_stdf_file, tmp_path):
+    """Test aparse/aiter_test_results/aparse_many match the blocking parser"""
+    import asyncio
+    import gzip
+    from concurrent.futures import ThreadPoolExecutor
+    from stdf.aio import aiter_test_results, aparse, aparse_many
+
+    parser = STDFParser(sample_stdf_file)
+    parser.parse()
+    compressed = str(tmp_path / 'sample.stdf.gz')
+    with gzip.open(compressed, 'wb') as f:
+        f.write(Path(sample_stdf_file).read_bytes())
+
+    async def run():
+        records = [record async for record in aparse(sample_stdf_file, block_size=64, prefetch=1)]
+        results = [result async for result in aiter_test_results(sample_stdf_file, block_size=64)]
+        gz_results = [result async for result in aiter_test_results(compressed, block_size=64)]
+        with ThreadPoolExecutor(2) as executor:
+            merged = await aparse_many([sample_stdf_file] * 3, concurrency=2, executor=executor)
+        return records, results, gz_results, merged
+
+    records, results, gz_results, merged = asyncio.run(run())
+    assert [(r.rec_type, r.rec_sub, bytes(r.data)) for r in records] == \
+        [(r.rec_type, r.rec_sub, bytes(r.data)) for r in parser.records]
+    assert results == gz_results == list(parser.test_results)
+    assert list(merged.test_results) == 3 * list(parser.test_results)
+    assert [info['rows'] for info in merged.files] == [(0, 10), (10, 20), (20, 30)]
+
+
+def test_ingest_server_returns_statistics(sample_stdf_file):
+    """Test the HTTP ingest endpoint parses a streamed body"""
+    import asyncio
+    import json
+    from stdf.aio import start_server
+
+    data = Path(sample_stdf_file).read_bytes()
+    expected = STDFParser(sample_stdf_file).parse()
+
+    async def request(payload, max_body_size=len(data)):
+        server = await start_server('127.0.0.1', 0, max_body_size=max_body_size)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(payload)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    # Chunked body split mid-record
+    body = b''.join(f'{len(part):x}\r\n'.encode() + part + b'\r\n' for part in (data[:10], data[10:]))
+    response = asyncio.run(request(b'POST /lot HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n'
+                                   + body + b'0\r\n\r\n'))
+    head, _, payload = response.partition(b'\r\n\r\n')
+    assert head.startswith(b'HTTP/1.1 200')
+    summary = json.loads(payload)
+    assert summary['total_records'] == expected['total_records']
+    assert summary['statistics'] == expected['statistics']
+    assert len(summary['tests']) == 10
+
+    response = asyncio.run(request(b'GET / HTTP/1.1\r\n\r\n'))
+    assert response.startswith(b'HTTP/1.1 405')
+
+    # The limit holds for chunked bodies and bodies read until EOF too
+    response = asyncio.run(request(b'POST /lot HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n'
+                                   + body + b'0\r\n\r\n', max_body_size=len(data) - 1))
+    assert response.startswith(b'HTTP/1.1 413')
+    response = asyncio.run(request(b'POST /lot HTTP/1.1\r\n\r\n' + data, max_body_size=100))
+    assert response.startswith(b'HTTP/1.1 413')
+
+
+def _bgzf(data, block_size):
+    """BGZF-compress data: gzip members carrying their size in a 'BC' extra field"""
+    import struct
+    import zlib
+
+    out = b''
+    for start in range(0, len(data), block_size):
+        block = data[start:start + block_size]
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        deflated = compressor.compress(block) + compressor.flush()
+        size = 18 + len(deflated) + 8
+        out += (b'\x1f\x8b\x08\x04' + b'\0' * 4 + b'\0\xff' + struct.pack('<HBBHH', 6, 66, 67, 2, size - 1)
+                + deflated + struct.pack('<II', zlib.crc32(block), len(block)))
+    return out
+
+
+@pytest.mark.parametrize('fmt', ['gzip', 'bz2', 'xz', 'zstd', 'bgzf', 'zstd-frames'])
+def test_compressed_input(sample_stdf_file, tmp_path, fmt):
+    """Test compressed files are detected and parsed, sequentially and in parallel"""
+    import bz2
+    import gzip
+    import lzma
+    from stdf import compression
+
+    data = Path(sample_stdf_file).read_bytes()
+    if fmt.startswith('zstd'):
+        zstandard = pytest.importorskip('zstandard')
+        compressor = zstandard.ZstdCompressor()
+        parts = [data[i:i + 50] for i in range(0, len(data), 50)] if fmt == 'zstd-frames' else [data]
+        packed = b''.join(compressor.compress(part) for part in parts)
+    else:
+        packed = {'gzip': gzip.compress, 'bz2': bz2.compress, 'xz': lzma.compress,
+                  'bgzf': lambda d: _bgzf(d, 50)}[fmt](data)
+    path = str(tmp_path / f'lot.stdf.{fmt}')
+    Path(path).write_bytes(packed)
+
+    assert compression.detect_compression(path) == fmt.replace('bgzf', 'gzip').split('-')[0]
+    if fmt == 'bgzf':
+        assert len(compression.bgzf_blocks(path)) == (len(data) + 49) // 50
+    if fmt == 'zstd-frames':
+        assert len(compression.zstd_frames(path)) == (len(data) + 49) // 50
+
+    expected = STDFParser(sample_stdf_file)
+    expected.parse()
+    for workers in (1, 3):
+        with STDFParser(path, use_mmap=True, decompress_workers=workers) as parser:
+            result = parser.parse()
+            assert result['total_records'] == len(expected.records)
+            assert list(parser.test_results) == list(expected.test_results)
+
+        selected = STDFParser(path, tests={3, 7}, decompress_workers=workers)
+        selected.parse()
+        assert [r.test_num for r in selected.test_results] == [3, 7]
+
+
+def test_record_index_sidecar(sample_stdf_file, tmp_path):
+    """Test sidecar index build, reload, targeted reads and invalidation"""
+    from stdf.index import RecordIndex, index_path
+    from stdf.parser import RecordType
+
+    cache_dir = str(tmp_path / 'cache')
+    parser = STDFParser(sample_stdf_file)
+    index = parser.load_index(cache_dir=cache_dir)
+
+    assert os.path.exists(index_path(sample_stdf_file, cache_dir))
+    assert index.total_records == 13
+    assert len(index.offsets(RecordType.PTR)) == 10
+    assert index.record_counts()['MIR'] == 1
+
+    reloaded = RecordIndex.load(sample_stdf_file, index_path(sample_stdf_file, cache_dir))
+    assert reloaded is not None
+    assert reloaded.file_info == index.file_info
+    assert list(reloaded.test_offsets(5)) == list(index.test_offsets(5))
+
+    results = list(parser.iter_test_results(reloaded.test_offsets(5)))
+    assert [r.test_num for r in results] == [5]
+    with STDFParser(sample_stdf_file, use_mmap=True) as mmap_parser:
+        assert [r.test_num for r in mmap_parser.iter_test_results(reloaded.test_offsets(7))] == [7]
+
+    with open(sample_stdf_file, 'ab') as f:
+        f.write(b'\x00\x00\x01\x14')
+    assert RecordIndex.load(sample_stdf_file, index_path(sample_stdf_file, cache_dir)) is None
+    assert parser.load_index(cache_dir=cache_dir).total_records == 14
+
+
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_selective_parsing(sample_stdf_file, use_mmap):
+    """Test record type and test number filters skip unwanted records"""
+    from stdf.parser import RecordType
+
+    with STDFParser(sample_stdf_file, use_mmap=use_mmap, tests={3, 7}) as parser:
+        result = parser.parse()
+        assert [r.test_num for r in parser.test_results] == [3, 7]
+        assert result['total_records'] == 5  # FAR, MIR, 2 PTRs, MRR
+
+    with STDFParser(sample_stdf_file, use_mmap=use_mmap, record_types={RecordType.MIR}) as parser:
+        result = parser.parse()
+        assert result['total_records'] == 1
+        assert len(parser.test_results) == 0
+        assert 'setup_time' in parser.file_info
+
+    index = STDFParser(sample_stdf_file).load_index()
+    try:
+        parser = STDFParser(sample_stdf_file, use_mmap=use_mmap, record_types={RecordType.PTR},
+                            tests={9}, index=index)
+        assert parser._indexed_offsets() == list(index.test_offsets(9))
+        parser.parse()
+        assert [r.test_num for r in parser.test_results] == [9]
+        parser.close()
+    finally:
+        os.remove(sample_stdf_file + '.stdfidx')
+
+
+def test_decoder_registry_covers_record_types():
+    """Test every RecordType has a registered decoder"""
+    import struct
+    from stdf.decoders import DECODERS, PTR_OPT_DEFAULTS, decode_record
+    from stdf.parser import RecordType
+    from stdf.records import ParametricTestRecord, PartResultsRecord
+
+    assert {(t >> 8, t & 0xFF) for t in RecordType} <= set(DECODERS)
+
+    ptr = (struct.pack('<IBBBBf', 1005, 1, 2, 0x80, 0, 1.5) + b'\x04Vdd1\x00'
+           + struct.pack('<Bbbbff', 0, 0, 0, 0, 0.5, 2.0) + b'\x01V')
+    record = decode_record(RecordType.PTR >> 8, RecordType.PTR & 0xFF, ptr)
+    assert record == ParametricTestRecord(1005, 1, 2, 0x80, 0, 1.5, 'Vdd1', '', 0, 0, 0, 0,
+                                          0.5, 2.0, 'V')
+
+    # A bad UNITS length must not read into the next record of a shared buffer
+    from stdf.decoders import decode_ptr
+    bad_units = ptr[:-2] + b'\x10V'
+    assert decode_ptr(bad_units + b'\x02\x00\x05\x0a\x01\x00', 0, len(bad_units)).units == 'V'
+
+    truncated = decode_record(RecordType.PTR >> 8, RecordType.PTR & 0xFF, memoryview(ptr)[:12])
+    assert truncated.test_num == 1005
+    assert truncated.test_txt == ''
+    assert truncated.opt_flag == PTR_OPT_DEFAULTS
+
+    prr = struct.pack('<BBBHHHhhI', 1, 2, 0x08, 10, 3, 7, -4, 5, 120) + b'\x03P01\x00'
+    record = decode_record(RecordType.PRR >> 8, RecordType.PRR & 0xFF, prr)
+    assert record == PartResultsRecord(1, 2, 0x08, 10, 3, 7, -4, 5, 120, 'P01', '')
+
+    assert decode_record(0x7F, 0x7F, b'') is None
+
+
+def test_writer_round_trip(tmp_path):
+    """Test every record written by STDFWriter decodes back unchanged"""
+    import io
+    from stdf.records import (FileAttributeRecord, FunctionalTestRecord, MasterInformationRecord,
+                              MasterResultsRecord, ParametricTestRecord, PartCountRecord,
+                              PartInformationRecord, PartResultsRecord, WaferInformationRecord,
+                              WaferResultsRecord)
+    from stdf.writer import STDFWriter, encode_record
+
+    records = [
+        FileAttributeRecord(2, 4),
+        MasterInformationRecord(100, 200, 3, 'P', ' ', ' ', 'LOT1', 'DEV', 'node', 'tester', 'job'),
+        WaferInformationRecord(1, 255, 300, 'W01'),
+        PartInformationRecord(1, 2),
+        ParametricTestRecord(1005, 1, 2, 0x80, 0, 1.5, 'Vdd1', '', 0x0E, 0, 0, 0, 0.5, 2.0, 'V'),
+        ParametricTestRecord(1005, 1, 2, 0, 0, 0.75, 'Vdd1', 'A1', 0x0E, 0, 0, 0, 0.5, 2.0, 'V'),
+        FunctionalTestRecord(2000, 1, 2, 0, 0, 10, 0, 1, 0, 0, 0, 0, 'vec', 'ts', 'op', 'Func', '',
+                             '', 'ok'),
+        PartResultsRecord(1, 2, 0x08, 3, 2, 7, -4, 5, 120, 'P01', 'txt'),
+        WaferResultsRecord(1, 255, 400, 1, 0, 0, 0, 0, 'W01', 'F1', '', '', 'usr', ''),
+        PartCountRecord(255, 255, 1, 0, 0, 0, 0),
+        MasterResultsRecord(500, ' ', 'done', ''),
+    ]
+    path = tmp_path / 'written.stdf'
+    with STDFWriter(str(path), buffer_size=64) as writer:
+        writer.write(records[0])
+        writer.write_records(records[1:])
+    assert writer.record_count == len(records)
+    assert writer.bytes_written == path.stat().st_size == sum(len(encode_record(r)) for r in records)
+
+    parser = STDFParser(str(path))
+    assert [parser.decode_record(record) for record in parser.iter_records()] == records
+    parser.parse()
+    assert parser.file_info['lot_id'] == 'LOT1'
+    assert [(r.result, r.pass_fail) for r in parser.test_results] == [(1.5, False), (0.75, True)]
+    assert parser.parts.info(0).part_id == 'P01'
+
+    buffer = io.BytesIO()
+    with STDFWriter(buffer) as writer:
+        writer.write_raw(0x00, 0x0A, b'\x02\x04')
+    assert buffer.getvalue() == encode_record(records[0])
+    with pytest.raises(TypeError):
+        encode_record(object())
+
+
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_lazy_records_match_eager_decoding(sample_stdf_file, use_mmap):
+    """Test lazy record views decode like the eager records, also after the parser is closed"""
+    from stdf.lazy import LazyPTR, iter_lazy_stream
+    from stdf.records import ParametricTestRecord, RecordType
+
+    eager = STDFParser(sample_stdf_file)
+    eager.parse()
+    records = [eager.decode_record(record) for record in eager.records]
+
+    with STDFParser(sample_stdf_file, use_mmap=use_mmap) as parser:
+        views = list(parser.iter_records(lazy=True))
+        assert [record.decode() for record in views[:2]] == records[:2]
+        assert parser.records == []
+    assert [record.decode() for record in views] == records
+
+    ptr = next(record for record in views if isinstance(record, LazyPTR))
+    first = next(record for record in records if isinstance(record, ParametricTestRecord))
+    assert (ptr.test_num, ptr.result, ptr.test_txt, ptr.units) == \
+        (first.test_num, first.result, first.test_txt, first.units)
+    assert ptr.decode() is ptr.decode()
+    assert bytes(ptr.data) == bytes(eager.records[records.index(first)].data)
+    assert next(record for record in reversed(views) if isinstance(record, LazyPTR)).test_num == \
+        next(record for record in reversed(records) if isinstance(record, ParametricTestRecord)).test_num
+
+    with STDFParser(sample_stdf_file, use_mmap=use_mmap, record_types={RecordType.PTR},
+                    tests={first.test_num}) as selected:
+        assert {record.test_num for record in selected.iter_records(lazy=True)} == {first.test_num}
+
+    # Records split across read chunks
+    with open(sample_stdf_file, 'rb') as f:
+        assert [record.decode() for record in iter_lazy_stream(f, chunk_size=97)] == records
+
+
+def test_decoder_benchmark_smoke():
+    """Test the decoder and writer micro-benchmarks run and report speedups"""
+    from stdf.bench import bench_decoders, bench_lazy, bench_writer
+
+    results = {**bench_decoders(num_records=200, repeat=1), **bench_writer(num_records=200, repeat=1),
+               **bench_lazy(num_records=200, repeat=1)}
+    assert set(results) == {'dispatch', 'ptr_decode', 'ptr_write', 'lazy_fields'}
+    assert all(timing['speedup'] > 0 for timing in results.values())
+
+
+def test_benchmark_suite(tmp_path, monkeypatch):
+    """Test the throughput suite reports every case and compares saved runs"""
+    import json
+    from stdf import bench
+
+    monkeypatch.setattr(bench, '_run_isolated', lambda func, *args: func(*args))
+    report = bench.run_suite([20000], workdir=str(tmp_path), cli=False, repeat=1)
+
+    cases = [entry['case'] for entry in report['results']]
+    assert cases[:2] == ['parse', 'parse_mmap']
+    assert {f'analyzer.{m}' for m in bench.ANALYZER_METHODS} <= set(cases)
+    assert all(entry['records'] and entry['mb_per_s'] for entry in report['results'])
+
+    path = str(tmp_path / 'bench.json')
+    bench.save_results(report, path)
+    with open(path) as f:
+        baseline = json.load(f)
+    for entry in baseline['results']:
+        entry['seconds'] /= 2
+    changes = bench.compare_results(baseline, report)
+    assert len(changes) == len(cases)
+    assert all(change['regression'] for change in changes)
+
+
+def test_profiler_reports_counts_timings_and_memory(sample_stdf_file):
+    """Test opt-in profiling of parse and analysis"""
+    import json
+    from stdf.index import RecordIndex
+    from stdf.profiling import Profiler
+
+    with Profiler(trace_memory=True) as profiler:
+        parser = STDFParser(sample_stdf_file, profiler=profiler)
+        result = parser.parse()
+        STDFAnalyzer(parser).find_outliers()
+
+    report = json.loads(profiler.to_json())
+    counts = {entry['type']: entry['count'] for entry in report['records']}
+    assert counts == RecordIndex.build(sample_stdf_file).record_counts()
+    assert sum(entry['count'] for entry in report['records']) == result['total_records']
+    assert {'io', 'decode', 'statistics', 'outliers'} <= set(report['timings'])
+    assert report['memory']['peak_bytes'] > 0
+    assert report['memory']['top_allocations']
+
+    # Same results as an unprofiled parse
+    plain = STDFParser(sample_stdf_file)
+    assert plain.parse()['statistics'] == result['statistics']
+    assert list(plain.test_results) == list(parser.test_results)
+
+
+def _record(rec_type, rec_sub, data):
+    import struct
+    return struct.pack('<HBB', len(data), rec_type, rec_sub) + data
+
+
+def _ptr(test_num, result, test_flg=0, site=1, name=b'', limits=None, opt_flag=0x0E, units=b''):
+    """Build a PTR payload; limits=None omits OPT_FLAG and everything after"""
+    import struct
+    data = struct.pack('<IBBBBf', test_num, 1, site, test_flg, 0, result)
+    if limits is None and not name:
+        return _record(15, 10, data)
+    data += bytes([len(name)]) + name + b'\x00'
+    if limits is not None:
+        data += struct.pack('<Bbbbff', opt_flag, 0, 0, 0, *limits) + bytes([len(units)]) + units
+    return _record(15, 10, data)
+
+
+@pytest.fixture
+def repeat_ptr_file(tmp_path):
+    """File whose repeat PTRs omit limits and units"""
+    import struct
+    path = tmp_path / 'repeat.stdf'
+    prr = struct.pack('<BBBHHHhhI', 1, 1, 0x08, 4, 2, 7, 3, -2, 150) + b'\x03P01\x00'
+    path.write_bytes(
+        _record(0, 10, b'\x02\x04')
+        + _record(5, 10, b'\x01\x01')
+        + _ptr(100, 1.2, name=b'IDDQ', limits=(1.0, 2.0), units=b'mA')
+        + _ptr(100, 2.5, test_flg=0x40)                     # compare against cached limits
+        + _ptr(100, 0.5, test_flg=0x80)                     # failed per TEST_FLG
+        + _ptr(100, 2.5, test_flg=0x40, limits=(0.0, 3.0))  # own limits override
+        + _ptr(200, 9.0, test_flg=0x40, name=b'VOH', limits=(0.0, 5.0), opt_flag=0x80)
+        + _ptr(100, 1.5, site=2, name=b'IDDQ', limits=(1.4, 1.6), units=b'mA')
+        + _record(5, 20, prr)
+    )
+    return str(path)
+
+
+def test_full_ptr_decoding_with_cached_limits(repeat_ptr_file):
+    """Test repeat PTRs reuse the first PTR's name, units and limits"""
+    parser = STDFParser(repeat_ptr_file)
+    parser.parse()
+    results = list(parser.test_results)
+
+    assert [(r.test_name, r.unit) for r in results[:3]] == [('IDDQ', 'mA')] * 3
+    assert [(r.low_limit, r.high_limit) for r in results[:3]] == [(1.0, 2.0)] * 3
+    assert [r.pass_fail for r in results[:3]] == [True, False, False]
+
+    assert (results[3].low_limit, results[3].high_limit, results[3].pass_fail) == (0.0, 3.0, True)
+    assert results[4].high_limit == float('inf')
+    assert results[4].pass_fail is True
+
+    # Limits are cached per (test_num, head, site)
+    assert (results[5].low_limit, results[5].high_limit) == pytest.approx((1.4, 1.6))
+    assert set(parser.test_limits) == {(100, 1, 1), (200, 1, 1), (100, 1, 2)}
+
+    assert len(parser.part_results) == 1
+    part = parser.part_results[0]
+    assert (part.hard_bin, part.soft_bin, part.x_coord, part.y_coord) == (2, 7, 3, -2)
+    assert part.part_id == 'P01'
+
+
+def test_parse_chunked_resolves_limits_across_chunks(repeat_ptr_file, monkeypatch):
+    """Test chunk workers get first-PTR limits from earlier chunks"""
+    from stdf import parallel
+
+    monkeypatch.setattr(parallel, 'MIN_CHUNK_SIZE', 16)
+    single = STDFParser(repeat_ptr_file)
+    single.parse()
+
+    chunked = parallel.parse_chunked(repeat_ptr_file, workers=1)
+    assert list(chunked.test_results) == list(single.test_results)
+    assert chunked.part_results == single.part_results
+
+
+@pytest.fixture
+def wafer_file(tmp_path):
+    """Two wafers on head 1: a retested die, a part without coordinates"""
+    import struct
+
+    def prr(site, part_flg, hard_bin, soft_bin, x, y):
+        return _record(5, 20, struct.pack('<BBBHHHhhI', 1, site, part_flg, 1, hard_bin, soft_bin,
+                                          x, y, 0) + b'\x00\x00')
+
+    def wafer(wafer_id, parts):
+        wrr = struct.pack('<BBIIIIII', 1, 255, 0, len(parts), 0, 0, 0, 0) + b'\x00' * 6
+        return (_record(2, 10, struct.pack('<BBI', 1, 255, 0) + bytes([len(wafer_id)]) + wafer_id)
+                + b''.join(prr(*part) for part in parts) + _record(2, 20, wrr))
+
+    path = tmp_path / 'wafer.stdf'
+    path.write_bytes(
+        _record(0, 10, b'\x02\x04')
+        + wafer(b'W01', [(1, 0, 1, 1, 0, 0), (2, 0x08, 3, 30, 1, 0), (1, 0x08, 2, 20, 0, 1),
+                         (2, 0, 1, 1, 0, 1),  # retest of (0, 1) passes
+                         (1, 0x10, 1, 1, -32768, -32768)])
+        + wafer(b'W02', [(1, 0x08, 5, 50, 2, 2), (2, 0, 1, 1, 3, 2)])
+    )
+    return str(path)
+
+
+def test_bin_summary_and_wafer_maps(wafer_file, monkeypatch, tmp_path):
+    """Test bin counts, per-wafer yield and dense grids from PRR/WIR/WRR"""
+    import json
+    import sys
+    from stdf import cli, parallel
+    from stdf.wafer import EMPTY_BIN
+
+    parser = STDFParser(wafer_file)
+    parser.parse()
+    bins = parser.bin_summary
+    assert bins.statistics() == {'part_count': 7, 'good_count': 4, 'fail_count': 3,
+                                 'yield_rate': pytest.approx(400 / 7)}
+    assert bins.bin_counts() == {1: 4, 2: 1, 3: 1, 5: 1}
+    assert bins.bin_counts('soft', by_site=True) == {(1, 1): {1: 2, 20: 1, 50: 1},
+                                                     (1, 2): {1: 2, 30: 1}}
+
+    analyzer = STDFAnalyzer(parser)
+    assert [(w['wafer_id'], w['parts'], w['dies'], w['good']) for w in analyzer.wafer_yields()] == \
+        [('W01', 5, 4, 3), ('W02', 2, 2, 1)]
+    grid = analyzer.wafer_map('W01')
+    assert (grid.x_min, grid.y_min, grid.width, grid.height) == (0, 0, 2, 2)
+    assert list(grid.cells) == [1, 3, 1, EMPTY_BIN]
+    assert analyzer.wafer_map(1, kind='soft').bin_at(2, 2) == 50
+    assert 'Hard Bins: 1=4, 2=1, 3=1, 5=1' in analyzer.generate_report()
+
+    # Chunk boundaries inside a wafer continue it
+    monkeypatch.setattr(parallel, 'MIN_CHUNK_SIZE', 32)
+    chunked = parallel.parse_chunked(wafer_file, workers=1).bin_summary
+    assert chunked.wafer_yields() == bins.wafer_yields()
+    assert chunked.bin_counts(by_site=True) == bins.bin_counts(by_site=True)
+
+    output = tmp_path / 'map.json'
+    monkeypatch.setattr(sys, 'argv', ['stdf', 'wafermap', wafer_file, '--wafer', 'W02',
+                                      '--json', str(output)])
+    assert cli.main() == 0
+    report = json.loads(output.read_text())
+    assert [w['wafer_id'] for w in report['wafers']] == ['W02']
+    assert report['wafers'][0]['grid']['rows'] == [[5, 1]]
+
+
+def test_wafer_grid_rejects_outlier_die():
+    """Test a stray die coordinate gives a clear error, not a huge dense grid"""
+    from stdf.wafer import BinSummary
+
+    bins = BinSummary()
+    bins.start_wafer(1)
+    bins.add_part(1, 1, 0, 1, 1, 0, 0)
+    bins.add_part(1, 1, 0, 2, 2, 32767, -32767)
+    wafer = bins.wafers[0]
+    with pytest.raises(ValueError, match='use dies'):
+        wafer.grid()
+    assert wafer.dies() == {(0, 0): 1, (32767, -32767): 2}
+    report = bins.report()['wafers'][0]
+    assert report['grid'] is None and report['die_bins'] == [[0, 0, 1], [32767, -32767, 2]]
+    assert report['dies'] == 2
+
+    # Clipping leaves the stray die out of the dense grid
+    assert list(wafer.grid(bounds=(-10, 10, -10, 10)).cells) == [1]
+    clipped = bins.report(bounds=(-10, 10, -10, 10))['wafers'][0]
+    assert clipped['grid']['rows'] == [[1]] and 'die_bins' not in clipped
+
+
+def test_part_linkage_and_lookup(tmp_path, monkeypatch):
+    """Test multi-site results are linked to their parts and found by PRR fields"""
+    from stdf import parallel
+    from stdf.parts import NO_PART
+
+    path = str(tmp_path / 'bulk.stdf')
+    STDFGenerator(path).generate_bulk(num_parts=400, num_tests=5, num_sites=4, seed=3)
+    parser = STDFParser(path)
+    parser.parse()
+    parts, store = parser.parts, parser.test_results
+
+    assert len(parts) == 400
+    assert len(parts.row_site) == len(store) and NO_PART not in parts.row_parts()
+    for part in range(len(parts)):
+        rows = parts.rows(part)
+        assert sorted(store.test_num[row] for row in rows) == sorted(set(store.test_num))
+        assert parts.info(part).passed == all(store.pass_fail[row] for row in rows)
+
+    (part,) = parts.find(part_id='7')
+    assert parts.info(part)[1:4] == ('7', 1, 3)
+    assert parts.find(x=6, y=0) == [part]
+    other_bin = 1 if parts.info(part).hard_bin == 2 else 2
+    assert parts.find(part_id='7', hard_bin=other_bin) == []
+
+    analyzer = STDFAnalyzer(parser)
+    failed = analyzer.part_results(hard_bin=2)
+    assert failed == [result for result, part in zip(store, parts.row_parts()) if parts.hard_bin[part] == 2]
+    assert failed and any(not result.pass_fail for result in failed)
+
+    # Parts split across byte-range chunks are stitched back together
+    monkeypatch.setattr(parallel, 'MIN_CHUNK_SIZE', 512)
+    chunked = parallel.parse_chunked(path, workers=1)
+    assert chunked.parts.row_parts() == parts.row_parts()
+    assert chunked.parts.part_id == parts.part_id
+    assert STDFAnalyzer(chunked).part_results(hard_bin=2) == failed
+
+
+def test_result_database_matches_in_memory_analysis(tmp_path, monkeypatch, capsys):
+    """Test ingested lots are queried with the same statistics as parsed files"""
+    import sys
+    from stdf import cli
+    from stdf.database import ResultDatabase
+    from stdf.parallel import parse_many
+
+    paths = []
+    for seed in (1, 2):
+        paths.append(str(tmp_path / f'lot{seed}.stdf'))
+        STDFGenerator(paths[-1]).generate_bulk(num_parts=60, num_tests=8, num_sites=4, seed=seed)
+
+    db_path = str(tmp_path / 'results.db')
+    with ResultDatabase(db_path) as database:
+        assert [database.ingest_file(path) for path in paths] == [1, 2]
+        assert database.ingest_file(paths[0]) is None
+        assert database.ingest_file(paths[0], force=True) == 3
+
+        expected = STDFAnalyzer(parse_many(paths[::-1], workers=1))
+        stored = database.select()
+        analyzer = STDFAnalyzer(stored)
+        stats, reference = analyzer.analyze_by_test(), expected.analyze_by_test()
+        assert list(stats) == list(reference)
+        for test_num, group in reference.items():
+            assert stats[test_num] == pytest.approx(group)
+        assert analyzer.get_failing_tests() == expected.get_failing_tests()
+        assert analyzer.find_outliers(2.0) == expected.find_outliers(2.0)
+        assert stored._test_results is None
+        assert analyzer.bin_counts() == expected.bin_counts()
+
+        test_num = next(iter(reference))
+        history = database.test_history(test_num)
+        assert [entry['lot'] for entry in history] == [2]
+        assert history[0]['cpk'] == pytest.approx(expected.calculate_cpk(test_num))
+
+    monkeypatch.setattr(sys, 'argv', ['stdf', 'history', db_path])
+    assert cli.main() == 0
+    assert f'Total Tests: {len(expected.test_results)}' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('kernel_copy', [True, False])
+def test_split_filter_merge_raw_records(tmp_path, monkeypatch, kernel_copy):
+    """Test split/filter/merge copy raw records and keep results and parts intact"""
+    from stdf import tools
+
+    monkeypatch.setattr(tools, 'ZERO_COPY_MIN', 256)
+    if not kernel_copy:
+        monkeypatch.setattr(tools, '_copy_kernel', lambda *args: 0)
+    path = str(tmp_path / 'lot.stdf')
+    STDFGenerator(path).generate_bulk(num_parts=120, num_tests=6, num_sites=4, seed=5)
+    full = STDFParser(path)
+    full.parse()
+    row_parts = full.parts.row_parts()
+
+    def parsed(filepath):
+        parser = STDFParser(filepath)
+        parser.parse()
+        return parser
+
+    paths = tools.split_file(path, str(tmp_path), by='site')
+    assert list(paths) == [(1, 1), (1, 2), (1, 3), (1, 4)]
+    for (head, site), site_path in paths.items():
+        split = parsed(site_path)
+        assert set(split.parts.site_num) == {site} and len(split.parts) == 30
+        assert list(split.test_results) == [result for result, part in zip(full.test_results, row_parts)
+                                            if full.parts.site_num[part] == site]
+
+    failing = str(tmp_path / 'failing.stdf')
+    tools.filter_file(path, failing, parts='failing')
+    failed = parsed(failing)
+    expected = [part for part in range(len(full.parts)) if not full.parts.info(part).passed]
+    assert expected and failed.parts.part_id == [full.parts.part_id[part] for part in expected]
+    assert list(failed.test_results) == [full.test_results[row] for row in full.parts.rows_for(expected)]
+
+    test_num = full.test_results.test_num[0]
+    one_test = str(tmp_path / 'one_test.stdf')
+    tools.filter_file(path, one_test, tests={test_num}, sites={2})
+    assert {(r.test_num, r.pass_fail) for r in parsed(one_test).test_results} <= {(test_num, True), (test_num, False)}
+    assert len(parsed(one_test).test_results) == 30
+
+    merged = str(tmp_path / 'merged.stdf')
+    assert tools.merge_files(list(paths.values()), merged) == os.path.getsize(path)
+    assert sorted(parsed(merged).parts.part_id) == sorted(full.parts.part_id)
+    assert len(parsed(merged).test_results) == len(full.test_results)
+
+
+def test_part_filter_holds_records_until_prr():
+    """Test the filter part tracker copies matching parts, in file order, once decided"""
+    import struct
+    from stdf import tools
+
+    def prr(flags, hard_bin):
+        return _record(5, 20, struct.pack('<BBBHHHhhI', 1, 1, flags, 1, hard_bin, hard_bin, 0, 0, 0) + b'\x00\x00')
+
+    records = [_record(5, 10, b'\x01\x01'), _ptr(1000, 1.0), _record(1, 10, b''), prr(0x08, 5),
+               _record(5, 10, b'\x01\x01'), _ptr(1000, 2.0), prr(0, 1)]
+    buf = b''.join(records)
+    offsets = [sum(map(len, records[:i])) for i in range(len(records) + 1)]
+
+    class Copier:
+        def __init__(self):
+            self.ranges = []
+
+        def add(self, start, end):
+            self.ranges.append((start, end))
+
+    copier = Copier()
+    part_filter = tools._PartFilter(copier, buf, tools._part_matcher('failing', None, None))
+    for position, (record, end) in enumerate(zip(offsets, offsets[1:])):
+        rec_id = buf[record + 2] << 8 | buf[record + 3]
+        if rec_id in tools._PART_RECORDS:
+            part_filter.add_part_record(rec_id, record, record + 4, end, True)
+        else:
+            part_filter.add(record, end)
+        if position == 2:
+            assert copier.ranges == []  # the part is undecided, so the MIR waits too
+    part_filter.finish()
+    assert copier.ranges == list(zip(offsets, offsets[1:]))[:4]
+
+    keep = tools._record_filter(None, None, {2}, {1000})
+    assert tools._record_filter(None, None, None, None) is None
+    assert keep(buf, 0x0F0A, offsets[1] + 4, offsets[2]) is False  # PTR of site 1
+    assert keep(buf, 0x010A, offsets[2] + 4, offsets[3])  # MIR
+
+
+def test_incremental_parser_follows_appended_data(sample_stdf_file, tmp_path):
+    """Test only appended bytes are decoded and partial records wait for more"""
+    from stdf.follow import IncrementalParser
+
+    data = Path(sample_stdf_file).read_bytes()
+    growing = tmp_path / 'growing.stdf'
+    growing.write_bytes(b'')
+    incremental = IncrementalParser(str(growing), keep_results=True)
+
+    # Append in odd-sized pieces that split records
+    for start in range(0, len(data), 7):
+        with open(growing, 'ab') as f:
+            f.write(data[start:start + 7])
+        incremental.update()
+        assert incremental.offset <= growing.stat().st_size
+
+    parser = STDFParser(sample_stdf_file)
+    result = parser.parse()
+    assert incremental.offset == len(data)
+    assert incremental.total_records == result['total_records']
+    assert incremental.statistics() == result['statistics']
+    assert list(incremental.parser.test_results) == list(parser.test_results)
+    assert incremental.file_info == parser.file_info
+
+    expected = STDFAnalyzer(parser).analyze_by_test()
+    for test_num, stats in incremental.analyze_by_test().items():
+        assert stats['count'] == expected[test_num]['count']
+        assert stats['mean'] == pytest.approx(expected[test_num]['mean'])
+        assert stats['cpk'] == pytest.approx(expected[test_num]['cpk'])
+
+    # A rewritten (shorter) file restarts from scratch
+    growing.write_bytes(data[:len(data) // 2])
+    incremental.update()
+    assert incremental.offset <= len(data) // 2
+    assert incremental.total_records < result['total_records']
+
+    # Without keep_results only the running bin counts grow
+    bulk = tmp_path / 'bulk.stdf'
+    STDFGenerator(str(bulk)).generate_bulk(num_parts=10, num_tests=3, seed=1)
+    parser = STDFParser(str(bulk))
+    parser.parse()
+    counting = IncrementalParser(str(bulk))
+    counting.update()
+    assert counting.parser.part_results == [] and len(counting.parser.parts) == 0
+    assert len(counting.parser.test_results) == 0
+    bins = counting.parser.bin_summary
+    assert bins.part_count == 10 and all(len(wafer) == 0 for wafer in bins.wafers)
+    assert bins.bin_counts(by_site=True) == parser.bin_summary.bin_counts(by_site=True)
+
+
 def test_csv_export(sample_stdf_file):
     """Test CSV export functionality"""
     parser = STDFParser(sample_stdf_file)
@@ -76,6 +932,60 @@ def test_csv_export(sample_stdf_file):
             os.remove(csv_path)
 
 
+def test_batched_csv_matches_row_writer(sample_stdf_file, tmp_path):
+    """Test the batched CSV writer gives the same file for stores and streams"""
+    import csv
+    from stdf import export
+
+    parser = STDFParser(sample_stdf_file)
+    parser.parse()
+
+    expected = tmp_path / 'rows.csv'
+    with open(expected, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(export.CSV_HEADER)
+        for t in parser.test_results:
+            writer.writerow([t.test_num, t.test_name, t.result, t.unit, t.low_limit,
+                             t.high_limit, 'PASS' if t.pass_fail else 'FAIL'])
+
+    for name, results in (('store.csv', parser.test_results), ('stream.csv', parser.iter_test_results())):
+        export.export_csv(str(tmp_path / name), results, batch_size=2)
+        assert (tmp_path / name).read_text() == expected.read_text()
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow', 'npz'])
+def test_columnar_export(sample_stdf_file, tmp_path, fmt):
+    """Test Parquet/Arrow/NPZ exports round-trip the result columns"""
+    from stdf.export import export_results
+
+    parser = STDFParser(sample_stdf_file)
+    parser.parse()
+    path = str(tmp_path / f'results.{fmt}')
+
+    if fmt == 'npz':
+        np = pytest.importorskip('numpy')
+        export_results(path, parser.iter_test_results(), fmt)
+        with np.load(path) as data:
+            strings = data['strings']
+            rows = list(zip(data['test_num'].tolist(), strings[data['name_id']].tolist(),
+                            data['result'].tolist(), strings[data['unit_id']].tolist(),
+                            data['low_limit'].tolist(), data['high_limit'].tolist(),
+                            data['pass_fail'].tolist()))
+    else:
+        pa = pytest.importorskip('pyarrow')
+        export_results(path, parser.test_results, fmt, **{
+            'parquet': {'row_group_size': 2}, 'arrow': {'batch_size': 2}}[fmt])
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            assert pq.ParquetFile(path).metadata.num_row_groups == (len(parser.test_results) + 1) // 2
+            table = pq.read_table(path)
+        else:
+            table = pa.ipc.open_file(path).read_all()
+        rows = list(zip(*table.to_pydict().values()))
+
+    assert [TestResult(*row) for row in rows] == list(parser.test_results)
+
+
 def test_stdf_summary(sample_stdf_file):
     """Test summary generation"""
     parser = STDFParser(sample_stdf_file)
@@ -128,6 +1038,154 @@ def test_cpk_calculation(sample_stdf_file):
         assert cpk >= 0
 
 
+def test_grouped_statistics_match_reference():
+    """Test shared grouped statistics against the statistics module"""
+    import statistics
+
+    store = TestResultStore()
+    values = [1.0, 1.2, 0.9, 1.1, 1.05, 0.95, 1.0, 1.02, 0.98, 1.01, 9.0, 1.0]
+    for value in values:
+        store.add(7, 'Test_7', value, 'V', 0.0, 5.0, True)
+    store.add(3, 'Test_3', 2.0, 'V', 0.0, 5.0, True)
+
+    parser = STDFParser('unused.stdf')
+    parser.test_results = store
+    analyzer = STDFAnalyzer(parser)
+    analysis = analyzer.analyze_by_test()
+
+    assert list(analysis) == [7, 3]
+    stats = analysis[7]
+    assert stats['count'] == len(values)
+    assert stats['mean'] == pytest.approx(statistics.mean(values))
+    assert stats['median'] == pytest.approx(statistics.median(values))
+    assert stats['stdev'] == pytest.approx(statistics.stdev(values))
+    assert stats['min'] == min(values)
+    assert stats['max'] == max(values)
+    assert analysis[3]['stdev'] == 0.0
+
+    mean, stdev = statistics.mean(values), statistics.stdev(values)
+    expected_cpk = min(5.0 - mean, mean - 0.0) / (3 * stdev)
+    assert analyzer.calculate_cpk(7) == pytest.approx(expected_cpk)
+    assert analyzer.calculate_cpk(3) == 0.0
+    assert analyzer.calculate_cpk(42) == 0.0
+
+    outliers = analyzer.find_outliers(sigma=3.0)
+    assert [r.result for r in outliers] == [9.0]
+
+
+def test_streaming_analyzer_matches_exact_and_merges():
+    """Test running stats/sketch agree with exact stats and merge across workers"""
+    import random
+    from stdf.analyzer import StreamingAnalyzer
+
+    rng = random.Random(1)
+    results = [TestResult(n, f'T{n}', rng.gauss(n, 0.5), 'V', n - 3.0, n + 2.0, True)
+               for _ in range(5000) for n in (1, 2)]
+    results += [TestResult(3, 'T3', value, 'V', 0.0, 10.0, False) for value in (1.0, 4.0, 2.0, 8.0)]
+
+    store = TestResultStore()
+    for result in results:
+        store.append(result)
+    exact = STDFAnalyzer(type('P', (), {'filepath': 'x', 'test_results': store})()).analyze_by_test()
+
+    streaming = StreamingAnalyzer().fold(iter(results))
+    left = StreamingAnalyzer().fold(results[::2])
+    right = StreamingAnalyzer().fold(results[1::2])
+    merged = left.merge(right)
+
+    for analyzer in (streaming, merged):
+        stats = analyzer.analyze_by_test()
+        assert sorted(stats) == [1, 2, 3]
+        for test_num, expected in exact.items():
+            for key in ('count', 'mean', 'stdev', 'min', 'max', 'cpk'):
+                assert stats[test_num][key] == pytest.approx(expected[key])
+            assert stats[test_num]['median'] == pytest.approx(expected['median'], abs=0.02)
+        assert analyzer.statistics() == calculate_statistics(results)
+        assert analyzer.quantile(1, 0.99) == pytest.approx(1 + 2.326 * 0.5, abs=0.05)
+
+    assert list(streaming.analyze_by_test()) == [1, 2, 3]
+    # Small samples are exact
+    assert streaming.analyze_by_test()[3]['median'] == 3.0
+
+    bounds = streaming.outlier_thresholds(3.0)
+    outliers = streaming.find_outliers(results)
+    assert all(not bounds[r.test_num][0] <= r.result <= bounds[r.test_num][1] for r in outliers)
+    assert len(outliers) == len(STDFAnalyzer(type('P', (), {'filepath': 'x', 'test_results': results})())
+                                .find_outliers())
+
+
+def test_analysis_cache_tiers_and_invalidation(sample_stdf_file, tmp_path, monkeypatch, capsys):
+    """Test cached analyses skip parsing, persist on disk and follow file changes"""
+    import shutil
+    import sys
+    from stdf import cli
+    from stdf.cache import AnalysisCache
+
+    path = str(tmp_path / 'lot.stdf')
+    shutil.copy(sample_stdf_file, path)
+    cache_dir = str(tmp_path / 'cache')
+    cache = AnalysisCache(max_entries=8, cache_dir=cache_dir)
+
+    parser = STDFParser(path)
+    parser.parse()
+    expected = STDFAnalyzer(parser)
+    report = STDFAnalyzer(parser, cache=cache).generate_report()
+    assert report == expected.generate_report()
+
+    # Hits need no parsing, in this process or (from disk) another one
+    for reader in (cache, AnalysisCache(cache_dir=cache_dir)):
+        misses = reader.misses
+        unparsed = STDFParser(path)
+        analyzer = STDFAnalyzer(unparsed, cache=reader)
+        assert analyzer.generate_report() == report
+        assert analyzer.analyze_by_test() == expected.analyze_by_test()
+        assert analyzer.find_outliers() == expected.find_outliers()
+        assert not unparsed.records and reader.misses == misses
+
+    # Returned values are copies; changing them leaves later hits intact
+    analyzer = STDFAnalyzer(STDFParser(path), cache=cache)
+    stats = analyzer.analyze_by_test()
+    next(iter(stats.values()))['mean'] = None
+    stats.clear()
+    analyzer.find_outliers().clear()
+    assert analyzer.analyze_by_test() == expected.analyze_by_test()
+    assert analyzer.find_outliers() == expected.find_outliers()
+
+    # Parameters are part of the key; a miss parses the file
+    misses = cache.misses
+    analyzer = STDFAnalyzer(STDFParser(path), cache=cache)
+    assert analyzer.find_outliers(1.0) == expected.find_outliers(1.0)
+    assert analyzer.parser.records and cache.misses == misses + 1
+
+    # The results in returned lists are copies too
+    bulk = str(tmp_path / 'bulk.stdf')
+    STDFGenerator(bulk).generate_bulk(num_parts=20, num_tests=2, seed=1)
+    bulk_parser = STDFParser(bulk)
+    bulk_parser.parse()
+    outliers = STDFAnalyzer(bulk_parser).find_outliers(1.0)
+    memory = AnalysisCache()
+    STDFAnalyzer(STDFParser(bulk), cache=memory).find_outliers(1.0)[0].result = None
+    assert outliers and STDFAnalyzer(STDFParser(bulk), cache=memory).find_outliers(1.0) == outliers
+
+    # A changed file misses; invalidation drops every version's entries
+    os.utime(path, ns=(1, 1))
+    STDFAnalyzer(STDFParser(path), cache=cache).calculate_cpk(1000)
+    assert cache.misses == misses + 2
+    entries = len(os.listdir(cache_dir))
+    assert cache.invalidate(path) == entries > 0
+    assert os.listdir(cache_dir) == []
+
+    bounded = AnalysisCache(max_entries=1, cache_dir=cache_dir, max_disk_bytes=1)
+    bounded.put('a', 1)
+    bounded.put('b', 2)
+    assert bounded.get('a') is None and len(bounded._entries) == 1 and os.listdir(cache_dir) == []
+
+    # A miss is parsed serially, so the CLI refuses to ignore --jobs
+    monkeypatch.setattr(sys, 'argv', ['stdf', 'analyze', path, '--cache-dir', cache_dir, '--jobs', '2'])
+    assert cli.main() == 1
+    assert '--jobs' in capsys.readouterr().err
+
+
 def test_failing_tests(sample_stdf_file):
     """Test finding failing tests"""
     parser = STDFParser(sample_stdf_file)
@@ -160,6 +1218,52 @@ def test_generator():
             os.remove(filepath)
 
 
+def test_bulk_generator(tmp_path, monkeypatch):
+    """Test bulk generation framing, repeat-PTR limits and seeded reproducibility"""
+    paths = [str(tmp_path / f'bulk{i}.stdf') for i in range(3)]
+    sizes = [STDFGenerator(path).generate_bulk(num_parts=10, num_tests=5, num_sites=4, seed=seed)
+             for path, seed in zip(paths, (7, 7, 8))]
+    assert sizes[0] == os.path.getsize(paths[0])
+
+    parsers = [STDFParser(path) for path in paths]
+    for parser in parsers:
+        parser.parse()
+    parser = parsers[0]
+
+    assert [r.rec_type for r in parser.records].count(5) == 20  # PIR + PRR per part
+    assert len(parser.test_results) == 50
+    assert [p.site_num for p in parser.part_results] == [1, 2, 3, 4] * 2 + [1, 2]
+    assert [p.part_id for p in parser.part_results] == [str(i) for i in range(1, 11)]
+    assert all(p.num_test == 5 for p in parser.part_results)
+
+    names = {r.test_num: (r.test_name, r.unit, r.low_limit, r.high_limit) for r in parser.test_results[:20]}
+    assert len(names) == 5
+    for result in parser.test_results:
+        assert (result.test_name, result.unit, result.low_limit, result.high_limit) == names[result.test_num]
+        assert result.pass_fail == (result.low_limit <= result.result <= result.high_limit)
+
+    assert list(parsers[1].test_results) == list(parser.test_results)
+    assert list(parsers[2].test_results) != list(parser.test_results)
+
+    # 255 sites (SITE_NUM is a U1) at most; Y_COORD wraps instead of overflowing its I2
+    import sys
+    from stdf import cli, generator
+    from stdf.parser import RecordType
+
+    monkeypatch.setattr(generator, '_DIE_COLUMNS', 1)
+    STDFGenerator(paths[0]).generate_bulk(num_parts=32770, num_tests=1, num_sites=255, seed=1)
+    wide = STDFParser(paths[0], record_types={RecordType.PRR})
+    wide.parse()
+    assert max(p.site_num for p in wide.part_results) == 255
+    assert [p.y_coord for p in wide.part_results[32766:]] == [32766, 32767, 0, 1]
+    for sites in (0, 256):
+        with pytest.raises(ValueError, match='num_sites'):
+            STDFGenerator(paths[0]).generate_bulk(num_parts=1, num_sites=sites)
+    monkeypatch.setattr(sys, 'argv', ['stdf', 'generate', paths[0], '--parts', '1', '--sites', '256'])
+    with pytest.raises(SystemExit):
+        cli.main()
+
+
 def test_analysis_report(sample_stdf_file):
     """Test comprehensive analysis report"""
     parser = STDFParser(sample_stdf_file)
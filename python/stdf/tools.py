@@ -0,0 +1,572 @@
+"""Record-level split, merge and filter of STDF files
+
+These tools work on raw ``(REC_LEN, REC_TYP, REC_SUB)`` frames: a header
+scan over a memory map reads only the fields a predicate needs (HEAD_NUM
+and SITE_NUM, a PTR's TEST_NUM, a PRR's PART_FLG and bins), and kept
+records are copied verbatim, never decoded or re-encoded.
+
+Adjacent kept records coalesce into byte ranges. Ranges of at least
+``ZERO_COPY_MIN`` bytes are copied by the kernel (``os.copy_file_range``,
+else ``os.sendfile``); shorter ones, e.g. the interleaved records of one
+site, are gathered from the mapping into a ``WRITE_BUFFER_SIZE`` buffer.
+"""
+
+import mmap
+import os
+from collections import deque
+from dataclasses import replace
+from typing import BinaryIO, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from .compression import detect_compression
+from .decoders import (
+    _U2, OPT_HI_LIMIT_INVALID, OPT_LO_LIMIT_INVALID, OPT_NO_HI_LIMIT, OPT_NO_LO_LIMIT,
+    OPT_RES_SCAL_INVALID, decode_ptr
+)
+from .generator import WRITE_BUFFER_SIZE
+from .parser import HEADER, HEADER_SIZE, TEST_NUM, RecordType
+from .parts import NO_PART
+from .records import ParametricTestRecord
+from .wafer import part_passed
+from .writer import encode_record
+
+# Coalesced ranges this large are copied kernel-side
+ZERO_COPY_MIN = 1024 * 1024
+
+# HEAD_NUM/SITE_NUM value meaning all heads/sites (summary records)
+ALL = 255
+
+SPLIT_KEYS = ('site', 'head')
+PART_OUTCOMES = ('failing', 'passing')
+
+
+def _rec_id(rec_type: int, rec_sub: int) -> int:
+    return rec_type << 8 | rec_sub
+
+
+# Location of HEAD_NUM in the payload, and a mask forcing SITE_NUM to ALL
+# for head-level records (whose next byte is SITE_GRP)
+_LOCATION_FIELDS: Dict[int, Tuple[int, int]] = {
+    **{rec_id: (4, 0) for rec_id in (RecordType.PTR, _rec_id(15, 15), RecordType.FTR)},  # after TEST_NUM
+    **{rec_id: (0, 0) for rec_id in (RecordType.PIR, RecordType.PRR, RecordType.PCR,
+                                     _rec_id(1, 40), _rec_id(1, 50), _rec_id(10, 30))},  # HBR, SBR, TSR
+    RecordType.WIR: (0, ALL),
+    RecordType.WRR: (0, ALL),
+}
+# Records of one test: PTR, MPR, FTR
+_TEST_RECORDS = frozenset((RecordType.PTR, _rec_id(15, 15), RecordType.FTR))
+# Records that belong to the part being tested on their head/site
+_PART_RECORDS = _TEST_RECORDS | {RecordType.PIR, RecordType.PRR}
+
+# Location (``head << 8 | site``) of records not tied to a head
+FILE_LEVEL = ALL << 8 | ALL
+
+_PRR_HARD_BIN = 5  # payload offset of the PRR HARD_BIN (U2); SOFT_BIN follows
+_PTR_KEY_SIZE = 6  # TEST_NUM, HEAD_NUM, SITE_NUM
+
+_MASK_LO = OPT_LO_LIMIT_INVALID | OPT_NO_LO_LIMIT
+_MASK_HI = OPT_HI_LIMIT_INVALID | OPT_NO_HI_LIMIT
+
+
+def _open_view(filepath: str) -> Tuple[int, Optional[mmap.mmap]]:
+    """(size, read-only mapping) of an uncompressed STDF file"""
+    if detect_compression(filepath) is not None:
+        raise ValueError(f'cannot process compressed file {filepath} by record; decompress it first')
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+    return size, view
+
+
+def _location(view: mmap.mmap, rec_id: int, start: int, end: int) -> int:
+    """``head << 8 | site`` of a record; site ALL for head-level records, FILE_LEVEL for the rest"""
+    fields = _LOCATION_FIELDS.get(rec_id)
+    if fields is None:
+        return FILE_LEVEL
+    pos = start + fields[0]
+    if pos + 2 > end or view[pos] == ALL:
+        return FILE_LEVEL
+    return view[pos] << 8 | view[pos + 1] | fields[1]
+
+
+def _copy_kernel(src_fd: int, dst_fd: int, offset: int, length: int) -> int:
+    """Copy bytes between files without passing them through Python; returns bytes copied"""
+    copy_file_range = getattr(os, 'copy_file_range', None)  # Linux, Python 3.8+
+    if copy_file_range is not None:
+        try:
+            return copy_file_range(src_fd, dst_fd, length, offset)
+        except OSError:
+            pass  # e.g. unsupported by the filesystem; try sendfile
+    sendfile = getattr(os, 'sendfile', None)
+    if sendfile is not None:
+        try:
+            return sendfile(dst_fd, src_fd, offset, length)
+        except OSError:
+            pass
+    return 0
+
+
+class _RangeCopier:
+    """Copies byte ranges of a mapped source file to one output, coalescing adjacent ranges"""
+
+    def __init__(self, src_fd: int, view: mmap.mmap, out: BinaryIO):
+        self.src_fd = src_fd
+        self.view = view
+        self.out = out
+        self.buffer = bytearray()
+        self.bytes_written = 0
+        self.kernel_copy = True
+        self._start = self._end = 0
+
+    def add(self, start: int, end: int) -> None:
+        if start == self._end:
+            self._end = end
+        else:
+            self._emit()
+            self._start, self._end = start, end
+
+    def insert(self, data: bytes) -> None:
+        """Write bytes not taken from the source after what is pending"""
+        self._emit()
+        self.buffer += data
+
+    def _emit(self) -> None:
+        start, end = self._start, self._end
+        self._start = self._end = 0
+        if end - start < ZERO_COPY_MIN:
+            self.buffer += self.view[start:end]
+            if len(self.buffer) >= WRITE_BUFFER_SIZE:
+                self._flush()
+            return
+
+        self._flush()
+        while start < end and self.kernel_copy:
+            copied = _copy_kernel(self.src_fd, self.out.fileno(), start, end - start)
+            if not copied:
+                self.kernel_copy = False
+            start += copied
+            self.bytes_written += copied
+        while start < end:
+            stop = min(start + WRITE_BUFFER_SIZE, end)
+            self._write(self.view[start:stop])
+            start = stop
+
+    def _write(self, data: bytes) -> None:
+        self.bytes_written += len(data)
+        view = memoryview(data)
+        while view:
+            view = view[self.out.write(view):]
+
+    def _flush(self) -> None:
+        if self.buffer:
+            self._write(self.buffer)
+            self.buffer = bytearray()
+
+    def close(self) -> int:
+        """Copy what is pending; returns the bytes written"""
+        self._emit()
+        self._flush()
+        return self.bytes_written
+
+
+def _open_output(path: str) -> BinaryIO:
+    # Unbuffered: kernel copies and buffered writes go through the same file offset
+    return open(path, 'wb', buffering=0)
+
+
+class _Splitter:
+    """Routes byte ranges to one output per head/site (or head), opened on first use"""
+
+    def __init__(self, filepath: str, src_fd: int, view: mmap.mmap, by_site: bool,
+                 output_dir: Optional[str], pattern: str):
+        self.src_fd = src_fd
+        self.view = view
+        self.by_site = by_site
+        if output_dir is None:
+            output_dir = os.path.dirname(os.path.abspath(filepath))
+        self.output_dir = output_dir
+        self.pattern = pattern
+        self.stem = os.path.splitext(os.path.basename(filepath))[0]
+        self.paths: Dict[Tuple[int, ...], str] = {}
+        self.copiers: Dict[int, _RangeCopier] = {}
+        self.outputs: List[BinaryIO] = []
+        # Records for several outputs, replayed into outputs opened later
+        self.shared: List[Tuple[int, int, int]] = []
+        # location -> (target copiers, whether the record is shared)
+        self.routes: Dict[int, Tuple[List[_RangeCopier], bool]] = {}
+
+    def route(self, location: int) -> Tuple[List[_RangeCopier], bool]:
+        """(target copiers, whether the record is shared) of a location, cached in ``routes``"""
+        targets = self.routes[location] = self._route(location)
+        return targets
+
+    def _route(self, location: int) -> Tuple[List[_RangeCopier], bool]:
+        head, site = location >> 8, location & 0xFF
+        if head == ALL:
+            return list(self.copiers.values()), True
+        if self.by_site and site == ALL:
+            return [copier for key, copier in self.copiers.items() if key >> 8 == head], True
+
+        key = location if self.by_site else location | ALL
+        copier = self.copiers.get(key)
+        if copier is None:
+            copier = self.copiers[key] = self._open(head, site)
+        return [copier], False
+
+    def _open(self, head: int, site: int) -> _RangeCopier:
+        path_key = (head, site) if self.by_site else (head,)
+        path = self.paths[path_key] = os.path.join(self.output_dir, self.pattern.format(
+            stem=self.stem, head=head, site=site if self.by_site else 'all'))
+        out = _open_output(path)
+        self.outputs.append(out)
+        copier = _RangeCopier(self.src_fd, self.view, out)
+        for location, start, end in self.shared:
+            if location == FILE_LEVEL or location >> 8 == head:
+                copier.add(start, end)
+        self.routes.clear()  # shared routes now include this output
+        return copier
+
+    def finish(self) -> None:
+        """Copy what is pending to every output"""
+        for copier in self.copiers.values():
+            copier.close()
+
+    def close(self) -> None:
+        for out in self.outputs:
+            out.close()
+
+
+def split_file(filepath: str, output_dir: Optional[str] = None, by: str = 'site',
+               pattern: str = '{stem}_head{head}_site{site}.stdf') -> Dict[Tuple[int, ...], str]:
+    """Write one file per head/site (``by='site'``) or per head (``by='head'``)
+
+    Each output gets the records of its head/site plus every file-level
+    record (FAR, MIR, MRR, ...), head-level records (WIR, WRR) of its head,
+    and summary records for all sites (HEAD_NUM or SITE_NUM 255), in file
+    order. Returns the output paths keyed by (head, site) or (head,).
+    """
+    if by not in SPLIT_KEYS:
+        raise ValueError(f"unknown split key '{by}' (expected one of {', '.join(SPLIT_KEYS)})")
+
+    size, view = _open_view(filepath)
+    try:
+        with open(filepath, 'rb') as src:
+            splitter = _Splitter(filepath, src.fileno(), view, by == 'site', output_dir, pattern)
+            try:
+                unpack_header = HEADER.unpack_from
+                location_fields = _LOCATION_FIELDS
+                routes, shared = splitter.routes, splitter.shared
+                offset = 0
+                last = size - HEADER_SIZE
+                while offset <= last:
+                    rec_len, rec_type, rec_sub = unpack_header(view, offset)
+                    start = offset + HEADER_SIZE
+                    end = start + rec_len
+                    if end > size:  # truncated last record
+                        end = size
+
+                    # _location, inlined
+                    location = FILE_LEVEL
+                    fields = location_fields.get(rec_type << 8 | rec_sub)
+                    if fields is not None:
+                        pos = start + fields[0]
+                        if pos + 2 <= end and view[pos] != ALL:
+                            location = view[pos] << 8 | view[pos + 1] | fields[1]
+
+                    targets = routes.get(location) or splitter.route(location)
+                    for copier in targets[0]:
+                        copier.add(offset, end)
+                    if targets[1]:
+                        shared.append((location, offset, end))
+                    offset = end
+                splitter.finish()
+            finally:
+                splitter.close()
+    finally:
+        if view is not None:
+            view.close()
+    return dict(sorted(splitter.paths.items()))
+
+
+def merge_files(filepaths: Iterable[str], output: str) -> int:
+    """Concatenate files into one; returns the bytes written
+
+    The FAR and MIR of the first file open the output and the MRR of the
+    last one closes it; the FAR/MIR/MRR of the others are dropped. All
+    other records are copied verbatim, mostly as whole-file ranges. A
+    current sidecar index (``stdf index``) supplies the dropped records'
+    offsets; otherwise the record headers are scanned.
+    """
+    from .index import RecordIndex
+
+    filepaths = list(filepaths)
+    written = 0
+    with _open_output(output) as out:
+        for position, filepath in enumerate(filepaths):
+            drop = set()
+            if position:
+                drop |= {RecordType.FAR, RecordType.MIR}
+            if position < len(filepaths) - 1:
+                drop.add(RecordType.MRR)
+
+            size, view = _open_view(filepath)
+            if view is None:
+                continue
+            try:
+                index = RecordIndex.load(filepath) if drop else None
+                if index is not None:
+                    dropped = sorted(offset for rec_id in drop for offset in index.offsets(rec_id))
+                else:
+                    dropped = _record_offsets(view, size, drop)
+
+                with open(filepath, 'rb') as src:
+                    copier = _RangeCopier(src.fileno(), view, out)
+                    kept = 0
+                    for offset in dropped:
+                        copier.add(kept, offset)
+                        kept = min(offset + HEADER_SIZE + HEADER.unpack_from(view, offset)[0], size)
+                    copier.add(kept, size)
+                    written += copier.close()
+            finally:
+                view.close()
+    return written
+
+
+def _record_offsets(view: mmap.mmap, size: int, rec_ids: Set[int]) -> List[int]:
+    """Header offsets of the records of these types"""
+    unpack_header = HEADER.unpack_from
+    found = []
+    offset = 0
+    last = size - HEADER_SIZE
+    while offset <= last:
+        rec_len, rec_type, rec_sub = unpack_header(view, offset)
+        if rec_type << 8 | rec_sub in rec_ids:
+            found.append(offset)
+        offset += HEADER_SIZE + rec_len
+    return found
+
+
+def _inherit_first_ptr(first: ParametricTestRecord, ptr: ParametricTestRecord) -> ParametricTestRecord:
+    """A PTR completed with what it inherits from the first PTR of its test
+
+    Readers take a test's name and units from the first PTR of each
+    (test_num, head, site), and scales and limits from it unless a later
+    PTR carries valid ones. When filtering drops that first PTR, the first
+    one kept stands in for it.
+    """
+    own = ptr.opt_flag
+    opt_flag = own & ~(OPT_RES_SCAL_INVALID | _MASK_LO | _MASK_HI)
+    source = first if own & OPT_RES_SCAL_INVALID else ptr
+    opt_flag |= source.opt_flag & OPT_RES_SCAL_INVALID
+    res_scal = source.res_scal
+
+    source = ptr if own & OPT_NO_LO_LIMIT or not own & OPT_LO_LIMIT_INVALID else first
+    opt_flag |= source.opt_flag & _MASK_LO
+    llm_scal, lo_limit = source.llm_scal, source.lo_limit
+
+    source = ptr if own & OPT_NO_HI_LIMIT or not own & OPT_HI_LIMIT_INVALID else first
+    opt_flag |= source.opt_flag & _MASK_HI
+    hlm_scal, hi_limit = source.hlm_scal, source.hi_limit
+
+    return replace(ptr, test_txt=first.test_txt, units=first.units, opt_flag=opt_flag, res_scal=res_scal,
+                   llm_scal=llm_scal, hlm_scal=hlm_scal, lo_limit=lo_limit, hi_limit=hi_limit)
+
+
+def _part_matcher(parts: Optional[str], hard_bins: Optional[Set[int]],
+                  soft_bins: Optional[Set[int]]) -> Callable[[mmap.mmap, int], bool]:
+    """Predicate on a PRR payload (at ``start`` in the mapping, long enough for the bins)"""
+    unpack_u2 = _U2.unpack_from
+
+    def match(view: mmap.mmap, start: int) -> bool:
+        hard_bin = unpack_u2(view, start + _PRR_HARD_BIN)[0]
+        if parts is not None and part_passed(view[start + 2], hard_bin) != (parts == 'passing'):
+            return False
+        if hard_bins is not None and hard_bin not in hard_bins:
+            return False
+        return soft_bins is None or unpack_u2(view, start + _PRR_HARD_BIN + 2)[0] in soft_bins
+
+    return match
+
+
+def _record_filter(record_types: Optional[Set[int]], heads: Optional[Set[int]], sites: Optional[Set[int]],
+                   tests: Optional[Set[int]]) -> Optional[Callable[[mmap.mmap, int, int, int], bool]]:
+    """Predicate on a record's type and payload (``start``..``end`` in the mapping); None keeps all"""
+    if record_types is None and heads is None and sites is None and tests is None:
+        return None
+    location_fields = _LOCATION_FIELDS if heads is not None or sites is not None else {}
+    unpack_test_num = TEST_NUM.unpack_from
+
+    def keep(view: mmap.mmap, rec_id: int, start: int, end: int) -> bool:
+        if record_types is not None and rec_id not in record_types:
+            return False
+        fields = location_fields.get(rec_id)
+        if fields is not None:
+            pos = start + fields[0]
+            if pos + 2 <= end and view[pos] != ALL:  # else file-level
+                if heads is not None and view[pos] not in heads:
+                    return False
+                site = view[pos + 1] | fields[1]
+                if sites is not None and site != ALL and site not in sites:
+                    return False
+        if tests is not None and rec_id in _TEST_RECORDS:
+            return end - start >= 4 and unpack_test_num(view, start)[0] in tests
+        return True
+
+    return keep
+
+
+class _PartFilter:
+    """Copies the records of matching parts, holding them back until each part's PRR
+
+    Records that follow a held-back one wait with it, so the output stays
+    in file order.
+    """
+
+    def __init__(self, copier: _RangeCopier, view: mmap.mmap, match_part: Callable[[mmap.mmap, int], bool]):
+        self.copier = copier
+        self.view = view
+        self.match_part = match_part
+        # (offset, end, part or NO_PART) of records waiting for a PRR
+        self.pending: Deque[Tuple[int, int, int]] = deque()
+        # Whether each closed part matched; open part of each location
+        self.outcomes: Dict[int, bool] = {}
+        self.open_parts: Dict[int, int] = {}
+        self.part_count = 0
+        # First PTR of each (test_num, head, site), and the tests with a PTR kept
+        self.first_ptrs: Dict[bytes, Tuple[int, int]] = {}
+        self.kept_tests: Set[bytes] = set()
+
+    def add(self, record: int, end: int) -> None:
+        """Copy a record outside any part, after those held back"""
+        if self.pending:
+            self.pending.append((record, end, NO_PART))
+        else:
+            self.copier.add(record, end)
+
+    def add_part_record(self, rec_id: int, record: int, start: int, end: int, keep: bool) -> None:
+        """Track the part of a PIR, PRR or test record; the record is copied if kept and its part matches"""
+        view = self.view
+        pos = start + _LOCATION_FIELDS[rec_id][0]
+        location = view[pos] << 8 | view[pos + 1] if pos + 2 <= end else FILE_LEVEL
+        decided = False
+        if rec_id == RecordType.PIR:
+            previous = self.open_parts.get(location)
+            if previous is not None:
+                self.outcomes[previous] = False  # no PRR
+                decided = True
+            part = self.open_parts[location] = self._new_part()
+        elif rec_id == RecordType.PRR:
+            part = self.open_parts.pop(location, None)
+            if part is None:
+                part = self._new_part()
+            self.outcomes[part] = end - start >= _PRR_HARD_BIN + 4 and self.match_part(view, start)
+            decided = True
+        else:
+            part = self.open_parts.get(location)
+            if part is None:
+                part = self.open_parts[location] = self._new_part()
+            if rec_id == RecordType.PTR and end - start >= _PTR_KEY_SIZE:
+                self.first_ptrs.setdefault(view[start:start + _PTR_KEY_SIZE], (record, end))
+        if keep:
+            self.pending.append((record, end, part))
+        if decided:
+            self._release()
+
+    def finish(self) -> None:
+        """Copy what is held back; parts left without a PRR do not match"""
+        for part in self.open_parts.values():
+            self.outcomes[part] = False
+        self._release()
+
+    def _new_part(self) -> int:
+        part = self.part_count
+        self.part_count += 1
+        return part
+
+    def _release(self) -> None:
+        pending = self.pending
+        while pending:
+            record, end, part = pending[0]
+            if part == NO_PART:
+                self.copier.add(record, end)
+            else:
+                outcome = self.outcomes.get(part)
+                if outcome is None:
+                    return
+                if outcome:
+                    self._copy_part_record(record, end)
+            pending.popleft()
+        self.outcomes.clear()
+
+    def _copy_part_record(self, record: int, end: int) -> None:
+        view = self.view
+        if view[record + 2] << 8 | view[record + 3] == RecordType.PTR:
+            start = record + HEADER_SIZE
+            key = view[start:start + _PTR_KEY_SIZE]
+            first = self.first_ptrs.get(key)
+            if key not in self.kept_tests and first is not None:
+                self.kept_tests.add(key)
+                if first[0] != record:
+                    ptr = _inherit_first_ptr(decode_ptr(view, first[0] + HEADER_SIZE, first[1]),
+                                             decode_ptr(view, start, end))
+                    self.copier.insert(encode_record(ptr))
+                    return
+        self.copier.add(record, end)
+
+
+def filter_file(filepath: str, output: str, record_types: Optional[Set[int]] = None,
+                heads: Optional[Set[int]] = None, sites: Optional[Set[int]] = None,
+                tests: Optional[Set[int]] = None, parts: Optional[str] = None,
+                hard_bins: Optional[Set[int]] = None, soft_bins: Optional[Set[int]] = None) -> int:
+    """Copy the records passing every given filter; returns the bytes written
+
+    ``record_types`` keeps only those types (the FAR is always kept);
+    ``heads``/``sites`` drop records of other heads/sites; ``tests`` drops
+    PTR/MPR/FTR records of other test numbers. ``parts`` ('failing' or
+    'passing'), ``hard_bins`` and ``soft_bins`` keep only the PIR, test
+    records and PRR of matching parts; parts without a PRR never match.
+
+    Parts are delimited as ``parts.PartIndex`` links them: from a PIR, or
+    the first record of a head/site after its previous PRR, to the PRR.
+    A part's records, and all records after them, wait in a queue until
+    its PRR decides it, so the queue holds about one touchdown. If the
+    first PTR of a test is dropped with its part, the first PTR kept is
+    re-encoded with the name, units and limits it inherited from it.
+    """
+    if parts is not None and parts not in PART_OUTCOMES:
+        raise ValueError(f"unknown part outcome '{parts}' (expected one of {', '.join(PART_OUTCOMES)})")
+    if record_types is not None:
+        record_types = set(record_types) | {RecordType.FAR}
+    keep_record = _record_filter(record_types, heads, sites, tests)
+    by_part = parts is not None or hard_bins is not None or soft_bins is not None
+
+    size, view = _open_view(filepath)
+    try:
+        with open(filepath, 'rb') as src, _open_output(output) as out:
+            if view is None:
+                return 0
+            copier = _RangeCopier(src.fileno(), view, out)
+            part_filter = _PartFilter(copier, view, _part_matcher(parts, hard_bins, soft_bins))
+
+            unpack_header = HEADER.unpack_from
+            offset = 0
+            last = size - HEADER_SIZE
+            while offset <= last:
+                rec_len, rec_type, rec_sub = unpack_header(view, offset)
+                start = offset + HEADER_SIZE
+                end = start + rec_len
+                if end > size:  # truncated last record
+                    end = size
+                rec_id = rec_type << 8 | rec_sub
+                keep = keep_record is None or keep_record(view, rec_id, start, end)
+                if by_part and rec_id in _PART_RECORDS:
+                    # Parts are tracked whatever else is filtered
+                    part_filter.add_part_record(rec_id, offset, start, end, keep)
+                elif keep:
+                    part_filter.add(offset, end)
+                offset = end
+
+            part_filter.finish()
+            return copier.close()
+    finally:
+        if view is not None:
+            view.close()
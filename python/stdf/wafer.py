@@ -0,0 +1,378 @@
+"""Bin summaries, yield and wafer maps from PRR/WIR/WRR records
+
+A ``BinSummary`` is folded one part at a time while parsing: hard and soft
+bin counts per (head, site), part/good counts, and one ``WaferMap`` per
+wafer holding its dies' x/y coordinates and bins in compact ``array``
+columns. Dense 2D grids are built from those columns on demand.
+"""
+
+from array import array
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from .records import PartResultsRecord, WaferInformationRecord, WaferResultsRecord
+
+# PRR PART_FLG bits
+PART_FLG_FAILED = 0x08
+PART_FLG_NO_PASS_FAIL = 0x10  # no pass/fail indication; hard bin 1 counts as good
+
+# X_COORD/Y_COORD of a part without coordinates
+NO_COORD = -32768
+
+# Grid cell without a die
+EMPTY_BIN = 0xFFFF
+
+# Largest dense grid built (8 MB); stray coordinates could otherwise ask for GBs
+MAX_GRID_CELLS = 4 * 1024 * 1024
+
+BIN_KINDS = ('hard', 'soft')
+
+SiteKey = Tuple[int, int]
+
+
+def part_passed(part_flg: int, hard_bin: int) -> bool:
+    """Pass/fail of a part from its PRR PART_FLG (hard bin 1 if not indicated)"""
+    if part_flg & PART_FLG_NO_PASS_FAIL:
+        return hard_bin == 1
+    return not part_flg & PART_FLG_FAILED
+
+
+def _check_kind(kind: str) -> None:
+    if kind not in BIN_KINDS:
+        raise ValueError(f'unknown bin kind: {kind} (expected hard or soft)')
+
+
+class WaferGrid(NamedTuple):
+    """Dense bin map of a wafer, one uint16 cell per x/y position
+
+    ``cells`` is row-major with rows of increasing y:
+    ``cells[(y - y_min) * width + (x - x_min)]``; positions without a die
+    hold ``EMPTY_BIN``.
+    """
+    x_min: int
+    y_min: int
+    width: int
+    height: int
+    cells: array
+
+    def bin_at(self, x: int, y: int) -> int:
+        column, row = x - self.x_min, y - self.y_min
+        if 0 <= column < self.width and 0 <= row < self.height:
+            return self.cells[row * self.width + column]
+        return EMPTY_BIN
+
+    def rows(self) -> Iterator[array]:
+        width = self.width
+        for start in range(0, len(self.cells), width or 1):
+            yield self.cells[start:start + width]
+
+    def to_numpy(self) -> Any:
+        """The grid as a zero-copy (height, width) uint16 NumPy array (requires numpy)"""
+        import numpy as np
+        return np.frombuffer(self.cells, dtype=np.uint16).reshape(self.height, self.width)
+
+
+class WaferMap:
+    """Part results of one wafer, in test order
+
+    ``info``/``results`` are the wafer's WIR and WRR, if seen; parts of a
+    head tested outside any WIR/WRR pair are collected in a wafer without
+    them. A die tested more than once keeps its last bin in ``grid()``.
+    """
+
+    def __init__(self, head_num: int, info: Optional[WaferInformationRecord] = None):
+        self.head_num = head_num
+        self.info = info
+        self.results: Optional[WaferResultsRecord] = None
+        self.x = array('h')
+        self.y = array('h')
+        self.hard_bin = array('H')
+        self.soft_bin = array('H')
+        self.passed = array('B')
+        self._grids: Dict[str, Tuple[int, WaferGrid]] = {}
+
+    @property
+    def wafer_id(self) -> str:
+        if self.info is not None and self.info.wafer_id:
+            return self.info.wafer_id
+        return self.results.wafer_id if self.results is not None else ''
+
+    def __len__(self) -> int:
+        return len(self.passed)
+
+    def __repr__(self) -> str:
+        return f'WaferMap({self.wafer_id!r}, head {self.head_num}, {len(self)} parts)'
+
+    def add(self, x: int, y: int, hard_bin: int, soft_bin: int, passed: bool) -> None:
+        self.x.append(x)
+        self.y.append(y)
+        self.hard_bin.append(hard_bin)
+        self.soft_bin.append(soft_bin)
+        self.passed.append(1 if passed else 0)
+
+    def extend(self, other: 'WaferMap') -> None:
+        """Append another map's parts (e.g. the same wafer from a later chunk)"""
+        self.x.extend(other.x)
+        self.y.extend(other.y)
+        self.hard_bin.extend(other.hard_bin)
+        self.soft_bin.extend(other.soft_bin)
+        self.passed.extend(other.passed)
+
+    def grid(self, kind: str = 'hard', max_cells: int = MAX_GRID_CELLS,
+             bounds: Optional[Tuple[int, int, int, int]] = None) -> WaferGrid:
+        """Dense grid of the 'hard' or 'soft' bins; recomputed if parts were added
+
+        ``bounds`` (x_min, x_max, y_min, y_max) leaves out the dies outside
+        them. Raises ValueError if the coordinates span more than
+        ``max_cells`` cells (e.g. a stray X_COORD of 32767); ``dies()`` is
+        sparse.
+        """
+        _check_kind(kind)
+        cached = self._grids.get(kind)
+        if cached is not None and cached[0] == len(self) and bounds is None:
+            return cached[1]
+
+        bins = self.hard_bin if kind == 'hard' else self.soft_bin
+        dies = [(x, y, b) for x, y, b in zip(self.x, self.y, bins) if x != NO_COORD and y != NO_COORD]
+        if bounds is not None:
+            x_low, x_high, y_low, y_high = bounds
+            dies = [die for die in dies if x_low <= die[0] <= x_high and y_low <= die[1] <= y_high]
+        if not dies:
+            grid = WaferGrid(0, 0, 0, 0, array('H'))
+        else:
+            xs = [die[0] for die in dies]
+            ys = [die[1] for die in dies]
+            x_min, y_min = min(xs), min(ys)
+            width, height = max(xs) - x_min + 1, max(ys) - y_min + 1
+            if width * height > max_cells:
+                raise ValueError(f'wafer {self.wafer_id or "-"} spans x {x_min}..{x_min + width - 1}, '
+                                 f'y {y_min}..{y_min + height - 1}: {width * height} cells exceed '
+                                 f'{max_cells}; use dies() for a sparse map')
+            cells = array('H', [EMPTY_BIN]) * (width * height)
+            for x, y, bin_num in dies:
+                cells[(y - y_min) * width + x - x_min] = bin_num
+            grid = WaferGrid(x_min, y_min, width, height, cells)
+
+        if bounds is None:
+            self._grids[kind] = (len(self), grid)
+        return grid
+
+    def dies(self, kind: str = 'hard') -> Dict[Tuple[int, int], int]:
+        """Sparse map of the 'hard' or 'soft' bins: (x, y) -> last bin of the die"""
+        _check_kind(kind)
+        bins = self.hard_bin if kind == 'hard' else self.soft_bin
+        return {(x, y): b for x, y, b in zip(self.x, self.y, bins) if x != NO_COORD and y != NO_COORD}
+
+    def summary(self) -> Dict[str, Any]:
+        """Part/die counts and yield; each die counts once, with its last result"""
+        last: Dict[Tuple[int, int], int] = {}
+        uncoordinated = uncoordinated_good = 0
+        for x, y, passed in zip(self.x, self.y, self.passed):
+            if x == NO_COORD or y == NO_COORD:
+                uncoordinated += 1
+                uncoordinated_good += passed
+            else:
+                last[(x, y)] = passed
+
+        dies = len(last) + uncoordinated
+        good = sum(last.values()) + uncoordinated_good
+        return {
+            'wafer_id': self.wafer_id,
+            'head_num': self.head_num,
+            'parts': len(self),
+            'dies': dies,
+            'good': good,
+            'yield_rate': (good / dies * 100) if dies else 0.0
+        }
+
+
+class BinSummary:
+    """Bin counts per (head, site), overall yield and per-wafer maps
+
+    Fed by the parser as PRRs, WIRs and WRRs are decoded; summaries of
+    several files or chunks are combined with ``merge()``. Without
+    ``keep_dies`` only the counts are kept and wafer maps stay empty.
+    """
+
+    def __init__(self, keep_dies: bool = True):
+        self.keep_dies = keep_dies
+        self.hard_bins: Dict[SiteKey, Dict[int, int]] = {}
+        self.soft_bins: Dict[SiteKey, Dict[int, int]] = {}
+        self.part_count = 0
+        self.good_count = 0
+        self.wafers: List[WaferMap] = []
+        # Wafer currently receiving parts, per head
+        self._open: Dict[int, WaferMap] = {}
+
+    def __repr__(self) -> str:
+        return f'BinSummary({self.part_count} parts, {len(self.wafers)} wafers)'
+
+    def start_wafer(self, head_num: int, info: Optional[WaferInformationRecord] = None) -> WaferMap:
+        """Open a new wafer on ``head_num`` (a WIR)"""
+        wafer = self._open[head_num] = WaferMap(head_num, info)
+        self.wafers.append(wafer)
+        return wafer
+
+    def end_wafer(self, results: WaferResultsRecord) -> WaferMap:
+        """Close the open wafer of the WRR's head"""
+        wafer = self._open.pop(results.head_num, None)
+        if wafer is None:
+            wafer = self.start_wafer(results.head_num)
+            del self._open[results.head_num]
+        wafer.results = results
+        return wafer
+
+    def add_part(self, head_num: int, site_num: int, part_flg: int, hard_bin: int,
+                 soft_bin: int, x_coord: int = NO_COORD, y_coord: int = NO_COORD) -> None:
+        """Fold in one part result"""
+        passed = part_passed(part_flg, hard_bin)
+        key = (head_num, site_num)
+
+        counts = self.hard_bins.get(key)
+        if counts is None:
+            counts = self.hard_bins[key] = {}
+        counts[hard_bin] = counts.get(hard_bin, 0) + 1
+        counts = self.soft_bins.get(key)
+        if counts is None:
+            counts = self.soft_bins[key] = {}
+        counts[soft_bin] = counts.get(soft_bin, 0) + 1
+
+        self.part_count += 1
+        if passed:
+            self.good_count += 1
+
+        if not self.keep_dies:
+            return
+        wafer = self._open.get(head_num)
+        if wafer is None:
+            wafer = self.start_wafer(head_num)
+        wafer.add(x_coord, y_coord, hard_bin, soft_bin, passed)
+
+    def add_prr(self, prr: PartResultsRecord) -> None:
+        self.add_part(prr.head_num, prr.site_num, prr.part_flg, prr.hard_bin, prr.soft_bin,
+                      prr.x_coord, prr.y_coord)
+
+    def merge(self, other: 'BinSummary', continued: bool = False) -> 'BinSummary':
+        """Fold in a summary of the parts that followed
+
+        With ``continued``, ``other`` covers the next byte range of the same
+        file: its leading parts without a WIR continue this summary's open
+        wafers.
+        """
+        for table, other_table in ((self.hard_bins, other.hard_bins), (self.soft_bins, other.soft_bins)):
+            for key, other_counts in other_table.items():
+                counts = table.get(key)
+                if counts is None:
+                    counts = table[key] = {}
+                for bin_num, count in other_counts.items():
+                    counts[bin_num] = counts.get(bin_num, 0) + count
+        self.part_count += other.part_count
+        self.good_count += other.good_count
+
+        open_wafers = dict(self._open) if continued else {}
+        seen_heads = set()
+        for wafer in other.wafers:
+            head = wafer.head_num
+            target = open_wafers.get(head) if head not in seen_heads else None
+            seen_heads.add(head)
+            if target is not None and wafer.info is None:
+                target.extend(wafer)
+                if wafer.results is not None:
+                    target.results = wafer.results
+                    del open_wafers[head]
+                elif other._open.get(head) is wafer:
+                    continue
+            else:
+                self.wafers.append(wafer)
+                open_wafers.pop(head, None)
+
+        for head, wafer in other._open.items():
+            open_wafers.setdefault(head, wafer)
+        self._open = open_wafers
+        return self
+
+    def bin_counts(self, kind: str = 'hard', by_site: bool = False
+                   ) -> Union[Dict[int, int], Dict[SiteKey, Dict[int, int]]]:
+        """Part counts per bin, or per (head, site) and bin; sorted by bin"""
+        _check_kind(kind)
+        table = self.hard_bins if kind == 'hard' else self.soft_bins
+        if by_site:
+            return {key: dict(sorted(counts.items())) for key, counts in sorted(table.items())}
+
+        totals: Dict[int, int] = {}
+        for counts in table.values():
+            for bin_num, count in counts.items():
+                totals[bin_num] = totals.get(bin_num, 0) + count
+        return dict(sorted(totals.items()))
+
+    def statistics(self) -> Dict[str, Any]:
+        """Part pass/fail counts and yield"""
+        total = self.part_count
+        return {
+            'part_count': total,
+            'good_count': self.good_count,
+            'fail_count': total - self.good_count,
+            'yield_rate': (self.good_count / total * 100) if total else 0.0
+        }
+
+    def wafer_yields(self) -> List[Dict[str, Any]]:
+        """``WaferMap.summary()`` of every wafer, in test order"""
+        return [wafer.summary() for wafer in self.wafers]
+
+    def find_wafer(self, wafer: Union[int, str]) -> WaferMap:
+        """A wafer by position in test order or by WAFER_ID"""
+        if isinstance(wafer, int):
+            return self.wafers[wafer]
+        for candidate in self.wafers:
+            if candidate.wafer_id == wafer:
+                return candidate
+        raise KeyError(f'no wafer {wafer!r}')
+
+    def report(self, kind: str = 'hard', grids: bool = True,
+               bounds: Optional[Tuple[int, int, int, int]] = None) -> Dict[str, Any]:
+        """Everything as a JSON-serializable dict
+
+        Wafers too sparse for a dense grid (see ``WaferGrid.grid``, which
+        ``bounds`` is passed to) get ``'grid': None`` and their dies as
+        ``'die_bins'``: ``[[x, y, bin], ...]``.
+        """
+        wafers = []
+        for wafer in self.wafers:
+            entry = wafer.summary()
+            if grids:
+                try:
+                    grid = wafer.grid(kind, bounds=bounds)
+                except ValueError:
+                    entry['grid'] = None
+                    entry['die_bins'] = [[x, y, b] for (x, y), b in wafer.dies(kind).items()]
+                    wafers.append(entry)
+                    continue
+                entry['grid'] = {
+                    'x_min': grid.x_min,
+                    'y_min': grid.y_min,
+                    'width': grid.width,
+                    'height': grid.height,
+                    'empty': EMPTY_BIN,
+                    'rows': [row.tolist() for row in grid.rows()] if grid.width else []
+                }
+            wafers.append(entry)
+
+        return {
+            'statistics': self.statistics(),
+            'hard_bins': self.bin_counts('hard'),
+            'soft_bins': self.bin_counts('soft'),
+            'sites': [
+                {'head_num': head, 'site_num': site, 'bins': counts}
+                for (head, site), counts in self.bin_counts(kind, by_site=True).items()
+            ],
+            'wafers': wafers
+        }
+
+
+def render_grid(grid: WaferGrid) -> str:
+    """Text wafer map: bins 0-9 as digits, 10-35 as letters, larger as '#', '.' for no die"""
+    symbols = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    lines = []
+    for row in grid.rows():
+        lines.append(''.join('.' if b == EMPTY_BIN else symbols[b] if b < len(symbols) else '#'
+                             for b in row))
+    return '\n'.join(lines) if grid.width else ''
@@ -0,0 +1,287 @@
+"""Buffered STDF V4 record writer
+
+``STDFWriter`` serializes the ``records.py`` dataclasses into one reusable
+``bytearray`` that is written out in ``buffer_size`` chunks, so a file
+costs one ``write()`` per chunk rather than one per record.
+
+Each record is packed, header included, by a single precompiled
+``struct.Struct``: the field layouts are those the decoders read, and Cn
+strings are ``B{n}s`` fields, so one layout is compiled and cached per
+combination of string lengths (a handful per file, as test names repeat).
+
+Records are written little-endian (FAR CPU_TYPE 2). Trailing fields that
+the dataclasses do not keep (e.g. the PTR format strings and spec limits,
+FTR pin arrays) are omitted, which STDF allows.
+"""
+
+import os
+import struct
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Tuple, Union
+
+from .decoders import _FAR, _FTR, _MIR, _MRR, _PCR, _PIR, _PRR, _PTR, _PTR_OPT, _U2, _WIR, _WRR
+from .generator import WRITE_BUFFER_SIZE
+from .parser import HEADER
+from .records import (
+    FileAttributeRecord, FunctionalTestRecord, MasterInformationRecord,
+    MasterResultsRecord, ParametricTestRecord, PartCountRecord,
+    PartInformationRecord, PartResultsRecord, RecordType, WaferInformationRecord,
+    WaferResultsRecord,
+)
+
+Encoder = Callable[[bytearray, Any], None]
+
+# Largest payload a record header can describe
+MAX_RECORD_LENGTH = 0xFFFF
+
+_LAYOUTS: Dict[Tuple[str, Tuple[int, ...]], struct.Struct] = {}
+
+
+def _template(*parts: Union[struct.Struct, str]) -> str:
+    """Record layout: header, then fixed blocks and Cn fields ('Cn')"""
+    fields = [HEADER.format[1:]]
+    for part in parts:
+        fields.append('B{}s' if part == 'Cn' else part.format[1:])
+    return '<' + ''.join(fields)
+
+
+def _layout(template: str, *lengths: int) -> struct.Struct:
+    """Compiled layout of a template for these Cn string lengths"""
+    key = (template, lengths)
+    layout = _LAYOUTS.get(key)
+    if layout is None:
+        layout = _LAYOUTS[key] = struct.Struct(template.format(*lengths))
+    return layout
+
+
+def _cn(text: str) -> bytes:
+    """Characters of a Cn string, truncated to 255"""
+    return text.encode('latin-1')[:255]
+
+
+def _c1(text: str) -> bytes:
+    """C1 character; an empty string is written as a space"""
+    return text[:1].encode('latin-1') or b' '
+
+
+def _key(rec_type: RecordType) -> Tuple[int, int]:
+    return rec_type >> 8, rec_type & 0xFF
+
+
+_FAR_RECORD = struct.Struct(_template(_FAR))
+_PCR_RECORD = struct.Struct(_template(_PCR))
+_PIR_RECORD = struct.Struct(_template(_PIR))
+_MIR_TEMPLATE = _template(_MIR, *['Cn'] * 5)
+_MRR_TEMPLATE = _template(_MRR, 'Cn', 'Cn')
+_PTR_TEMPLATE = _template(_PTR, 'Cn', 'Cn', _PTR_OPT, 'Cn')
+_FTR_TEMPLATE = _template(_FTR, _U2, *['Cn'] * 7)
+_WIR_TEMPLATE = _template(_WIR, 'Cn')
+_WRR_TEMPLATE = _template(_WRR, *['Cn'] * 6)
+_PRR_TEMPLATE = _template(_PRR, 'Cn', 'Cn')
+
+
+def _pack_strings(out: bytearray, template: str, rec_type: RecordType, fixed: Tuple,
+                  texts: Iterable[str]) -> None:
+    """Append a record of fixed fields followed by Cn strings"""
+    strings = [_cn(text) for text in texts]
+    layout = _layout(template, *map(len, strings))
+    values = list(fixed)
+    for data in strings:
+        values += (len(data), data)
+    out += layout.pack(layout.size - HEADER.size, *_key(rec_type), *values)
+
+
+def encode_far(out: bytearray, far: FileAttributeRecord) -> None:
+    out += _FAR_RECORD.pack(_FAR.size, *_key(RecordType.FAR), far.cpu_type, far.stdf_ver)
+
+
+def encode_mir(out: bytearray, mir: MasterInformationRecord) -> None:
+    # BURN_TIM missing (65535), CMOD_COD blank
+    fixed = (mir.setup_t, mir.start_t, mir.stat_num, _c1(mir.mode_cod), _c1(mir.rtst_cod),
+             _c1(mir.prot_cod), 0xFFFF, b' ')
+    _pack_strings(out, _MIR_TEMPLATE, RecordType.MIR, fixed,
+                  (mir.lot_id, mir.part_typ, mir.node_nam, mir.tstr_typ, mir.job_nam))
+
+
+def encode_mrr(out: bytearray, mrr: MasterResultsRecord) -> None:
+    _pack_strings(out, _MRR_TEMPLATE, RecordType.MRR, (mrr.finish_t, _c1(mrr.disp_cod)),
+                  (mrr.usr_desc, mrr.exc_desc))
+
+
+def encode_pcr(out: bytearray, pcr: PartCountRecord) -> None:
+    out += _PCR_RECORD.pack(_PCR.size, *_key(RecordType.PCR), pcr.head_num, pcr.site_num,
+                            pcr.part_cnt, pcr.rtst_cnt, pcr.abrt_cnt, pcr.good_cnt, pcr.func_cnt)
+
+
+# (test_txt, alarm_id, units) -> PTR layout and encoded strings; test names
+# repeat for every part, so a file needs few entries
+_PTR_STRINGS: Dict[Tuple[str, str, str], Tuple] = {}
+_PTR_STRINGS_LIMIT = 65536
+
+
+def _ptr_strings(key: Tuple[str, str, str]) -> Tuple:
+    if len(_PTR_STRINGS) >= _PTR_STRINGS_LIMIT:
+        _PTR_STRINGS.clear()
+    test_txt, alarm_id, units = (_cn(text) for text in key)
+    layout = _layout(_PTR_TEMPLATE, len(test_txt), len(alarm_id), len(units))
+    entry = _PTR_STRINGS[key] = (layout, layout.size - HEADER.size, len(test_txt), test_txt,
+                                 len(alarm_id), alarm_id, len(units), units)
+    return entry
+
+
+def encode_ptr(out: bytearray, ptr: ParametricTestRecord) -> None:
+    # Hot path: one cache lookup for the strings, one pack for the record
+    key = (ptr.test_txt, ptr.alarm_id, ptr.units)
+    strings = _PTR_STRINGS.get(key)
+    if strings is None:
+        strings = _ptr_strings(key)
+    layout, length, txt_len, test_txt, alarm_len, alarm_id, units_len, units = strings
+    out += layout.pack(length, 0x0F, 0x0A, ptr.test_num, ptr.head_num, ptr.site_num,
+                       ptr.test_flg, ptr.parm_flg, ptr.result, txt_len, test_txt,
+                       alarm_len, alarm_id, ptr.opt_flag, ptr.res_scal, ptr.llm_scal,
+                       ptr.hlm_scal, ptr.lo_limit, ptr.hi_limit, units_len, units)
+
+
+def encode_ftr(out: bytearray, ftr: FunctionalTestRecord) -> None:
+    # RTN_ICNT and PGM_ICNT are 0 and FAIL_PIN is empty: pin arrays are not kept
+    fixed = (ftr.test_num, ftr.head_num, ftr.site_num, ftr.test_flg, ftr.opt_flag, ftr.cycl_cnt,
+             ftr.rel_vadr, ftr.rept_cnt, ftr.num_fail, ftr.xfail_ad, ftr.yfail_ad, ftr.vect_off,
+             0, 0, 0)
+    _pack_strings(out, _FTR_TEMPLATE, RecordType.FTR, fixed,
+                  (ftr.vect_nam, ftr.time_set, ftr.op_code, ftr.test_txt, ftr.alarm_id,
+                   ftr.prog_txt, ftr.rslt_txt))
+
+
+def encode_wir(out: bytearray, wir: WaferInformationRecord) -> None:
+    _pack_strings(out, _WIR_TEMPLATE, RecordType.WIR, (wir.head_num, wir.site_grp, wir.start_t),
+                  (wir.wafer_id,))
+
+
+def encode_wrr(out: bytearray, wrr: WaferResultsRecord) -> None:
+    fixed = (wrr.head_num, wrr.site_grp, wrr.finish_t, wrr.part_cnt, wrr.rtst_cnt, wrr.abrt_cnt,
+             wrr.good_cnt, wrr.func_cnt)
+    _pack_strings(out, _WRR_TEMPLATE, RecordType.WRR, fixed,
+                  (wrr.wafer_id, wrr.fabwf_id, wrr.frame_id, wrr.mask_id, wrr.usr_desc, wrr.exc_desc))
+
+
+def encode_pir(out: bytearray, pir: PartInformationRecord) -> None:
+    out += _PIR_RECORD.pack(_PIR.size, *_key(RecordType.PIR), pir.head_num, pir.site_num)
+
+
+def encode_prr(out: bytearray, prr: PartResultsRecord) -> None:
+    fixed = (prr.head_num, prr.site_num, prr.part_flg, prr.num_test, prr.hard_bin, prr.soft_bin,
+             prr.x_coord, prr.y_coord, prr.test_t)
+    _pack_strings(out, _PRR_TEMPLATE, RecordType.PRR, fixed, (prr.part_id, prr.part_txt))
+
+
+# Encoder registry keyed by dataclass; encoders append the whole record
+ENCODERS: Dict[type, Encoder] = {
+    FileAttributeRecord: encode_far,
+    MasterInformationRecord: encode_mir,
+    MasterResultsRecord: encode_mrr,
+    PartCountRecord: encode_pcr,
+    ParametricTestRecord: encode_ptr,
+    FunctionalTestRecord: encode_ftr,
+    WaferInformationRecord: encode_wir,
+    WaferResultsRecord: encode_wrr,
+    PartInformationRecord: encode_pir,
+    PartResultsRecord: encode_prr,
+}
+
+
+def _encoder(record: Any) -> Encoder:
+    try:
+        return ENCODERS[type(record)]
+    except KeyError:
+        raise TypeError(f'cannot write {type(record).__name__} records') from None
+
+
+def encode_record(record: Any) -> bytes:
+    """One record (header and payload) as bytes"""
+    out = bytearray()
+    _encoder(record)(out, record)
+    return bytes(out)
+
+
+class STDFWriter:
+    """Write STDF records to a file through a reusable buffer
+
+    ``target`` is a path (opened, and closed by ``close()``) or a binary
+    file object. Use as a context manager to flush and close::
+
+        with STDFWriter('out.stdf') as writer:
+            writer.write(FileAttributeRecord(2, 4))
+            writer.write_records(records)
+    """
+
+    def __init__(self, target: Union[str, 'os.PathLike[str]', BinaryIO],
+                 buffer_size: int = WRITE_BUFFER_SIZE):
+        if isinstance(target, (str, os.PathLike)):
+            self._file: BinaryIO = open(target, 'wb')
+            self._owns_file = True
+        else:
+            self._file = target
+            self._owns_file = False
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        self.bytes_written = 0
+        self.record_count = 0
+
+    def __enter__(self) -> 'STDFWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def position(self) -> int:
+        """Offset in the output of the next record"""
+        return self.bytes_written + len(self.buffer)
+
+    def write(self, record: Any) -> None:
+        """Append one record dataclass"""
+        _encoder(record)(self.buffer, record)
+        self.record_count += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def write_records(self, records: Iterable[Any]) -> None:
+        """Append every record of an iterable"""
+        out = self.buffer
+        buffer_size = self.buffer_size
+        encoders = ENCODERS
+        count = 0
+        for record in records:
+            encode = encoders.get(type(record))
+            if encode is None:
+                encode = _encoder(record)
+            encode(out, record)
+            count += 1
+            if len(out) >= buffer_size:
+                self.record_count += count
+                count = 0
+                self.flush()
+        self.record_count += count
+
+    def write_raw(self, rec_type: int, rec_sub: int, data: bytes) -> None:
+        """Append a record from an already encoded payload, e.g. copied from another file"""
+        if len(data) > MAX_RECORD_LENGTH:
+            raise ValueError(f'payload of {len(data)} bytes exceeds {MAX_RECORD_LENGTH}')
+        self.buffer += HEADER.pack(len(data), rec_type, rec_sub)
+        self.buffer += data
+        self.record_count += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records out"""
+        if self.buffer:
+            self._file.write(self.buffer)
+            self.bytes_written += len(self.buffer)
+            self.buffer.clear()
+
+    def close(self) -> None:
+        self.flush()
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()